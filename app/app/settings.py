@@ -58,6 +58,8 @@ INSTALLED_APPS = [
 # Add storages only in production
 if IS_PRODUCTION:
     SECURE_SSL_REDIRECT = True
+    # Probes of the container healthcheck come over plain HTTP
+    SECURE_REDIRECT_EXEMPT = [r'^health-check/$', r'^ready/$']
     SESSION_COOKIE_SECURE = True
     CSRF_COOKIE_SECURE = True
 
@@ -65,7 +67,9 @@ SECURE_PROXY_SSL_HEADER = ("HTTP_X_FORWARDED_PROTO", "https")
 USE_X_FORWARDED_HOST = True
 
 MIDDLEWARE = [
+    'core.metrics.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    'core.middleware.CompressionMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -76,7 +80,7 @@ MIDDLEWARE = [
 ]
 
 if not IS_PRODUCTION and not DEBUG:
-    MIDDLEWARE.insert(1, 'whitenoise.middleware.WhiteNoiseMiddleware')
+    MIDDLEWARE.insert(2, 'whitenoise.middleware.WhiteNoiseMiddleware')
 
 ROOT_URLCONF = 'app.urls'
 
@@ -109,9 +113,32 @@ DATABASES = {
         'NAME': os.environ.get('DB_NAME', ''),
         'USER': os.environ.get('DB_USER', ''),
         'PASSWORD': os.environ.get('DB_PASS', ''),
+        # Seconds a connection is reused for, 0 opens one per request.
+        # Reused connections are checked before the first query of a request.
+        'CONN_MAX_AGE': int(os.getenv('DB_CONN_MAX_AGE', '0')),
+        'CONN_HEALTH_CHECKS': bool(int(os.getenv('DB_CONN_HEALTH_CHECKS', '1'))),
     }
 }
 
+# Under ASGI every request runs its sync code in its own thread, and connections
+# are per thread, so they are only reused from a pool
+if os.getenv('SERVER_MODE') == 'asgi':
+    DATABASES['default']['CONN_MAX_AGE'] = 0
+
+# A psycopg 3 pool per process instead of persistent connections,
+# needs psycopg[pool] installed in place of psycopg2
+DB_POOL_MAX_SIZE = int(os.getenv('DB_POOL_MAX_SIZE', '0'))
+if DB_POOL_MAX_SIZE:
+    DATABASES['default']['CONN_MAX_AGE'] = 0
+    DATABASES['default']['OPTIONS'] = {
+        'pool': {
+            'min_size': int(os.getenv('DB_POOL_MIN_SIZE', '1')),
+            'max_size': DB_POOL_MAX_SIZE,
+            # Seconds a request waits for a free connection before failing
+            'timeout': int(os.getenv('DB_POOL_TIMEOUT', '10')),
+        },
+    }
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
@@ -149,10 +176,13 @@ USE_TZ = True
 if IS_PRODUCTION:
     DOMAIN = os.getenv('DOMAIN', 'localhost')
     STATIC_URL = f'https://static.{DOMAIN}/tagmate/'
-    STATIC_ROOT = BASE_DIR / 'staticfiles' / 'tagmate'
+    STATIC_ROOT = Path(os.getenv('STATIC_ROOT', BASE_DIR / 'staticfiles' / 'tagmate'))
 else:
     STATIC_URL = 'static/'
-    STATIC_ROOT = BASE_DIR / 'staticfiles'
+    STATIC_ROOT = Path(os.getenv('STATIC_ROOT', BASE_DIR / 'staticfiles'))
+# Static files collected when the image is built, the startup command copies them
+# to STATIC_ROOT, which is a volume in production
+STATIC_BUILD_ROOT = Path(os.getenv('STATIC_BUILD_ROOT', BASE_DIR / 'static_build'))
 
 STATICFILES_DIRS = [
     BASE_DIR / 'static'
@@ -171,6 +201,27 @@ if IS_PRODUCTION and not DEBUG:
     COMPRESS_OFFLINE = True
     COMPRESS_ENABLED = True
 
+# Collected files get a hash of their content in the name and .br/.gz siblings,
+# so the static host and whitenoise serve them compressed and cache them forever.
+# The startup command collects static files in this case only, the hashes come from
+# the manifest written by collectstatic.
+if not DEBUG:
+    STORAGES = {
+        'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+        'staticfiles': {
+            'BACKEND': 'whitenoise.storage.CompressedManifestStaticFilesStorage',
+        },
+    }
+COMPRESS_STORAGE = 'core.storage.PrecompressedCompressorFileStorage'
+# Django's hashes and the ones of compressor output are 12 hex digits
+WHITENOISE_IMMUTABLE_FILE_TEST = r'\.[0-9a-f]{12}\.\w+$'
+
+# Editor icons refer to one SVG sprite, 0 renders every icon inline
+ICON_SPRITE = bool(int(os.getenv('ICON_SPRITE', '1')))
+
+# Responses shorter than this many bytes aren't compressed
+COMPRESSION_MIN_SIZE = int(os.getenv('COMPRESSION_MIN_SIZE', '512'))
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.1/ref/settings/#default-auto-field
 
@@ -217,5 +268,76 @@ ACCOUNT_USER_MODEL_USERNAME_FIELD = None
 SOCIALACCOUNT_ADAPTER = 'core.social_adapters.MySocialAccountAdapter'
 ACCOUNT_ADAPTER = 'core.account_adapters.NoSignUpAccountAdapter'
 
+# Deferred jobs (core.jobs)
+# Run due jobs in a background thread of the web process,
+# otherwise they're run by "python manage.py run_jobs"
+JOBS_RUN_IN_PROCESS = os.getenv('JOBS_RUN_IN_PROCESS', '0') == '1'
+JOBS_POLL_INTERVAL = int(os.getenv('JOBS_POLL_INTERVAL', '60'))
+# Seconds a runner owns a job, after that another runner may take it over
+JOB_LOCK_TIMEOUT = int(os.getenv('JOB_LOCK_TIMEOUT', '300'))
+JOB_RETRY_DELAY = int(os.getenv('JOB_RETRY_DELAY', '60'))
+
+ORPHAN_SWEEP_BATCH_SIZE = int(os.getenv('ORPHAN_SWEEP_BATCH_SIZE', '500'))
+ORPHAN_SWEEP_INTERVAL = int(os.getenv('ORPHAN_SWEEP_INTERVAL', '3600'))
+# Unused Tags touched more recently are kept, e.g. ones intern_tags just
+# returned to a request that attaches them next
+ORPHAN_SWEEP_GRACE_SECONDS = int(os.getenv('ORPHAN_SWEEP_GRACE_SECONDS', '300'))
+
+# Where ordered Tags of Posts and TagGroups are read from: "packed" reads
+# the ids stored on the item row, "through" joins PostTag/TagGroupTag
+TAG_ORDER_SOURCE = os.getenv('TAG_ORDER_SOURCE', 'packed')
+
+# Accounts with more Posts and TagGroups are deleted by a background job
+ACCOUNT_DELETION_SYNC_LIMIT = int(os.getenv('ACCOUNT_DELETION_SYNC_LIMIT', '2000'))
+ACCOUNT_DELETION_BATCH_SIZE = int(os.getenv('ACCOUNT_DELETION_BATCH_SIZE', '1000'))
+
+# Cache, also holding the post editor read model (posts.read_cache).
+# LocMemCache is per process and drops least recently used entries when full,
+# CACHE_BACKEND and CACHE_LOCATION switch to a cache shared by all workers,
+# e.g. django.core.cache.backends.redis.RedisCache and redis://redis:6379
+CACHE_BACKEND = os.getenv('CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache')
+CACHES = {
+    'default': {
+        'BACKEND': CACHE_BACKEND,
+        'LOCATION': os.getenv('CACHE_LOCATION', ''),
+    }
+}
+if CACHE_BACKEND.endswith('.LocMemCache'):
+    # Over MAX_ENTRIES the least recently used 1/CULL_FREQUENCY of entries is dropped
+    CACHES['default']['OPTIONS'] = {
+        'MAX_ENTRIES': int(os.getenv('CACHE_MAX_ENTRIES', '10000')),
+        'CULL_FREQUENCY': int(os.getenv('CACHE_CULL_FREQUENCY', '20')),
+    }
+READ_CACHE_ALIAS = 'default'
+# Workers of gunicorn (app/gunicorn.conf.py). With more than one, the startup
+# command refuses a per process cache, workers would read each other's stale items.
+GUNICORN_WORKERS = int(os.getenv('GUNICORN_WORKERS', '1'))
+READ_CACHE_TIMEOUT = int(os.getenv('READ_CACHE_TIMEOUT', '3600'))
+# Rendered parts of the post editor page, 0 turns the fragment cache off
+FRAGMENT_CACHE_TIMEOUT = int(os.getenv('FRAGMENT_CACHE_TIMEOUT', '3600'))
+
+# The readiness probe at /ready/ reuses its result for this many seconds and fails
+# if a database round trip takes longer than the budget
+READY_CACHE_SECONDS = float(os.getenv('READY_CACHE_SECONDS', '5'))
+READY_LATENCY_BUDGET_MS = int(os.getenv('READY_LATENCY_BUDGET_MS', '500'))
+
+# Request metrics at /metrics/ in the Prometheus text format, shown to staff and
+# to requests from METRICS_ALLOWED_IPS (addresses or networks) not coming through
+# the proxy. The proxy adds X-Forwarded-For to every request, so scrapers reach the
+# app directly on the internal network. Workers share them through files in
+# METRICS_DIR, e.g. on /dev/shm, empty keeps them per process.
+METRICS_ENABLED = bool(int(os.getenv('METRICS_ENABLED', '1')))
+METRICS_DIR = os.getenv('METRICS_DIR', '')
+METRICS_FLUSH_SECONDS = float(os.getenv('METRICS_FLUSH_SECONDS', '5'))
+METRICS_ALLOWED_IPS = [
+    ip.strip() for ip in os.getenv('METRICS_ALLOWED_IPS', '127.0.0.1,::1').split(',')
+    if ip.strip()
+]
+
+# Sessions hold only the login and small editor state, so they can live in
+# signed cookies (django.contrib.sessions.backends.signed_cookies) or in the
+# cache backed by the DB (django.contrib.sessions.backends.cached_db)
+SESSION_ENGINE = os.getenv('SESSION_ENGINE', 'django.contrib.sessions.backends.db')
+
 # Security
 CSRF_FAILURE_VIEW = "core.views.csrf_failure"
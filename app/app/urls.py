@@ -35,6 +35,9 @@ urlpatterns = [
     path('accounts/', include('core.urls')),
     path('', include('posts.urls')),
     path('health-check/', core_views.health_check, name='health_check'),
+    path('ready/', core_views.ready, name='ready'),
+    path('stats/', core_views.stats, name='stats'),
+    path('metrics/', core_views.metrics, name='metrics'),
     path("robots.txt", TemplateView.as_view(
         template_name="robots.txt", content_type="text/plain")
          )
@@ -0,0 +1,90 @@
+"""
+Set-based deletion of user accounts with all their Posts, TagGroups and Tags
+"""
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.utils import timezone
+
+from core.jobs import job_handler, schedule_job
+from posts.models import Post, PostTag, Tag, TagGroup, TagGroupTag
+
+ACCOUNT_DELETION_JOB = 'core.delete_account'
+# DB and app clocks may differ, Tags touched a bit before the start are checked too
+TOUCH_MARGIN = timedelta(minutes=1)
+
+
+def delete_items_batch(user_id, batch_size) -> int:
+    """
+    Delete up to batch_size Posts and TagGroups of the user, returns their number.
+    Every model takes one SELECT of ids, one DELETE for their through rows and
+    one for the rows, whatever the number of tags.
+    """
+    deleted = 0
+    for item_model, through_model, item_field in (
+            (Post, PostTag, 'post'), (TagGroup, TagGroupTag, 'tag_group')):
+        item_ids = list(item_model.objects.filter(user_id=user_id).order_by(
+            ).values_list('id', flat=True)[:batch_size - deleted])
+        if item_ids:
+            # The through rows are the only ones referring to the items, so
+            # with them gone the items need no collector loading related rows
+            through_rows = through_model.objects.filter(
+                **{f'{item_field}__in': item_ids})
+            through_rows._raw_delete(through_rows.db)
+            items = item_model.objects.filter(id__in=item_ids)
+            items._raw_delete(items.db)
+            deleted += len(item_ids)
+        if deleted >= batch_size:
+            break
+    return deleted
+
+
+def finish_account_deletion(user_id, started_at: datetime):
+    """Delete the user row and Tags that lost their last usage with the account"""
+    with transaction.atomic():
+        get_user_model().objects.filter(pk=user_id).delete()
+        Tag.objects.filter(
+            usage_count=0, touched_at__gte=started_at - TOUCH_MARGIN
+        ).only('id').delete()
+
+
+def count_account_items(user_id) -> int:
+    return (Post.objects.filter(user_id=user_id).count()
+            + TagGroup.objects.filter(user_id=user_id).count())
+
+
+def delete_account(user):
+    """
+    Delete the account right away when it's small, otherwise deactivate it
+    and leave the deletion to a background job. Returns True if it's deleted.
+    """
+    if count_account_items(user.pk) <= settings.ACCOUNT_DELETION_SYNC_LIMIT:
+        started_at = timezone.now()
+        with transaction.atomic():
+            while delete_items_batch(user.pk, settings.ACCOUNT_DELETION_BATCH_SIZE):
+                pass
+            finish_account_deletion(user.pk, started_at)
+        return True
+
+    user.is_active = False
+    user.save(update_fields=['is_active'])
+    schedule_job(ACCOUNT_DELETION_JOB, key=str(user.pk))
+    return False
+
+
+@job_handler(ACCOUNT_DELETION_JOB)
+def run_account_deletion(job):
+    """Delete one batch of the account per run, so progress is stored in between"""
+    user_id = int(job.key)
+    started_at = job.progress.setdefault('started_at', timezone.now().isoformat())
+
+    with transaction.atomic():
+        deleted = delete_items_batch(user_id, settings.ACCOUNT_DELETION_BATCH_SIZE)
+    job.progress['deleted_items'] = job.progress.get('deleted_items', 0) + deleted
+    if deleted:
+        return 0
+
+    finish_account_deletion(user_id, datetime.fromisoformat(started_at))
+    return None
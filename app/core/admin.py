@@ -55,3 +55,11 @@ class UserAdmin(BaseUserAdmin):
 
 
 admin.site.register(models.User, UserAdmin)
+
+
+class JobAdmin(admin.ModelAdmin):
+    list_display = ['kind', 'key', 'run_after', 'locked_until', 'attempts']
+    list_filter = ['kind']
+
+
+admin.site.register(models.Job, JobAdmin)
@@ -1,6 +1,23 @@
 from django.apps import AppConfig
+from django.conf import settings
+from django.core.signals import request_started
+from django.db.backends.signals import connection_created
 
 
 class CoreConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'core'
+
+    def ready(self):
+        from core import account_deletion  # noqa: F401 (registers job handlers)
+        from core.db_metrics import count_connection
+        from core.metrics import add_query_recorder
+        connection_created.connect(count_connection, dispatch_uid='count_connection')
+        connection_created.connect(add_query_recorder, dispatch_uid='add_query_recorder')
+        if settings.JOBS_RUN_IN_PROCESS:
+            from core.jobs import start_job_runner_thread
+            # Started by the first request, so only serving processes run jobs
+            # and management commands like migrate don't touch the job table
+            request_started.connect(
+                start_job_runner_thread, dispatch_uid='start_job_runner_thread'
+            )
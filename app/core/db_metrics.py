@@ -0,0 +1,27 @@
+"""
+Database connection metrics, shown to staff by core.views.stats and exported
+by core.metrics
+"""
+from django.db import connections
+
+from core import stats as core_stats
+
+
+def count_connection(sender, connection, **kwargs):
+    """
+    Count connects of every DB alias, used as a connection_created receiver.
+    With a pool it's sent on every checkout, pool stats tell the real churn.
+    """
+    core_stats.incr(f'db.{connection.alias}.connects')
+
+
+def get_pool_stats() -> dict:
+    """
+    Stats of the psycopg pools of this process by DB alias, e.g. pool_size,
+    pool_available, requests_waiting, requests_wait_ms and connections_num
+    """
+    pool_stats = {}
+    for connection in connections.all(initialized_only=True):
+        if connection.settings_dict['OPTIONS'].get('pool'):
+            pool_stats[connection.alias] = connection.pool.get_stats()
+    return pool_stats
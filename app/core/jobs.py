@@ -0,0 +1,122 @@
+"""
+Deferred jobs stored in the database and run by the run_jobs command
+or by a background thread of the web process
+"""
+import logging
+import threading
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from core.models import Job
+
+logger = logging.getLogger(__name__)
+
+JOB_HANDLERS = {}
+_runner_thread = None
+_runner_lock = threading.Lock()
+
+
+def job_handler(kind: str):
+    """
+    Register a function as the handler for jobs of the given kind.
+    The handler gets the claimed Job, may update job.progress and returns
+    seconds until the next run, or None when the job is done and can be removed.
+    """
+    def register(func):
+        JOB_HANDLERS[kind] = func
+        return func
+    return register
+
+
+def schedule_job(kind: str, key: str = '', delay: int = 0):
+    """Make the job due in `delay` seconds, keeping an earlier scheduled run"""
+    run_after = timezone.now() + timedelta(seconds=delay)
+    if Job.objects.filter(kind=kind, key=key, run_after__gt=run_after).update(
+            run_after=run_after):
+        return
+    Job.objects.get_or_create(kind=kind, key=key, defaults={'run_after': run_after})
+
+
+def claim_due_job():
+    """Lock the next due job for JOB_LOCK_TIMEOUT seconds and return it"""
+    now = timezone.now()
+    with transaction.atomic():
+        job = Job.objects.select_for_update(skip_locked=True).filter(
+            Q(locked_until__isnull=True) | Q(locked_until__lt=now),
+            run_after__lte=now,
+            kind__in=list(JOB_HANDLERS),
+        ).order_by('run_after').first()
+        if job is None:
+            return None
+        job.locked_until = now + timedelta(seconds=settings.JOB_LOCK_TIMEOUT)
+        job.attempts += 1
+        job.save(update_fields=['locked_until', 'attempts'])
+    return job
+
+
+def run_job(job: Job) -> bool:
+    """Run a claimed job and store its outcome, returns False if it failed"""
+    # Another runner may take over a job whose lock expired,
+    # then the outcome of this run is not stored
+    claimed = Job.objects.filter(pk=job.pk, locked_until=job.locked_until)
+    try:
+        delay = JOB_HANDLERS[job.kind](job)
+    except Exception as e:
+        logger.exception("Job %s failed", job)
+        claimed.update(
+            locked_until=None, last_error=repr(e), progress=job.progress,
+            run_after=timezone.now() + timedelta(seconds=settings.JOB_RETRY_DELAY),
+        )
+        return False
+
+    # schedule_job() during the run moves run_after, then the job has to run again
+    not_rescheduled = claimed.filter(run_after=job.run_after)
+    if delay is None:
+        if not_rescheduled.delete()[0]:
+            return True
+    elif not_rescheduled.update(
+            locked_until=None, attempts=0, last_error='', progress=job.progress,
+            run_after=timezone.now() + timedelta(seconds=delay)):
+        return True
+    claimed.update(locked_until=None, attempts=0, last_error='', progress=job.progress)
+    return True
+
+
+def run_due_jobs(max_jobs: int = 100) -> int:
+    """Run due jobs one by one until none is left or max_jobs ran, returns the count"""
+    count = 0
+    while count < max_jobs:
+        job = claim_due_job()
+        if job is None:
+            break
+        run_job(job)
+        count += 1
+    return count
+
+
+def _run_jobs_forever(interval: int):
+    while True:
+        try:
+            run_due_jobs()
+        except Exception:
+            logger.exception("Running due jobs failed")
+        finally:
+            close_old_connections()
+        time.sleep(interval)
+
+
+def start_job_runner_thread(**kwargs):
+    """Start the in-process job runner once per process, used as a signal receiver"""
+    global _runner_thread
+    with _runner_lock:
+        if _runner_thread is None:
+            _runner_thread = threading.Thread(
+                target=_run_jobs_forever, args=(settings.JOBS_POLL_INTERVAL,),
+                name='job-runner', daemon=True,
+            )
+            _runner_thread.start()
@@ -0,0 +1,103 @@
+"""
+Django command for measuring request throughput with different DB connection reuse
+"""
+import time
+from wsgiref.util import setup_testing_defaults
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.core.wsgi import get_wsgi_application
+from django.db import connection
+from django.test import Client
+from django.urls import reverse
+
+from core import stats as core_stats
+from posts.models import Post
+
+
+class Command(BaseCommand):
+    help = ('Measure requests per second of the health check and the post editor '
+            'with a new DB connection per request, persistent connections and '
+            'the configured pool. Requests go through the WSGI handler, which '
+            'closes or keeps connections like in production.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--requests',
+            type=int,
+            default=200,
+            help='Number of requests per view and mode',
+        )
+        parser.add_argument(
+            '--max-age',
+            type=int,
+            default=600,
+            help='CONN_MAX_AGE of the persistent connections mode',
+        )
+
+    def handle(self, *args, **options):
+        settings_dict = connection.settings_dict
+        original_max_age = settings_dict['CONN_MAX_AGE']
+        original_pool = settings_dict['OPTIONS'].get('pool')
+        modes = [
+            ('New connection per request', 0, None),
+            ('Persistent connections', options['max_age'], None),
+        ]
+        if original_pool:
+            modes.append(('Connection pool', 0, original_pool))
+
+        user = get_user_model().objects.create_user(
+            email='benchmark-db-connections@example.com')
+        try:
+            post = Post.objects.create(user=user, title='Benchmark')
+            client = Client()
+            client.force_login(user)
+            cookies = '; '.join(f'{name}={morsel.value}'
+                                for name, morsel in client.cookies.items())
+            views = [
+                ('health_check', reverse('health_check'), ''),
+                ('post_editor', reverse('post_editor', args=[post.pk]), cookies),
+            ]
+            handler = get_wsgi_application()
+            for label, max_age, pool in modes:
+                self.use_connection_mode(max_age, pool)
+                for view_name, path, cookie in views:
+                    rate, connects = self.measure(handler, path, cookie,
+                                                  options['requests'])
+                    self.stdout.write(f"{label}, {view_name}: {rate:.0f} requests/s, "
+                                      f"{connects} connects")
+        finally:
+            self.use_connection_mode(original_max_age, original_pool)
+            user.delete()
+
+        self.stdout.write(self.style.SUCCESS("Benchmark finished"))
+
+    def use_connection_mode(self, max_age, pool):
+        """Close the current connection, the next one is opened in the given mode"""
+        connection.close()
+        connection.settings_dict['CONN_MAX_AGE'] = max_age
+        if pool:
+            connection.settings_dict['OPTIONS']['pool'] = pool
+        else:
+            connection.settings_dict['OPTIONS'].pop('pool', None)
+
+    def measure(self, handler, path, cookie, request_count):
+        """Return requests per second and the number of DB connects"""
+        connects_key = f'db.{connection.alias}.connects'
+        connects_before = core_stats.snapshot().get(connects_key, 0)
+        started = time.perf_counter()
+        for _ in range(request_count):
+            environ = {'PATH_INFO': path, 'HTTP_COOKIE': cookie}
+            if settings.SECURE_SSL_REDIRECT:
+                environ['wsgi.url_scheme'] = 'https'
+            setup_testing_defaults(environ)
+            statuses = []
+            response = handler(environ, lambda status, headers: statuses.append(status))
+            # Closing the response finishes the request and closes old connections
+            response.close()
+            if not statuses[0].startswith('200'):
+                raise RuntimeError(f"{path} returned {statuses[0]}")
+        elapsed = time.perf_counter() - started
+        connects = core_stats.snapshot().get(connects_key, 0) - connects_before
+        return request_count / elapsed, connects
@@ -0,0 +1,39 @@
+"""
+Django command for running deferred jobs
+"""
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from core.jobs import run_due_jobs
+
+
+class Command(BaseCommand):
+    help = 'Run deferred jobs that are due, once or periodically with --loop'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--loop',
+            action='store_true',
+            help='Keep running and check for due jobs every --interval seconds',
+        )
+        parser.add_argument(
+            '--interval',
+            type=int,
+            default=settings.JOBS_POLL_INTERVAL,
+            help='Seconds between checks in --loop mode',
+        )
+        parser.add_argument(
+            '--max-jobs',
+            type=int,
+            default=100,
+            help='Maximum number of jobs to run per check',
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            count = run_due_jobs(max_jobs=options['max_jobs'])
+            self.stdout.write(self.style.SUCCESS(f"Ran {count} jobs"))
+            if not options['loop']:
+                return
+            time.sleep(options['interval'])
@@ -0,0 +1,143 @@
+"""
+Django command for preparing the database and static files when a container starts
+"""
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from io import StringIO
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from core import startup
+
+
+class Command(BaseCommand):
+    help = ('Wait for the database, migrate, pre-create the superuser, clear orphaned '
+            'tags and publish static files. Steps whose migrations, settings or '
+            'sources did not change since their last run are skipped, static files '
+            'are published while the database steps run. With --build, only '
+            'collect static files into STATIC_BUILD_ROOT, e.g. when building '
+            'the image.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--build',
+            action='store_true',
+            help='Only collect and compress static files into STATIC_BUILD_ROOT',
+        )
+        parser.add_argument(
+            '--force',
+            action='store_true',
+            help='Run every step, even if its inputs did not change',
+        )
+
+    def handle(self, *args, **options):
+        self.force = options['force']
+        self.output_lock = threading.Lock()
+        started = time.perf_counter()
+
+        if options['build']:
+            # Storages and compressor read STATIC_ROOT when settings load,
+            # so the build sets it through the environment
+            if Path(settings.STATIC_ROOT) != Path(settings.STATIC_BUILD_ROOT):
+                raise CommandError(
+                    f"--build collects into STATIC_BUILD_ROOT, run it with "
+                    f"STATIC_ROOT={settings.STATIC_BUILD_ROOT} in the environment")
+            self.run_step('collectstatic', self.collect_static)
+        else:
+            cache_error = startup.get_cache_sharing_error()
+            if cache_error:
+                raise CommandError(cache_error)
+            self.run_step('wait_for_db', self.wait_for_db)
+            self.state = startup.read_state()
+            tasks = [self.run_db_steps]
+            if startup.is_static_enabled():
+                tasks.append(partial(self.run_step, 'static', self.publish_static))
+            self.run_parallel(tasks)
+
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(f"Startup finished in {elapsed:.1f}s"))
+
+    def run_db_steps(self):
+        self.run_step('migrate', self.migrate)
+        self.run_parallel([
+            partial(self.run_step, 'pre_create_su', self.pre_create_su),
+            partial(self.run_step, 'clear_orphaned_tags', self.clear_orphaned_tags),
+        ])
+
+    def run_parallel(self, tasks):
+        """Run every task in its own thread, then raise the first error if any"""
+        with ThreadPoolExecutor(max_workers=len(tasks)) as executor:
+            futures = [executor.submit(self.run_in_thread, task) for task in tasks]
+        for future in futures:
+            if future.exception():
+                raise future.exception()
+
+    @staticmethod
+    def run_in_thread(task):
+        try:
+            task()
+        finally:
+            # Connections are per thread and would stay open otherwise
+            connections.close_all()
+
+    def run_step(self, name, step):
+        """
+        Run a step with its output buffered, so output of parallel steps
+        isn't mixed, and report its time or that it was skipped
+        """
+        output = StringIO()
+        started = time.perf_counter()
+        try:
+            ran = step(output)
+        except Exception:
+            self.report(name, output, self.style.ERROR("failed"))
+            raise
+        elapsed = time.perf_counter() - started
+        self.report(name, output, f"{elapsed:.1f}s" if ran else "skipped (unchanged)")
+
+    def report(self, name, output, result):
+        with self.output_lock:
+            self.stdout.write(output.getvalue(), ending='')
+            self.stdout.write(f"[{name}] {result}")
+
+    def is_unchanged(self, name, fingerprint) -> bool:
+        return not self.force and self.state.get(name) == fingerprint
+
+    def wait_for_db(self, output) -> bool:
+        call_command('wait_for_db', stdout=output)
+        return True
+
+    def migrate(self, output) -> bool:
+        fingerprint = startup.get_migrations_fingerprint()
+        if self.is_unchanged('migrate', fingerprint):
+            return False
+        call_command('migrate', interactive=False, stdout=output)
+        startup.save_state('migrate', fingerprint)
+        return True
+
+    def pre_create_su(self, output) -> bool:
+        fingerprint = startup.get_superuser_fingerprint()
+        if self.is_unchanged('pre_create_su', fingerprint):
+            return False
+        call_command('pre_create_su', stdout=output)
+        startup.save_state('pre_create_su', fingerprint)
+        return True
+
+    def clear_orphaned_tags(self, output) -> bool:
+        # Continues from where the last sweep stopped, so it's cheap to run every time
+        call_command('clear_orphaned_tags', max_seconds=60,
+                     grace_seconds=settings.ORPHAN_SWEEP_GRACE_SECONDS, stdout=output)
+        return True
+
+    def publish_static(self, output) -> bool:
+        return startup.publish_static(output, force=self.force)
+
+    def collect_static(self, output) -> bool:
+        startup.collect_static(startup.get_static_fingerprint(), output)
+        return True
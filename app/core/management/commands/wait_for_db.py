@@ -6,23 +6,47 @@ import time
 from django.db import connections
 from psycopg2 import OperationalError as Psycopg2Error
 from django.db.utils import OperationalError
-from django.core.management.base import BaseCommand
+from django.core.management.base import BaseCommand, CommandError
+
+from core.readiness import backoff_delays
 
 
 class Command(BaseCommand):
     """Django command to wait for the database to be available"""
 
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--timeout',
+            type=float,
+            default=120,
+            help='Fail if the database is still unavailable after this many seconds',
+        )
+        parser.add_argument(
+            '--max-delay',
+            type=float,
+            default=5,
+            help='Longest wait in seconds between attempts, waits double up to it',
+        )
+
     def handle(self, *args, **options):
         """Entry point for the management command"""
         self.stdout.write('Waiting for database...')
 
+        deadline = time.monotonic() + options['timeout']
+        delays = backoff_delays(max_delay=options['max_delay'])
         while True:
             try:
                 connections['default'].cursor()
                 break
             except (OperationalError, Psycopg2Error):
-                self.stdout.write('DB is unavailable. Waiting for 1 second...')
-                time.sleep(1)
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise CommandError(
+                        f"Database unavailable after {options['timeout']:g} seconds")
+                delay = min(next(delays), remaining)
+                self.stdout.write(
+                    f'DB is unavailable. Waiting for {delay:.1f} seconds...')
+                time.sleep(delay)
         self.stdout.write(self.style.SUCCESS('Database available!'))
 
         from app import settings
@@ -0,0 +1,423 @@
+"""
+Request metrics in the Prometheus text format, served by core.views.metrics.
+
+Every process aggregates its requests in memory, stats of its connection pools
+are exported as gauges. With METRICS_DIR set, it
+writes them to a file of its own there at most every METRICS_FLUSH_SECONDS,
+and the metrics view sums the files of all workers. Files of stopped workers
+are merged into one retired file, so counters don't go back when a worker is
+replaced and files don't pile up. Workers are told apart by their PID, so the
+directory is shared by the processes of one host or container only.
+"""
+import contextlib
+import contextvars
+import fcntl
+import functools
+import ipaddress
+import json
+import os
+import re
+import threading
+import time
+import uuid
+from pathlib import Path
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+
+from core import stats as core_stats
+from core.db_metrics import get_pool_stats
+
+PREFIX = 'tagmate'
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100)
+# Type and help of every metric family, in the order they are rendered
+FAMILIES = {
+    'requests_total': ('counter', 'Requests by view, editor action, method and status'),
+    'request_duration_seconds': ('histogram', 'Request latency by view and action'),
+    'request_db_queries': ('histogram', 'DB queries per request by view and action'),
+    'request_db_seconds_total': ('counter', 'DB query time by view and action'),
+    'cache_requests_total': ('counter', 'Read cache lookups by cache and result'),
+    'cache_hit_ratio': ('gauge', 'Share of read cache lookups that were hits'),
+    'events_total': ('counter', 'Other counters of core.stats, e.g. DB connects'),
+    'db_pool_size': ('gauge', 'Open connections of the psycopg pools by DB alias'),
+    'db_pool_available': ('gauge', 'Idle connections of the psycopg pools'),
+    'db_pool_requests_waiting': ('gauge', 'Requests waiting for a pool connection'),
+}
+# Gauge families of pool stats by their key in the stats of psycopg
+POOL_GAUGES = {
+    'db_pool_size': 'pool_size',
+    'db_pool_available': 'pool_available',
+    'db_pool_requests_waiting': 'requests_waiting',
+}
+# Clients may send any method, other ones share a label to keep series bounded
+HTTP_METHODS = frozenset({'GET', 'HEAD', 'POST', 'PUT', 'PATCH', 'DELETE', 'OPTIONS'})
+LABEL_ESCAPES = str.maketrans({'\\': '\\\\', '"': '\\"', '\n': '\\n'})
+CACHE_EVENT = re.compile(r'^(?P<cache>.+)\.(?P<result>hit|miss)$')
+# Files in METRICS_DIR besides the ones of running workers
+RETIRED_FILE = 'retired.json'
+LOCK_FILE = 'metrics.lock'
+
+_lock = threading.Lock()
+_flush_lock = threading.Lock()
+# Values by family and label string, histograms hold bucket counts and the sum
+_counters = {}
+_histograms = {}
+_last_flush = 0.0
+# PID and file name of this process in METRICS_DIR
+_process_file = None
+# Queries and their seconds of the current request, set by MetricsMiddleware
+_db_usage = contextvars.ContextVar('db_usage', default=None)
+
+
+def format_labels(**labels) -> str:
+    return ','.join(
+        f'{name}="{str(value).translate(LABEL_ESCAPES)}"'
+        for name, value in labels.items()
+    )
+
+
+@functools.lru_cache(maxsize=1024)
+def get_request_labels(view: str, action: str, method: str, status: int) -> tuple:
+    """Labels of per view series and of the request counter"""
+    labels = format_labels(view=view, action=action)
+    if method not in HTTP_METHODS:
+        method = 'other'
+    return labels, labels + ',' + format_labels(method=method, status=status)
+
+
+def add_to_counter(family: str, labels: str, amount):
+    with _lock:
+        series = _counters.setdefault(family, {})
+        series[labels] = series.get(labels, 0) + amount
+
+
+def observe(family: str, labels: str, value, buckets):
+    with _lock:
+        series = _histograms.setdefault(family, {})
+        counts = series.setdefault(labels, [0] * (len(buckets) + 2))
+        # Counts of values up to each bound, over the last one, then the sum
+        index = next((i for i, bound in enumerate(buckets) if value <= bound),
+                     len(buckets))
+        counts[index] += 1
+        counts[-1] += value
+
+
+def set_action(request, action: str):
+    """Label metrics of the request with a fixed set of values, e.g. form actions"""
+    request.metrics_action = action
+
+
+def is_internal_request(request) -> bool:
+    """
+    Whether the request comes from METRICS_ALLOWED_IPS without a proxy,
+    as proxied requests of any client come from the proxy's address
+    """
+    if 'X-Forwarded-For' in request.headers:
+        return False
+    try:
+        address = ipaddress.ip_address(request.META.get('REMOTE_ADDR', ''))
+    except ValueError:
+        return False
+    return any(address in ipaddress.ip_network(network, strict=False)
+               for network in settings.METRICS_ALLOWED_IPS)
+
+
+def record_query(execute, sql, params, many, context):
+    """Execute wrapper of every DB connection, counting queries of the request"""
+    usage = _db_usage.get()
+    if usage is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        usage[0] += 1
+        usage[1] += time.perf_counter() - started
+
+
+def add_query_recorder(sender, connection, **kwargs):
+    """Used as a connection_created receiver, sent again on every pool checkout"""
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+def record_request(request, response, elapsed: float, usage: list):
+    resolver_match = getattr(request, 'resolver_match', None)
+    view = resolver_match.view_name if resolver_match else 'unmatched'
+    labels, request_labels = get_request_labels(
+        view, getattr(request, 'metrics_action', ''), request.method,
+        response.status_code)
+    add_to_counter('requests_total', request_labels, 1)
+    observe('request_duration_seconds', labels, elapsed, DURATION_BUCKETS)
+    observe('request_db_queries', labels, usage[0], QUERY_COUNT_BUCKETS)
+    add_to_counter('request_db_seconds_total', labels, usage[1])
+    flush_if_due()
+
+
+class MetricsMiddleware:
+    """
+    Record latency, status and DB usage of every request by URL name and
+    action. Placed first, so the time of other middleware counts too.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not settings.METRICS_ENABLED:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        usage = [0, 0.0]
+        token = _db_usage.set(usage)
+        started = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            _db_usage.reset(token)
+        record_request(request, response, time.perf_counter() - started, usage)
+        return response
+
+    async def __acall__(self, request):
+        # Threads running sync code of the request get a copy of the context,
+        # which refers to the same usage list
+        usage = [0, 0.0]
+        token = _db_usage.set(usage)
+        started = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _db_usage.reset(token)
+        record_request(request, response, time.perf_counter() - started, usage)
+        return response
+
+
+def get_pool_gauges() -> dict:
+    """Current stats of the connection pools of this process by gauge family"""
+    pool_stats = get_pool_stats()
+    return {
+        family: {format_labels(alias=alias): stats.get(key, 0)
+                 for alias, stats in pool_stats.items()}
+        for family, key in POOL_GAUGES.items()
+    }
+
+
+def snapshot() -> dict:
+    """Metrics of this process"""
+    with _lock:
+        metrics = {
+            'counters': {family: dict(series) for family, series in _counters.items()},
+            'histograms': {family: {labels: list(counts)
+                                    for labels, counts in series.items()}
+                           for family, series in _histograms.items()},
+            'events': core_stats.snapshot(),
+        }
+    metrics['gauges'] = get_pool_gauges()
+    return metrics
+
+
+def get_process_file() -> str:
+    """
+    Name of the file of this process. A PID may be given to a later worker,
+    so the name also holds a token of the process, made again after a fork.
+    """
+    global _process_file
+    pid = os.getpid()
+    if _process_file is None or _process_file[0] != pid:
+        _process_file = (pid, f'{pid}-{uuid.uuid4().hex}.json')
+    return _process_file[1]
+
+
+@contextlib.contextmanager
+def lock_dir(metrics_dir: Path):
+    """Hold the lock of METRICS_DIR while files of stopped workers are retired"""
+    with open(metrics_dir / LOCK_FILE, 'a') as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        yield
+
+
+def is_stopped(path: Path) -> bool:
+    """Whether the worker of a file is gone, or its PID now belongs to this process"""
+    if path.name == get_process_file():
+        return False
+    try:
+        pid = int(path.stem.split('-')[0])
+    except ValueError:
+        return False
+    if pid == os.getpid():
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return True
+    except PermissionError:
+        pass  # Running as another user
+    return False
+
+
+def empty_metrics() -> dict:
+    return {'counters': {}, 'histograms': {}, 'events': {}, 'gauges': {}}
+
+
+def read_metrics(path: Path):
+    try:
+        return json.loads(path.read_text())
+    except (OSError, ValueError):
+        return None  # Removed or damaged meanwhile
+
+
+def write_metrics(path: Path, metrics: dict):
+    temp_path = path.with_suffix('.tmp')
+    temp_path.write_text(json.dumps(metrics))
+    # Readers see the old or the new file, never a partly written one
+    os.replace(temp_path, path)
+
+
+def retire_stopped_files(metrics_dir: Path) -> dict:
+    """
+    Merge the files of stopped workers into RETIRED_FILE and remove them, so
+    their counters stay and files don't pile up over restarts. Their gauges
+    are dropped. Returns the retired metrics, called with the lock held.
+    """
+    retired_path = metrics_dir / RETIRED_FILE
+    retired = read_metrics(retired_path) or empty_metrics()
+    stopped_paths = []
+    for path in metrics_dir.glob('*.json'):
+        if path.name == RETIRED_FILE or not is_stopped(path):
+            continue
+        metrics = read_metrics(path)
+        if metrics is not None:
+            merge(retired, {**metrics, 'gauges': {}})
+            stopped_paths.append(path)
+    if stopped_paths:
+        write_metrics(retired_path, retired)
+        for path in stopped_paths:
+            path.unlink(missing_ok=True)
+    return retired
+
+
+def flush():
+    """Write metrics of this process to its file in METRICS_DIR"""
+    global _last_flush
+    if not settings.METRICS_DIR:
+        return
+    with _flush_lock:
+        _last_flush = time.monotonic()
+        metrics_dir = Path(settings.METRICS_DIR)
+        metrics_dir.mkdir(parents=True, exist_ok=True)
+        path = metrics_dir / get_process_file()
+        if not path.exists():
+            # Files of an earlier worker with this PID go before this one counts
+            with lock_dir(metrics_dir):
+                retire_stopped_files(metrics_dir)
+        write_metrics(path, snapshot())
+
+
+def flush_if_due():
+    if (settings.METRICS_DIR
+            and time.monotonic() - _last_flush >= settings.METRICS_FLUSH_SECONDS):
+        flush()
+
+
+def merge(total: dict, metrics: dict):
+    for family, series in metrics['counters'].items():
+        total_series = total['counters'].setdefault(family, {})
+        for labels, value in series.items():
+            total_series[labels] = total_series.get(labels, 0) + value
+    for family, series in metrics['histograms'].items():
+        total_series = total['histograms'].setdefault(family, {})
+        for labels, counts in series.items():
+            if labels in total_series:
+                total_series[labels] = [a + b for a, b in zip(total_series[labels],
+                                                              counts)]
+            else:
+                total_series[labels] = list(counts)
+    for name, value in metrics['events'].items():
+        total['events'][name] = total['events'].get(name, 0) + value
+    # Pools of the workers add up, files written before gauges have none
+    for family, series in metrics.get('gauges', {}).items():
+        total_series = total['gauges'].setdefault(family, {})
+        for labels, value in series.items():
+            total_series[labels] = total_series.get(labels, 0) + value
+
+
+def collect() -> dict:
+    """Metrics of all workers sharing METRICS_DIR, or of this process only"""
+    if not settings.METRICS_DIR:
+        return snapshot()
+    flush()
+    metrics_dir = Path(settings.METRICS_DIR)
+    with lock_dir(metrics_dir):
+        total = retire_stopped_files(metrics_dir)
+        for path in metrics_dir.glob('*.json'):
+            metrics = read_metrics(path) if path.name != RETIRED_FILE else None
+            if metrics is not None:
+                merge(total, metrics)
+    return total
+
+
+def format_value(value) -> str:
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def render_histogram(name: str, series: dict, buckets) -> list:
+    lines = []
+    for labels, counts in sorted(series.items()):
+        cumulative = 0
+        for bound, count in zip(buckets + (float('inf'),), counts):
+            cumulative += count
+            le = '+Inf' if bound == float('inf') else format_value(bound)
+            lines.append(f'{name}_bucket{{{labels},le="{le}"}} {cumulative}')
+        lines.append(f'{name}_sum{{{labels}}} {format_value(counts[-1])}')
+        lines.append(f'{name}_count{{{labels}}} {cumulative}')
+    return lines
+
+
+def render(metrics: dict) -> str:
+    """Render collected metrics in the Prometheus text exposition format"""
+    counters = dict(metrics['counters'])
+    cache_requests = counters.setdefault('cache_requests_total', {})
+    events = counters.setdefault('events_total', {})
+    hits = {}
+    for name, value in sorted(metrics['events'].items()):
+        match = CACHE_EVENT.match(name)
+        if match:
+            cache_requests[format_labels(**match.groupdict())] = value
+            cache_hits = hits.setdefault(match['cache'], [0, 0])
+            cache_hits[match['result'] == 'miss'] += value
+        else:
+            events[format_labels(name=name)] = value
+    gauges = {**metrics.get('gauges', {}), 'cache_hit_ratio': {
+        format_labels(cache=cache): hit / (hit + miss)
+        for cache, (hit, miss) in hits.items() if hit + miss
+    }}
+
+    lines = []
+    for family, (metric_type, help_text) in FAMILIES.items():
+        name = f'{PREFIX}_{family}'
+        lines.append(f'# HELP {name} {help_text}')
+        lines.append(f'# TYPE {name} {metric_type}')
+        if metric_type == 'histogram':
+            buckets = (DURATION_BUCKETS if family == 'request_duration_seconds'
+                       else QUERY_COUNT_BUCKETS)
+            lines.extend(render_histogram(
+                name, metrics['histograms'].get(family, {}), buckets))
+            continue
+        series = counters.get(family) or gauges.get(family) or {}
+        for labels, value in sorted(series.items()):
+            lines.append(f'{name}{{{labels}}} {format_value(value)}')
+    return '\n'.join(lines) + '\n'
+
+
+def reset():
+    global _last_flush
+    with _lock:
+        _counters.clear()
+        _histograms.clear()
+        _last_flush = 0.0
@@ -0,0 +1,126 @@
+"""
+Compression of text responses with Brotli or gzip, whichever the client accepts
+"""
+import zlib
+
+from django.conf import settings
+from django.utils.cache import patch_vary_headers
+from django.utils.deprecation import MiddlewareMixin
+from django.utils.text import compress_string
+
+try:
+    import brotli
+except ImportError:  # Brotli is optional, responses are gzipped then
+    brotli = None
+
+COMPRESSIBLE_TYPES = (
+    'text/html', 'text/css', 'text/javascript', 'text/plain',
+    'application/json', 'application/javascript', 'image/svg+xml',
+)
+# Fast levels, responses are compressed on every request
+BROTLI_QUALITY = 5
+GZIP_LEVEL = 6
+# Random bytes in the gzip header against BREACH, like GZipMiddleware does
+GZIP_MAX_RANDOM_BYTES = 100
+
+
+def get_accepted_encodings(header: str) -> set:
+    """Content codings of an Accept-Encoding header, except ones with q=0"""
+    accepted = set()
+    for item in header.split(','):
+        name, *params = [part.strip() for part in item.split(';')]
+        quality = 1.0
+        for param in params:
+            if param.startswith('q='):
+                try:
+                    quality = float(param[2:])
+                except ValueError:
+                    quality = 0.0
+        if name and quality > 0:
+            accepted.add(name.lower())
+    return accepted
+
+
+def get_stream_compressor(encoding):
+    """Return functions compressing a chunk and ending the stream"""
+    if encoding == 'br':
+        compressor = brotli.Compressor(quality=BROTLI_QUALITY)
+        return (lambda chunk: compressor.process(chunk) + compressor.flush(),
+                compressor.finish)
+    compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    return (lambda chunk: (compressor.compress(chunk)
+                           + compressor.flush(zlib.Z_SYNC_FLUSH)),
+            compressor.flush)
+
+
+def compress_stream(chunks, encoding):
+    compress, finish = get_stream_compressor(encoding)
+    for chunk in chunks:
+        # Every chunk is flushed, so the client gets it without waiting for the end
+        data = compress(chunk)
+        if data:
+            yield data
+    yield finish()
+
+
+async def compress_async_stream(chunks, encoding):
+    compress, finish = get_stream_compressor(encoding)
+    async for chunk in chunks:
+        data = compress(chunk)
+        if data:
+            yield data
+    yield finish()
+
+
+class CompressionMiddleware(MiddlewareMixin):
+    """
+    Compress HTML, JSON and other text responses, like GZipMiddleware, but
+    preferring Brotli when the client accepts it and the package is installed.
+    Responses under COMPRESSION_MIN_SIZE bytes are sent as they are.
+    """
+
+    def process_response(self, request, response):
+        if response.has_header('Content-Encoding'):
+            return response
+        content_type = response.get('Content-Type', '').split(';')[0].strip().lower()
+        if content_type not in COMPRESSIBLE_TYPES:
+            return response
+        if (not response.streaming
+                and len(response.content) < settings.COMPRESSION_MIN_SIZE):
+            return response
+
+        patch_vary_headers(response, ('Accept-Encoding',))
+        accepted = get_accepted_encodings(request.headers.get('Accept-Encoding', ''))
+        if brotli is not None and 'br' in accepted:
+            encoding = 'br'
+        elif 'gzip' in accepted:
+            encoding = 'gzip'
+        else:
+            return response
+
+        if response.streaming:
+            if response.is_async:
+                response.streaming_content = compress_async_stream(
+                    response.streaming_content, encoding)
+            else:
+                response.streaming_content = compress_stream(
+                    response.streaming_content, encoding)
+            # The compressed length isn't known before the end
+            del response.headers['Content-Length']
+        else:
+            if encoding == 'br':
+                compressed = brotli.compress(response.content, quality=BROTLI_QUALITY)
+            else:
+                compressed = compress_string(
+                    response.content, max_random_bytes=GZIP_MAX_RANDOM_BYTES)
+            if len(compressed) >= len(response.content):
+                return response
+            response.content = compressed
+            response.headers['Content-Length'] = str(len(compressed))
+
+        # Compressed bytes differ from the ones a strong ETag was computed for
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response.headers['ETag'] = 'W/' + etag
+        response.headers['Content-Encoding'] = encoding
+        return response
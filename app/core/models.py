@@ -3,6 +3,7 @@ Database models
 """
 
 from django.db import models
+from django.utils import timezone
 from django.contrib.auth.models import (
     AbstractBaseUser,
     BaseUserManager,
@@ -43,3 +44,27 @@ class User(AbstractBaseUser, PermissionsMixin):
     objects = UserManager()
 
     USERNAME_FIELD = 'email'
+
+
+class Job(models.Model):
+    """Deferred work run outside of user requests, see core.jobs"""
+    kind = models.CharField(max_length=64)
+    # Tells apart jobs of the same kind, e.g. the id of the processed object
+    key = models.CharField(max_length=255, blank=True, default='')
+    run_after = models.DateTimeField(default=timezone.now)
+    locked_until = models.DateTimeField(null=True, blank=True)
+    attempts = models.PositiveIntegerField(default=0)
+    progress = models.JSONField(default=dict, blank=True)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['kind', 'key'], name='job_kind_key_unique'),
+        ]
+        indexes = [
+            models.Index(fields=['run_after'], name='job_run_after_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.kind}:{self.key}" if self.key else self.kind
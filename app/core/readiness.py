@@ -0,0 +1,113 @@
+"""
+Readiness of this process to serve requests, reported by core.views.ready,
+and the backoff used while waiting for the database at startup
+"""
+import logging
+import random
+import threading
+import time
+
+from django.conf import settings
+from django.db import connections
+from django.db.migrations.executor import MigrationExecutor
+
+from core.db_metrics import get_pool_stats
+
+logger = logging.getLogger(__name__)
+
+_lock = threading.Lock()
+# Expiry time and result of the last run of the checks
+_cached = None
+# Migrations of the running code stay applied, so they are checked until they are
+_migrations_applied = set()
+
+
+class NotReady(Exception):
+    pass
+
+
+def backoff_delays(initial: float = 0.1, max_delay: float = 5.0, factor: float = 2.0):
+    """
+    Endless delays growing exponentially up to max_delay. Each one is picked
+    between half and all of it, so containers started together don't retry
+    in lockstep.
+    """
+    delay = initial
+    while True:
+        yield random.uniform(delay / 2, delay)
+        delay = min(delay * factor, max_delay)
+
+
+def check_database(alias: str = 'default'):
+    with connections[alias].cursor() as cursor:
+        cursor.execute('SELECT 1')
+
+
+def check_migrations(alias: str = 'default'):
+    if alias in _migrations_applied:
+        return
+    executor = MigrationExecutor(connections[alias])
+    plan = executor.migration_plan(executor.loader.graph.leaf_nodes())
+    if plan:
+        raise NotReady(f"{len(plan)} migrations are not applied")
+    _migrations_applied.add(alias)
+
+
+def check_pools():
+    """A pool with no free connections and requests waiting for one is saturated"""
+    for alias, pool_stats in get_pool_stats().items():
+        if pool_stats.get('requests_waiting') and not pool_stats.get('pool_available'):
+            raise NotReady(f"Connection pool of {alias} is saturated")
+
+
+CHECKS = [
+    ('database', check_database),
+    ('migrations', check_migrations),
+    ('pool', check_pools),
+]
+
+
+def run_checks() -> dict:
+    """
+    Run the checks until one fails. The database round trip has to fit in
+    READY_LATENCY_BUDGET_MS. Reasons of failures are logged, not returned,
+    as the probe is public.
+    """
+    checks = {}
+    for name, check in CHECKS:
+        started = time.perf_counter()
+        try:
+            check()
+            ok = True
+        except Exception as e:
+            logger.warning("Readiness check %s failed: %r", name, e)
+            ok = False
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        if ok and name == 'database' and elapsed_ms > settings.READY_LATENCY_BUDGET_MS:
+            logger.warning("Readiness check %s took %.0f ms", name, elapsed_ms)
+            ok = False
+        checks[name] = {'ok': ok, 'ms': round(elapsed_ms, 1)}
+        if not ok:
+            break
+    return {'ready': len(checks) == len(CHECKS) and all(
+        check['ok'] for check in checks.values()), 'checks': checks}
+
+
+def get_readiness() -> dict:
+    """
+    Result of the checks, reused for READY_CACHE_SECONDS. Probes arriving
+    while the checks run wait for their result instead of running them again.
+    """
+    global _cached
+    with _lock:
+        now = time.monotonic()
+        if _cached is None or _cached[0] <= now:
+            _cached = (now + settings.READY_CACHE_SECONDS, run_checks())
+        return _cached[1]
+
+
+def reset():
+    global _cached
+    with _lock:
+        _cached = None
+        _migrations_applied.clear()
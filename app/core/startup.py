@@ -0,0 +1,149 @@
+"""
+Fingerprints of the inputs of container startup steps, so the startup command
+skips steps whose inputs didn't change since their last successful run.
+
+Fingerprints of database steps are stored in a Job row of the database they
+changed. Static files carry theirs in a file next to them: the image collects
+them at build time and a container copies them to the STATIC_ROOT volume only
+when the volume holds files of other sources or settings.
+"""
+import hashlib
+import os
+import shutil
+from pathlib import Path
+
+from django.apps import apps
+from django.conf import settings
+from django.contrib.staticfiles.finders import get_finders
+from django.core.management import call_command
+from django.db import DatabaseError
+from django.template.utils import get_app_template_dirs
+
+from core.models import Job
+
+# Job row keeping fingerprints of the last successful steps, no runner handles this kind
+STARTUP_STATE_JOB = 'core.startup'
+STATIC_FINGERPRINT_FILE = '.startup-fingerprint'
+# Patterns collectstatic ignores by default
+STATIC_IGNORE_PATTERNS = ['CVS', '.*', '*~']
+# Cache backends keeping entries in the memory of each process
+PER_PROCESS_CACHE_BACKENDS = ('django.core.cache.backends.locmem.LocMemCache',)
+
+
+def get_fingerprint(files, *values) -> str:
+    """Hash of (name, path) pairs of files, in any order, and of the given values"""
+    digest = hashlib.sha256()
+    for value in values:
+        digest.update(repr(value).encode() + b'\0')
+    for name, path in sorted((name, str(path)) for name, path in files):
+        digest.update(name.encode() + b'\0')
+        digest.update(Path(path).read_bytes() + b'\0')
+    return digest.hexdigest()
+
+
+def get_migrations_fingerprint() -> str:
+    files = []
+    for app_config in apps.get_app_configs():
+        for path in (Path(app_config.path) / 'migrations').glob('*.py'):
+            files.append((f'{app_config.label}/{path.name}', path))
+    return get_fingerprint(files)
+
+
+def get_superuser_fingerprint() -> str:
+    return get_fingerprint([], os.getenv('SU_UID', ''), os.getenv('SU_EMAIL', ''))
+
+
+def get_static_fingerprint() -> str:
+    """
+    Hash of static sources, templates, whose {% compress %} blocks make
+    the compressor output and manifest, and settings changing the output
+    """
+    files = []
+    for finder in get_finders():
+        for path, storage in finder.list(STATIC_IGNORE_PATTERNS):
+            files.append((f'static/{path}', storage.path(path)))
+    template_dirs = [Path(template_dir) for template_dir in get_app_template_dirs(
+        'templates')]
+    for engine in settings.TEMPLATES:
+        template_dirs.extend(Path(template_dir) for template_dir in engine['DIRS'])
+    for template_dir in template_dirs:
+        for path in template_dir.rglob('*'):
+            if path.is_file():
+                files.append((f'templates/{path.relative_to(template_dir)}', path))
+    return get_fingerprint(
+        files, settings.STATIC_URL, settings.STORAGES['staticfiles']['BACKEND'],
+        settings.COMPRESS_ENABLED, settings.COMPRESS_OFFLINE, settings.COMPRESS_FILTERS,
+    )
+
+
+def is_static_enabled() -> bool:
+    """Static files are served from STATIC_ROOT in production or with DEBUG off"""
+    return settings.IS_PRODUCTION or not settings.DEBUG
+
+
+def get_cache_sharing_error():
+    """
+    Generations of the read cache are counters in the cache, so workers with
+    caches of their own miss each other's writes and serve stale pages
+    """
+    backend = settings.CACHES[settings.READ_CACHE_ALIAS]['BACKEND']
+    if settings.GUNICORN_WORKERS > 1 and backend in PER_PROCESS_CACHE_BACKENDS:
+        return (f"GUNICORN_WORKERS is {settings.GUNICORN_WORKERS}, but {backend} "
+                f"is per process, set CACHE_BACKEND to a cache shared by workers")
+    return None
+
+
+def read_static_fingerprint(root: Path):
+    try:
+        return (root / STATIC_FINGERPRINT_FILE).read_text()
+    except FileNotFoundError:
+        return None
+
+
+def collect_static(fingerprint: str, stdout):
+    """Collect and compress static files into STATIC_ROOT, then store the fingerprint"""
+    call_command('collectstatic', interactive=False, stdout=stdout)
+    # Compressor refuses to run offline compression when it's turned off
+    if settings.COMPRESS_OFFLINE:
+        call_command('compress', stdout=stdout)
+    # Written last, so files of an interrupted run are collected again
+    (Path(settings.STATIC_ROOT) / STATIC_FINGERPRINT_FILE).write_text(fingerprint)
+
+
+def publish_static(stdout, force: bool = False) -> bool:
+    """
+    Bring STATIC_ROOT up to date, returns False if it already was.
+    Files collected at build time into STATIC_BUILD_ROOT are copied when they
+    match, otherwise the files are collected again.
+    """
+    fingerprint = get_static_fingerprint()
+    static_root = Path(settings.STATIC_ROOT)
+    if not force and read_static_fingerprint(static_root) == fingerprint:
+        return False
+
+    build_root = Path(settings.STATIC_BUILD_ROOT)
+    if read_static_fingerprint(build_root) != fingerprint:
+        collect_static(fingerprint, stdout)
+        return True
+
+    stdout.write(f"Copying static files collected at build time from {build_root}\n")
+    # Files of older versions are kept for pages still referring to them
+    shutil.copytree(build_root, static_root, dirs_exist_ok=True,
+                    ignore=shutil.ignore_patterns(STATIC_FINGERPRINT_FILE))
+    (static_root / STATIC_FINGERPRINT_FILE).write_text(fingerprint)
+    return True
+
+
+def read_state() -> dict:
+    """Fingerprints of steps by name, empty before the first migration"""
+    try:
+        job = Job.objects.filter(kind=STARTUP_STATE_JOB).first()
+    except DatabaseError:
+        return {}
+    return job.progress if job else {}
+
+
+def save_state(name: str, fingerprint: str):
+    job, _ = Job.objects.get_or_create(kind=STARTUP_STATE_JOB)
+    job.progress[name] = fingerprint
+    job.save(update_fields=['progress'])
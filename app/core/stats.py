@@ -0,0 +1,24 @@
+"""
+In-process counters, e.g. cache hits and misses, shown to staff by core.views.stats
+"""
+import threading
+from collections import Counter
+
+_lock = threading.Lock()
+_counters = Counter()
+
+
+def incr(name: str, amount=1):
+    with _lock:
+        _counters[name] += amount
+
+
+def snapshot() -> dict:
+    """Return a copy of all counters"""
+    with _lock:
+        return dict(_counters)
+
+
+def reset():
+    with _lock:
+        _counters.clear()
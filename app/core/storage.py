@@ -0,0 +1,18 @@
+"""
+Storage of django-compressor output with precompressed siblings
+"""
+from compressor.storage import CompressorFileStorage
+from whitenoise.compress import Compressor
+
+
+class PrecompressedCompressorFileStorage(CompressorFileStorage):
+    """
+    Also writes .br (when Brotli is installed) and .gz files next to every
+    combined CSS/JS file, unless compression doesn't make them smaller.
+    Names of the output files contain a hash of their content already.
+    """
+
+    def save(self, filename, content):
+        filename = super().save(filename, content)
+        Compressor(quiet=True).compress(self.path(filename))
+        return filename
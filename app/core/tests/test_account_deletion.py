@@ -1,9 +1,12 @@
-from django.test import TestCase, Client
+from django.db import connection
+from django.test import TestCase, Client, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from django.contrib.auth import get_user_model
 from allauth.socialaccount.models import SocialAccount, SocialApp
 from posts.models import Tag, TagGroup, Post, PostTag
 from django.contrib.messages import get_messages
+from core.jobs import run_due_jobs
 
 
 User = get_user_model()
@@ -252,12 +255,12 @@ class DeleteAccountTests(TestCase):
         self.assertEqual(other_user.posts.count(), 1)
         self.assertEqual(other_user.tag_groups.count(), 1)
 
-    def test_cascade_deletion_signals_triggered(self):
-        """Test that the pre_delete signals are triggered for tag cleanup"""
+    def test_cascade_deletion_cleans_orphaned_tags(self):
+        """Test that the deletion engine cleans up tags of the deleted account"""
         self.client.force_login(self.user)
 
-        # This test verifies that the signals work by checking the end result
-        # If signals weren't triggered, orphaned tags would remain
+        # This test verifies the tag cleanup by checking the end result
+        # If it didn't run, orphaned tags would remain
 
         expected_to_remain = {'shared'}  # Only tag used by other user
         expected_to_be_deleted = {'tg_tag', 'post_tag', 'orphan'}
@@ -277,3 +280,53 @@ class DeleteAccountTests(TestCase):
         # Verify expected tags remained
         for tag_name in expected_to_remain:
             self.assertIn(tag_name, tags_after, f"Tag '{tag_name}' should have remained")
+
+    def create_tagged_account(self, email, post_count, tag_count):
+        user = User.objects.create_user(email=email)
+        tags = Tag.objects.bulk_create(
+            [Tag(name=f'{user.pk}bulk{i}') for i in range(tag_count)])
+        posts = Post.objects.bulk_create(
+            [Post(user=user, title=f'Bulk {i}') for i in range(post_count)])
+        PostTag.objects.bulk_create([
+            PostTag(post=post, tag=tag, position=position)
+            for post in posts for position, tag in enumerate(tags)
+        ])
+        return user
+
+    def count_deletion_queries(self, user) -> int:
+        self.client.force_login(user)
+        with CaptureQueriesContext(connection) as queries:
+            self.client.post(reverse('delete_account'))
+        self.assertFalse(User.objects.filter(id=user.id).exists())
+        return len(queries)
+
+    def test_deletion_query_count_does_not_grow_with_posts(self):
+        """Test that the account data is removed with set-based statements"""
+        small = self.create_tagged_account('small@example.com', 2, 2)
+        large = self.create_tagged_account('large@example.com', 50, 10)
+
+        small_queries = self.count_deletion_queries(small)
+        large_queries = self.count_deletion_queries(large)
+
+        self.assertEqual(large_queries, small_queries)
+        self.assertLess(large_queries, 40)
+        self.assertFalse(PostTag.objects.filter(post__title__startswith='Bulk').exists())
+
+    @override_settings(ACCOUNT_DELETION_SYNC_LIMIT=1, ACCOUNT_DELETION_BATCH_SIZE=1)
+    def test_large_account_is_deleted_in_background(self):
+        self.client.force_login(self.user)
+
+        response = self.client.post(reverse('delete_account'))
+
+        messages = list(get_messages(response.wsgi_request))
+        self.assertIn('in the background', str(messages[0]))
+        self.user.refresh_from_db()
+        self.assertFalse(self.user.is_active)
+        self.assertTrue(Post.objects.filter(user=self.user).exists())
+
+        run_due_jobs()
+
+        self.assertFalse(User.objects.filter(id=self.user.id).exists())
+        self.assertFalse(Post.objects.filter(id=self.user_post.id).exists())
+        self.assertFalse(TagGroup.objects.filter(id=self.user_taggroup.id).exists())
+        self.assertEqual(set(Tag.objects.values_list('name', flat=True)), {'shared'})
@@ -0,0 +1,77 @@
+import gzip
+import tempfile
+from pathlib import Path
+
+import brotli
+from django.core.files.base import ContentFile
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
+from django.test import RequestFactory, SimpleTestCase, override_settings
+
+from core.middleware import CompressionMiddleware, get_accepted_encodings
+from core.storage import PrecompressedCompressorFileStorage
+
+CONTENT = '<svg><path d="M0 0h24v24H0z"/></svg>' * 100
+
+
+@override_settings(COMPRESSION_MIN_SIZE=200)
+class CompressionMiddlewareTests(SimpleTestCase):
+    def compress(self, response, accept_encoding='gzip, deflate, br'):
+        request = RequestFactory().get('/', headers={'Accept-Encoding': accept_encoding})
+        return CompressionMiddleware(lambda request: response)(request)
+
+    def test_brotli_is_preferred(self):
+        response = self.compress(HttpResponse(CONTENT))
+        self.assertEqual(response['Content-Encoding'], 'br')
+        self.assertEqual(brotli.decompress(response.content).decode(), CONTENT)
+        self.assertEqual(response['Content-Length'], str(len(response.content)))
+        self.assertIn('Accept-Encoding', response['Vary'])
+
+    def test_gzip_without_brotli(self):
+        response = self.compress(JsonResponse({'html': CONTENT}),
+                                 accept_encoding='gzip, br;q=0')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertIn(b'<svg>', gzip.decompress(response.content))
+
+    def test_small_and_binary_responses_are_kept(self):
+        response = self.compress(HttpResponse('short'))
+        self.assertFalse(response.has_header('Content-Encoding'))
+        response = self.compress(HttpResponse(CONTENT, content_type='image/png'))
+        self.assertFalse(response.has_header('Content-Encoding'))
+
+    def test_identity_only_client(self):
+        response = self.compress(HttpResponse(CONTENT), accept_encoding='identity')
+        self.assertFalse(response.has_header('Content-Encoding'))
+        self.assertEqual(response.content.decode(), CONTENT)
+
+    def test_strong_etag_is_weakened(self):
+        response = HttpResponse(CONTENT)
+        response['ETag'] = '"abc"'
+        self.assertEqual(self.compress(response)['ETag'], 'W/"abc"')
+
+    def test_streaming_response(self):
+        chunks = [CONTENT.encode()] * 3
+        for encoding, decompress in (('br', brotli.decompress),
+                                     ('gzip', gzip.decompress)):
+            response = self.compress(StreamingHttpResponse(iter(chunks)),
+                                     accept_encoding=encoding)
+            self.assertEqual(response['Content-Encoding'], encoding)
+            self.assertEqual(decompress(b''.join(response.streaming_content)),
+                             b''.join(chunks))
+
+    def test_accepted_encodings(self):
+        self.assertEqual(get_accepted_encodings('gzip;q=0.5, BR, deflate;q=0'),
+                         {'gzip', 'br'})
+
+
+class PrecompressedStorageTests(SimpleTestCase):
+    def test_output_gets_compressed_siblings(self):
+        with tempfile.TemporaryDirectory() as root:
+            storage = PrecompressedCompressorFileStorage(location=root)
+            name = storage.save('CACHE/css/output.0123456789ab.css',
+                                ContentFile(CONTENT.encode()))
+
+            path = Path(root) / name
+            self.assertEqual(brotli.decompress(
+                path.with_name(path.name + '.br').read_bytes()), CONTENT.encode())
+            self.assertEqual(gzip.decompress(
+                path.with_name(path.name + '.gz').read_bytes()), CONTENT.encode())
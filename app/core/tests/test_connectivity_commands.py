@@ -1,8 +1,10 @@
 """
 Test Django management commands
 """
+from io import StringIO
 from unittest.mock import patch, MagicMock
 from django.core.management import call_command
+from django.core.management.base import CommandError
 from django.db.utils import OperationalError
 from django.test import TestCase
 from psycopg2 import OperationalError as Psycopg2Error
@@ -37,3 +39,29 @@ class ConnectivityCommandTests(TestCase):
 
         # Ensure it retried 6 times
         self.assertEqual(mocked_conn.cursor.call_count, 6)
+
+    @patch('time.sleep', return_value=None)
+    def test_wait_for_db_backs_off(self, mocked_sleep, mocked_getitem):
+        """Test waits grow up to the max delay"""
+        mocked_conn = MagicMock()
+        mocked_conn.cursor.side_effect = [OperationalError] * 8 + [MagicMock()]
+        mocked_getitem.return_value = mocked_conn
+
+        call_command('wait_for_db', max_delay=1, stdout=StringIO())
+
+        delays = [call.args[0] for call in mocked_sleep.call_args_list]
+        self.assertLess(delays[0], 0.2)
+        self.assertTrue(all(delay <= 1 for delay in delays))
+        self.assertGreaterEqual(delays[-1], 0.5)
+
+    @patch('time.sleep', return_value=None)
+    def test_wait_for_db_deadline(self, mocked_sleep, mocked_getitem):
+        """Test giving up when the database is unavailable for too long"""
+        mocked_conn = MagicMock()
+        mocked_conn.cursor.side_effect = OperationalError
+        mocked_getitem.return_value = mocked_conn
+
+        with self.assertRaises(CommandError):
+            call_command('wait_for_db', timeout=0, stdout=StringIO())
+
+        mocked_sleep.assert_not_called()
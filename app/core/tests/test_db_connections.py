@@ -0,0 +1,57 @@
+from io import StringIO
+from unittest.mock import MagicMock, patch
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection, connections
+from django.db.backends.signals import connection_created
+from django.test import TestCase, TransactionTestCase
+from django.urls import reverse
+
+from core import stats
+from core.db_metrics import get_pool_stats
+from posts.models import Post
+
+User = get_user_model()
+
+
+class ConnectionMetricsTests(TestCase):
+    def setUp(self):
+        stats.reset()
+
+    def test_connects_are_counted(self):
+        connection_created.send(sender=type(connection), connection=connection)
+        self.assertEqual(stats.snapshot(), {f'db.{connection.alias}.connects': 1})
+
+    def test_pool_stats_of_pooled_connections(self):
+        self.assertEqual(get_pool_stats(), {})
+
+        wrapper = connections[connection.alias]
+        pool = MagicMock()
+        pool.get_stats.return_value = {'pool_size': 2, 'requests_wait_ms': 5}
+        with patch.dict(wrapper.settings_dict['OPTIONS'], {'pool': {'max_size': 4}}), \
+                patch.object(type(wrapper), 'pool', pool, create=True):
+            self.assertEqual(get_pool_stats(), {
+                connection.alias: {'pool_size': 2, 'requests_wait_ms': 5}})
+
+    def test_stats_view_shows_pools(self):
+        staff = User.objects.create(email='db_staff@example.com', is_staff=True)
+        self.client.force_login(staff)
+        response = self.client.get(reverse('stats'))
+        self.assertEqual(response.json()['db_pools'], {})
+
+
+class BenchmarkDbConnectionsCommandTest(TransactionTestCase):
+    # The command closes connections between modes, which ends the
+    # transaction of a TestCase on PostgreSQL
+    def test_reports_throughput_and_cleans_up(self):
+        out = StringIO()
+        call_command('benchmark_db_connections', '--requests', '3', stdout=out)
+
+        output = out.getvalue()
+        self.assertIn('New connection per request, health_check:', output)
+        self.assertIn('Persistent connections, post_editor:', output)
+        self.assertNotIn('Connection pool', output)
+        self.assertEqual(connection.settings_dict['CONN_MAX_AGE'], 0)
+        self.assertFalse(Post.objects.exists())
+        self.assertFalse(User.objects.exists())
@@ -0,0 +1,99 @@
+from datetime import timedelta
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from core import jobs
+from core.jobs import claim_due_job, run_due_jobs, run_job, schedule_job
+from core.models import Job
+
+TEST_JOB = 'core.test_job'
+
+
+class JobTests(TestCase):
+    def setUp(self):
+        self.runs = []
+        self.next_delay = None
+        self.fail = False
+        jobs.JOB_HANDLERS[TEST_JOB] = self.handle_job
+        self.addCleanup(jobs.JOB_HANDLERS.pop, TEST_JOB)
+
+    def handle_job(self, job):
+        self.runs.append(job.key)
+        job.progress['runs'] = job.progress.get('runs', 0) + 1
+        if self.fail:
+            raise RuntimeError('broken')
+        return self.next_delay
+
+    def test_schedule_job_is_deduplicated(self):
+        schedule_job(TEST_JOB, delay=600)
+        schedule_job(TEST_JOB, delay=1200)
+        schedule_job(TEST_JOB)
+
+        job = Job.objects.get(kind=TEST_JOB)
+        self.assertLessEqual(job.run_after, timezone.now())
+
+    def test_due_jobs_run_and_finished_jobs_are_removed(self):
+        schedule_job(TEST_JOB, key='a')
+        schedule_job(TEST_JOB, key='b')
+        schedule_job(TEST_JOB, key='later', delay=600)
+
+        self.assertEqual(run_due_jobs(), 2)
+
+        self.assertEqual(sorted(self.runs), ['a', 'b'])
+        self.assertEqual(list(Job.objects.values_list('key', flat=True)), ['later'])
+
+    def test_returned_delay_reschedules_job(self):
+        self.next_delay = 600
+        schedule_job(TEST_JOB)
+
+        run_due_jobs()
+
+        job = Job.objects.get(kind=TEST_JOB)
+        self.assertGreater(job.run_after, timezone.now() + timedelta(seconds=500))
+        self.assertIsNone(job.locked_until)
+        self.assertEqual(job.progress, {'runs': 1})
+
+    @override_settings(JOB_RETRY_DELAY=600)
+    def test_failed_job_is_retried_later(self):
+        self.fail = True
+        schedule_job(TEST_JOB)
+
+        with self.assertLogs('core.jobs', 'ERROR'):
+            self.assertEqual(run_due_jobs(), 1)
+
+        job = Job.objects.get(kind=TEST_JOB)
+        self.assertIn('broken', job.last_error)
+        self.assertEqual(job.attempts, 1)
+        self.assertGreater(job.run_after, timezone.now())
+
+    def test_locked_job_is_skipped_until_lock_expires(self):
+        schedule_job(TEST_JOB)
+        job = claim_due_job()
+        self.assertIsNone(claim_due_job())
+
+        Job.objects.filter(pk=job.pk).update(
+            locked_until=timezone.now() - timedelta(seconds=1))
+        self.assertEqual(claim_due_job().pk, job.pk)
+        # The first runner lost its lock, its outcome is dropped
+        run_job(job)
+        self.assertTrue(Job.objects.filter(pk=job.pk).exists())
+
+    def test_job_scheduled_during_run_stays(self):
+        schedule_job(TEST_JOB)
+        job = claim_due_job()
+        Job.objects.filter(pk=job.pk).update(run_after=timezone.now())
+
+        run_job(job)
+
+        job.refresh_from_db()
+        self.assertIsNone(job.locked_until)
+
+    def test_run_jobs_command(self):
+        schedule_job(TEST_JOB)
+        out = StringIO()
+        call_command('run_jobs', stdout=out)
+        self.assertIn('Ran 1 jobs', out.getvalue())
+        self.assertEqual(self.runs, [''])
@@ -0,0 +1,202 @@
+"""
+Test request metrics and their Prometheus endpoint
+"""
+import json
+import os
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from core import metrics
+from core import stats as core_stats
+from posts.models import Post
+
+User = get_user_model()
+
+
+class MetricsTests(TestCase):
+    def setUp(self):
+        metrics.reset()
+        core_stats.reset()
+        self.user = User.objects.create(email='metrics@example.com')
+        self.client.force_login(self.user)
+        self.post = Post.objects.create(user=self.user, title='Metrics Post')
+        self.url = reverse('post_editor', args=[self.post.pk])
+
+    def get_metrics(self) -> str:
+        response = self.client.get(reverse('metrics'))
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['Content-Type'].startswith('text/plain'))
+        return response.content.decode()
+
+    def test_requests_are_recorded_by_view(self):
+        self.client.get(self.url)
+
+        labels = 'view="post_editor",action=""'
+        output = self.get_metrics()
+        self.assertIn(f'tagmate_requests_total{{{labels},method="GET",status="200"}} 1',
+                      output)
+        self.assertIn(f'tagmate_request_duration_seconds_count{{{labels}}} 1', output)
+        self.assertIn(f'tagmate_request_duration_seconds_bucket{{{labels},le="+Inf"}} 1',
+                      output)
+        self.assertIn('# TYPE tagmate_request_duration_seconds histogram', output)
+
+    def test_db_queries_are_recorded(self):
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(self.url)
+
+        series = metrics.snapshot()['histograms']['request_db_queries']
+        counts = series['view="post_editor",action=""']
+        self.assertEqual(counts[-1], len(queries.captured_queries))
+        self.assertGreater(
+            metrics.snapshot()['counters']['request_db_seconds_total'][
+                'view="post_editor",action=""'], 0)
+
+    async def test_async_requests_are_recorded(self):
+        await self.async_client.aforce_login(self.user)
+        response = await self.async_client.get(reverse('sidebar_items'),
+                                               {'item_type': 'post'})
+        self.assertEqual(response.status_code, 200)
+
+        counts = metrics.snapshot()['histograms']['request_db_queries'][
+            'view="sidebar_items",action=""']
+        # Queries run in threads of sync_to_async and count too
+        self.assertGreater(counts[-1], 0)
+
+    def test_editor_actions_are_labeled(self):
+        self.client.post(self.url, {'action': 'update_post_title', 'post_title': 'New'})
+        self.client.post(self.url, {'action': 'unknown<script>'})
+
+        counters = metrics.snapshot()['counters']['requests_total']
+        self.assertIn('view="post_editor",action="update_post_title",method="POST",'
+                      'status="302"', counters)
+        self.assertIn('view="post_editor",action="other",method="POST",'
+                      'status="200"', counters)
+
+    def test_cache_hit_ratio(self):
+        core_stats.incr('read_cache.post.hit', 3)
+        core_stats.incr('read_cache.post.miss')
+        core_stats.incr('db.default.connects')
+
+        output = metrics.render(metrics.snapshot())
+
+        self.assertIn('tagmate_cache_requests_total{cache="read_cache.post",'
+                      'result="hit"} 3', output)
+        self.assertIn('tagmate_cache_hit_ratio{cache="read_cache.post"} 0.75', output)
+        self.assertIn('tagmate_events_total{name="db.default.connects"} 1', output)
+
+    def test_pool_stats_are_gauges(self):
+        pool_stats = {'default': {'pool_size': 4, 'pool_available': 1,
+                                  'requests_waiting': 2, 'requests_num': 9}}
+        with patch('core.metrics.get_pool_stats', return_value=pool_stats):
+            output = self.get_metrics()
+
+        self.assertIn('# TYPE tagmate_db_pool_size gauge', output)
+        self.assertIn('tagmate_db_pool_size{alias="default"} 4', output)
+        self.assertIn('tagmate_db_pool_available{alias="default"} 1', output)
+        self.assertIn('tagmate_db_pool_requests_waiting{alias="default"} 2', output)
+
+    def test_unknown_methods_share_a_label(self):
+        self.client.generic('PROPFIND', self.url)
+
+        self.assertIn('view="post_editor",action="",method="other",status="200"',
+                      metrics.snapshot()['counters']['requests_total'])
+
+    def test_labels_are_escaped(self):
+        self.assertEqual(metrics.format_labels(view='a"b\\c\nd'),
+                         'view="a\\"b\\\\c\\nd"')
+
+    @override_settings(METRICS_ALLOWED_IPS=[])
+    def test_metrics_are_hidden_from_users(self):
+        response = self.client.get(reverse('metrics'))
+        self.assertEqual(response.status_code, 404)
+
+        self.user.is_staff = True
+        self.user.save()
+        self.get_metrics()
+
+    @override_settings(METRICS_ALLOWED_IPS=['127.0.0.0/8'])
+    def test_metrics_for_internal_addresses(self):
+        self.client.logout()
+        self.get_metrics()
+
+        response = self.client.get(reverse('metrics'),
+                                   headers={'X-Forwarded-For': '127.0.0.1'})
+        self.assertEqual(response.status_code, 404)
+
+    def test_workers_share_metrics_through_files(self):
+        with tempfile.TemporaryDirectory() as metrics_dir, \
+                override_settings(METRICS_DIR=metrics_dir):
+            self.client.get(self.url)
+            other_worker = {
+                'counters': {'requests_total': {
+                    'view="post_editor",action="",method="GET",status="200"': 2}},
+                'histograms': {'request_duration_seconds': {
+                    'view="post_editor",action=""': [0] * 10 + [2, 12.5]}},
+                'events': {'read_cache.post.hit': 4},
+                'gauges': {'db_pool_size': {'alias="default"': 3}},
+            }
+            # The file of a running worker, e.g. of the parent process
+            (Path(metrics_dir) / f'{os.getppid()}-a1.json').write_text(
+                json.dumps(other_worker))
+
+            output = self.get_metrics()
+
+            self.assertTrue(list(Path(metrics_dir).glob('*.json')))
+        self.assertIn('tagmate_requests_total{view="post_editor",action="",'
+                      'method="GET",status="200"} 3', output)
+        self.assertIn('tagmate_request_duration_seconds_count{view="post_editor",'
+                      'action=""} 3', output)
+        self.assertIn('result="hit"} 4', output)
+        self.assertIn('tagmate_db_pool_size{alias="default"} 3', output)
+
+    def test_files_of_stopped_workers_are_retired(self):
+        stopped = subprocess.Popen([sys.executable, '-c', ''])
+        stopped.wait()
+        stopped_worker = {
+            'counters': {'requests_total': {'view="a",action=""': 2}},
+            'histograms': {},
+            'events': {'read_cache.post.hit': 4},
+            'gauges': {'db_pool_size': {'alias="default"': 3}},
+        }
+        with tempfile.TemporaryDirectory() as metrics_dir, \
+                override_settings(METRICS_DIR=metrics_dir):
+            # Left by an earlier process with the PID of this one or a stopped one
+            for name in (f'{os.getpid()}-old.json', f'{stopped.pid}-a1.json'):
+                (Path(metrics_dir) / name).write_text(json.dumps(stopped_worker))
+
+            first_output = self.get_metrics()
+            # Counted once from the retired file
+            output = self.get_metrics()
+
+            names = {path.name for path in Path(metrics_dir).glob('*.json')}
+        self.assertEqual(names, {metrics.RETIRED_FILE, metrics.get_process_file()})
+        for scraped in (first_output, output):
+            self.assertIn('tagmate_requests_total{view="a",action=""} 4', scraped)
+            self.assertIn('result="hit"} 8', scraped)
+            self.assertNotIn('tagmate_db_pool_size{', scraped)
+
+    def test_process_file_changes_with_pid(self):
+        name = metrics.get_process_file()
+        self.assertTrue(name.startswith(f'{os.getpid()}-'))
+        self.assertEqual(metrics.get_process_file(), name)
+        with patch('os.getpid', return_value=os.getpid() + 1):
+            self.assertNotEqual(metrics.get_process_file(), name)
+
+    @override_settings(METRICS_FLUSH_SECONDS=3600)
+    def test_flushes_are_throttled(self):
+        with tempfile.TemporaryDirectory() as metrics_dir, \
+                override_settings(METRICS_DIR=metrics_dir):
+            self.client.get(self.url)
+            path = next(Path(metrics_dir).glob('*.json'))
+            first = path.read_text()
+            self.client.get(self.url)
+            self.assertEqual(path.read_text(), first)
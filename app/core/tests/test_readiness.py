@@ -0,0 +1,84 @@
+"""
+Test the readiness probe and the liveness health check
+"""
+from unittest.mock import MagicMock, patch
+
+from django.db import connections
+from django.db.utils import OperationalError
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from core import readiness
+
+
+class ReadinessTests(TestCase):
+    def setUp(self):
+        readiness.reset()
+        self.addCleanup(readiness.reset)
+
+    def test_ready(self):
+        response = self.client.get(reverse('ready'))
+
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertTrue(data['ready'])
+        self.assertEqual(list(data['checks']), ['database', 'migrations', 'pool'])
+        self.assertIn('no-cache', response['Cache-Control'])
+
+    def test_health_check_does_not_query(self):
+        with self.assertNumQueries(0):
+            response = self.client.get(reverse('health_check'))
+        self.assertEqual(response.content, b'OK')
+
+    def test_database_unavailable(self):
+        with patch.object(connections['default'], 'cursor',
+                          side_effect=OperationalError('down')), \
+                self.assertLogs('core.readiness', 'WARNING'):
+            response = self.client.get(reverse('ready'))
+
+        self.assertEqual(response.status_code, 503)
+        # Later checks are skipped and the error isn't shown
+        self.assertEqual(list(response.json()['checks']), ['database'])
+        self.assertNotIn(b'down', response.content)
+
+    @override_settings(READY_LATENCY_BUDGET_MS=-1)
+    def test_slow_database(self):
+        with self.assertLogs('core.readiness', 'WARNING'):
+            response = self.client.get(reverse('ready'))
+        self.assertEqual(response.status_code, 503)
+
+    @patch('core.readiness.MigrationExecutor')
+    def test_unapplied_migrations(self, mocked_executor):
+        mocked_executor.return_value.migration_plan.return_value = [MagicMock()]
+
+        with self.assertLogs('core.readiness', 'WARNING'):
+            response = self.client.get(reverse('ready'))
+
+        self.assertEqual(response.status_code, 503)
+        self.assertFalse(response.json()['checks']['migrations']['ok'])
+
+    def test_applied_migrations_are_checked_once(self):
+        readiness.check_migrations()
+        with patch('core.readiness.MigrationExecutor') as mocked_executor:
+            readiness.check_migrations()
+        mocked_executor.assert_not_called()
+
+    @patch('core.readiness.get_pool_stats', return_value={
+        'default': {'pool_size': 4, 'pool_available': 0, 'requests_waiting': 3}})
+    def test_saturated_pool(self, mocked_stats):
+        with self.assertLogs('core.readiness', 'WARNING'):
+            response = self.client.get(reverse('ready'))
+        self.assertEqual(response.status_code, 503)
+
+    @override_settings(READY_CACHE_SECONDS=60)
+    def test_result_is_cached(self):
+        with patch('core.readiness.run_checks', wraps=readiness.run_checks) as mocked:
+            self.client.get(reverse('ready'))
+            self.client.get(reverse('ready'))
+        mocked.assert_called_once()
+
+    def test_backoff_delays(self):
+        delays = readiness.backoff_delays(initial=1, max_delay=4)
+        ranges = [(0.5, 1), (1, 2), (2, 4), (2, 4)]
+        for (low, high), delay in zip(ranges, delays):
+            self.assertTrue(low <= delay <= high, delay)
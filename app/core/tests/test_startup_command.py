@@ -0,0 +1,211 @@
+"""
+Test the startup command and the fingerprints of its steps
+"""
+import tempfile
+from io import StringIO
+from pathlib import Path
+from unittest.mock import patch
+
+from django.core.management import CommandError, call_command
+from django.test import TestCase, TransactionTestCase, override_settings
+
+from core import startup
+from core.models import Job
+
+
+@override_settings(DEBUG=True, IS_PRODUCTION=False)
+@patch('core.management.commands.startup.call_command')
+class StartupCommandTests(TransactionTestCase):
+    """Steps save their fingerprints from other threads, so data is committed"""
+
+    def run_startup(self, mocked_call_command, *args, env=None) -> list:
+        """Return names of the commands the startup ran"""
+        mocked_call_command.reset_mock()
+        out = StringIO()
+        with patch.dict('os.environ', env or {}):
+            try:
+                call_command('startup', *args, stdout=out)
+            finally:
+                self.output = out.getvalue()
+        return [call.args[0] for call in mocked_call_command.call_args_list]
+
+    def test_first_start_runs_every_step(self, mocked_call_command):
+        ran = self.run_startup(mocked_call_command)
+
+        self.assertEqual(ran[:2], ['wait_for_db', 'migrate'])
+        self.assertCountEqual(ran[2:], ['pre_create_su', 'clear_orphaned_tags'])
+        state = Job.objects.get(kind=startup.STARTUP_STATE_JOB).progress
+        self.assertEqual(state['migrate'], startup.get_migrations_fingerprint())
+        self.assertIn('Startup finished', self.output)
+
+    def test_warm_start_skips_unchanged_steps(self, mocked_call_command):
+        self.run_startup(mocked_call_command)
+
+        ran = self.run_startup(mocked_call_command)
+
+        self.assertEqual(ran, ['wait_for_db', 'clear_orphaned_tags'])
+        self.assertIn('[migrate] skipped (unchanged)', self.output)
+        self.assertIn('[pre_create_su] skipped (unchanged)', self.output)
+
+    def test_changed_superuser_runs_pre_create_su(self, mocked_call_command):
+        self.run_startup(mocked_call_command)
+
+        ran = self.run_startup(mocked_call_command, env={
+            'SU_UID': '42', 'SU_EMAIL': 'admin@example.com'})
+
+        self.assertIn('pre_create_su', ran)
+        self.assertNotIn('migrate', ran)
+
+    def test_changed_migrations_run_migrate(self, mocked_call_command):
+        self.run_startup(mocked_call_command)
+
+        with patch('core.startup.get_migrations_fingerprint', return_value='new'):
+            ran = self.run_startup(mocked_call_command)
+
+        self.assertIn('migrate', ran)
+
+    def test_force_runs_every_step(self, mocked_call_command):
+        self.run_startup(mocked_call_command)
+
+        ran = self.run_startup(mocked_call_command, '--force')
+
+        self.assertEqual(len(ran), 4)
+
+    def test_failed_step_runs_again(self, mocked_call_command):
+        def fail_migrate(name, **kwargs):
+            if name == 'migrate':
+                raise RuntimeError('Migration failed')
+        mocked_call_command.side_effect = fail_migrate
+
+        with self.assertRaises(RuntimeError):
+            self.run_startup(mocked_call_command)
+
+        self.assertIn('[migrate] failed', self.output)
+        self.assertNotIn('pre_create_su', self.output)
+        self.assertFalse(Job.objects.filter(kind=startup.STARTUP_STATE_JOB).exists())
+
+    @override_settings(GUNICORN_WORKERS=2, CACHES={'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+    def test_workers_need_a_shared_cache(self, mocked_call_command):
+        with self.assertRaisesMessage(CommandError, 'GUNICORN_WORKERS is 2'):
+            self.run_startup(mocked_call_command)
+
+        mocked_call_command.assert_not_called()
+
+    @override_settings(GUNICORN_WORKERS=2, CACHES={'default': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': tempfile.gettempdir()}})
+    def test_workers_with_a_shared_cache(self, mocked_call_command):
+        self.assertIn('wait_for_db', self.run_startup(mocked_call_command))
+
+    @override_settings(DEBUG=False)
+    @patch('core.startup.publish_static', return_value=False)
+    def test_static_files_published_with_debug_off(self, mocked_publish,
+                                                   mocked_call_command):
+        self.run_startup(mocked_call_command)
+
+        mocked_publish.assert_called_once()
+        self.assertIn('[static] skipped (unchanged)', self.output)
+
+
+@patch('core.startup.call_command')
+class PublishStaticTests(TestCase):
+
+    def setUp(self):
+        temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(temp_dir.cleanup)
+        self.static_root = Path(temp_dir.name) / 'static'
+        self.build_root = Path(temp_dir.name) / 'build'
+        self.static_root.mkdir()
+        self.build_root.mkdir()
+        settings_override = override_settings(
+            STATIC_ROOT=self.static_root, STATIC_BUILD_ROOT=self.build_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.fingerprint = startup.get_static_fingerprint()
+
+    def test_collects_without_build(self, mocked_call_command):
+        self.assertTrue(startup.publish_static(StringIO()))
+
+        self.assertEqual(mocked_call_command.call_args_list[0].args, ('collectstatic',))
+        self.assertEqual(startup.read_static_fingerprint(self.static_root),
+                         self.fingerprint)
+
+    def test_copies_matching_build(self, mocked_call_command):
+        (self.build_root / 'app.css').write_text('body {}')
+        (self.build_root / startup.STATIC_FINGERPRINT_FILE).write_text(self.fingerprint)
+
+        self.assertTrue(startup.publish_static(StringIO()))
+
+        mocked_call_command.assert_not_called()
+        self.assertEqual((self.static_root / 'app.css').read_text(), 'body {}')
+        self.assertEqual(startup.read_static_fingerprint(self.static_root),
+                         self.fingerprint)
+
+    def test_collects_when_build_is_outdated(self, mocked_call_command):
+        (self.build_root / startup.STATIC_FINGERPRINT_FILE).write_text('outdated')
+
+        self.assertTrue(startup.publish_static(StringIO()))
+
+        mocked_call_command.assert_called()
+        self.assertFalse((self.static_root / 'app.css').exists())
+
+    def test_skips_published_files(self, mocked_call_command):
+        (self.static_root / startup.STATIC_FINGERPRINT_FILE).write_text(
+            self.fingerprint)
+
+        self.assertFalse(startup.publish_static(StringIO()))
+        self.assertTrue(startup.publish_static(StringIO(), force=True))
+
+    @override_settings(COMPRESS_OFFLINE=True)
+    def test_compresses_when_offline_compression_is_on(self, mocked_call_command):
+        startup.collect_static('fingerprint', StringIO())
+
+        self.assertEqual([call.args[0] for call in mocked_call_command.call_args_list],
+                         ['collectstatic', 'compress'])
+
+    def test_fingerprint_changes_with_static_url(self, mocked_call_command):
+        with override_settings(STATIC_URL='/other/'):
+            self.assertNotEqual(startup.get_static_fingerprint(), self.fingerprint)
+
+
+# Plain storage, the hashing and compressing one makes the build take seconds
+PLAIN_STORAGES = {
+    'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+    'staticfiles': {'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage'},
+}
+
+
+@override_settings(DEBUG=False, STORAGES=PLAIN_STORAGES)
+class StaticBuildTests(TestCase):
+
+    def setUp(self):
+        temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(temp_dir.cleanup)
+        self.static_root = Path(temp_dir.name) / 'static'
+        self.build_root = Path(temp_dir.name) / 'build'
+
+    def test_build_is_published_without_collecting(self):
+        with override_settings(STATIC_ROOT=self.build_root,
+                               STATIC_BUILD_ROOT=self.build_root):
+            call_command('startup', '--build', stdout=StringIO())
+        built = sorted(path.relative_to(self.build_root)
+                       for path in self.build_root.rglob('*'))
+        self.assertIn(Path('css'), built)
+
+        with override_settings(STATIC_ROOT=self.static_root,
+                               STATIC_BUILD_ROOT=self.build_root), \
+                patch('core.startup.call_command') as mocked_call_command:
+            self.assertTrue(startup.publish_static(StringIO()))
+            self.assertFalse(startup.publish_static(StringIO()))
+
+        mocked_call_command.assert_not_called()
+        self.assertEqual(sorted(path.relative_to(self.static_root)
+                                for path in self.static_root.rglob('*')), built)
+
+    def test_build_needs_static_root_of_the_build(self):
+        with override_settings(STATIC_ROOT=self.static_root,
+                               STATIC_BUILD_ROOT=self.build_root), \
+                self.assertRaises(CommandError):
+            call_command('startup', '--build', stdout=StringIO())
+        self.assertFalse(self.static_root.exists())
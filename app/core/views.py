@@ -1,3 +1,5 @@
+import os
+
 from django.shortcuts import render, redirect
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
@@ -6,10 +8,17 @@ from allauth.socialaccount.models import SocialAccount
 from django.contrib.auth import logout
 from allauth.socialaccount.providers.google import views as google_views
 from allauth.account.views import LogoutView as AllauthLogoutView
-from django.http import Http404, HttpResponse
+from django.http import Http404, HttpResponse, JsonResponse
 from django.views import View
+from django.views.decorators.cache import never_cache
 from http import HTTPStatus
 
+from core import metrics as core_metrics
+from core import stats as core_stats
+from core.db_metrics import get_pool_stats
+from core.readiness import get_readiness
+from core.account_deletion import delete_account as delete_account_data
+
 
 def profile(request):
     user = request.user
@@ -56,16 +65,44 @@ def delete_account(request):
 
     logout(request)
 
-    user.delete()
-
-    messages.success(request, "Your account has been successfully deleted.")
+    if delete_account_data(user):
+        messages.success(request, "Your account has been successfully deleted.")
+    else:
+        messages.success(
+            request,
+            "Your account has been deactivated and is being deleted in the background."
+        )
     return redirect('profile')
 
 
 def health_check(request):
+    """Liveness probe, answers without touching the database or the cache"""
     return HttpResponse("OK", status=200)
 
 
+@never_cache
+def ready(request):
+    """Readiness probe checking the database, migrations and connection pools"""
+    readiness = get_readiness()
+    return JsonResponse(readiness, status=200 if readiness['ready'] else 503)
+
+
+def stats(request):
+    """Counters of this process for staff, e.g. read cache hits and DB connects"""
+    if not request.user.is_staff:
+        raise Http404("Page not found")
+    return JsonResponse({"pid": os.getpid(), "counters": core_stats.snapshot(),
+                         "db_pools": get_pool_stats()})
+
+
+def metrics(request):
+    """Request metrics of all workers in the Prometheus text format"""
+    if not (core_metrics.is_internal_request(request) or request.user.is_staff):
+        raise Http404("Page not found")
+    return HttpResponse(core_metrics.render(core_metrics.collect()),
+                        content_type='text/plain; version=0.0.4; charset=utf-8')
+
+
 def render_error(request, status_code: int):
     try:
         status = HTTPStatus(status_code)
@@ -1,20 +1,10 @@
 #!/bin/sh
 set -e
 
-# Wait for database to be ready
-python manage.py wait_for_db
-python manage.py migrate
-python manage.py pre_create_su
-python manage.py clear_orphaned_tags
-
-# Collect static files only in production
-if [ "$IS_PRODUCTION" = "1" ] || [ "$DEBUG" = "0" ]; then
-    echo "️Collecting and compressing static files..."
-    python manage.py collectstatic --noinput
-    python manage.py compress
-else
-    echo "Skipping collectstatic..."
-fi
+# Wait for the database, migrate, pre-create the superuser, clear orphaned tags and,
+# in production or with DEBUG=0, publish static files collected at build time.
+# Steps whose inputs didn't change since the last start are skipped.
+python manage.py startup
 
 # Start the application
 exec "$@"
@@ -0,0 +1,16 @@
+"""
+Gunicorn settings. SERVER_MODE=asgi serves app.asgi with uvicorn workers,
+so async views don't block a worker while they wait for the DB.
+"""
+import os
+
+SERVER_MODE = os.getenv('SERVER_MODE', 'wsgi')
+
+bind = '0.0.0.0:8000'
+workers = int(os.getenv('GUNICORN_WORKERS', '1'))
+
+if SERVER_MODE == 'asgi':
+    wsgi_app = 'app.asgi:application'
+    worker_class = 'uvicorn_worker.UvicornWorker'
+else:
+    wsgi_app = 'app.wsgi:application'
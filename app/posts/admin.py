@@ -1,8 +1,39 @@
 from django.contrib import admin  # noqa
 from . import models
 
+
+class TagRelationshipAdmin(admin.ModelAdmin):
+    """
+    Rows deleted here store the new order of their Post/TagGroup, the through
+    models have no delete signals so cascades can use fast deletes
+    """
+    item_field = None
+
+    def delete_model(self, request, obj):
+        super().delete_model(request, obj)
+        self.store_tag_orders({getattr(obj, f'{self.item_field}_id')})
+
+    def delete_queryset(self, request, queryset):
+        item_ids = set(queryset.values_list(f'{self.item_field}_id', flat=True))
+        super().delete_queryset(request, queryset)
+        self.store_tag_orders(item_ids)
+
+    def store_tag_orders(self, item_ids):
+        item_model = self.model._meta.get_field(self.item_field).related_model
+        for item_id in item_ids:
+            item_model(pk=item_id).store_tag_order()
+
+
+@admin.register(models.PostTag)
+class PostTagAdmin(TagRelationshipAdmin):
+    item_field = 'post'
+
+
+@admin.register(models.TagGroupTag)
+class TagGroupTagAdmin(TagRelationshipAdmin):
+    item_field = 'tag_group'
+
+
 admin.site.register(models.Post)
 admin.site.register(models.Tag)
 admin.site.register(models.TagGroup)
-admin.site.register(models.PostTag)
-admin.site.register(models.TagGroupTag)
@@ -0,0 +1,75 @@
+"""
+SVG sprite of the editor icons, referenced with <use href> instead of inline copies.
+
+The sprite is built once per process from the icon templates in ICON_DIR. Every
+<symbol> keeps the markup of its file, except paints of the classes styled by
+CSS: they become custom properties, which are inherited into <use> content,
+while selectors like ".big-icon-btn .inner-element" can't reach it.
+"""
+import functools
+import hashlib
+import xml.etree.ElementTree as ET
+from pathlib import Path
+
+ICON_DIR = Path(__file__).resolve().parent / 'templates' / 'posts' / 'buttons'
+ICON_SUFFIX = '-svgrepo-com'
+SVG_NS = 'http://www.w3.org/2000/svg'
+
+# Class of an icon element: painted attribute and the custom property setting it
+CLASS_PAINTS = {
+    'bg-layer': ('fill', '--icon-bg'),
+    'outer-element': ('stroke', '--icon-outer'),
+    'inner-element': ('stroke', '--icon-inner'),
+    'full-image': ('stroke', '--icon-stroke'),
+}
+PAINT_TRANSITION = 'transition: stroke 0.2s, fill 0.2s'
+
+ET.register_namespace('', SVG_NS)
+
+
+def get_icon_name(path: Path) -> str:
+    return path.stem.removesuffix(ICON_SUFFIX)
+
+
+def build_symbol(path: Path) -> ET.Element:
+    """Turn an icon file into a <symbol> with the icon name as id"""
+    svg = ET.parse(path).getroot()
+    symbol = ET.Element(f'{{{SVG_NS}}}symbol', id=get_icon_name(path))
+    for attribute in ('viewBox', 'fill'):
+        if attribute in svg.attrib:
+            symbol.set(attribute, svg.get(attribute))
+    for element in svg:
+        for class_name in element.get('class', '').split():
+            if class_name not in CLASS_PAINTS:
+                continue
+            attribute, prop = CLASS_PAINTS[class_name]
+            if attribute in element.attrib:
+                default = element.attrib.pop(attribute)
+                element.set('style', f'{attribute}: var({prop}, {default}); '
+                                     f'{PAINT_TRANSITION}')
+            break
+        symbol.append(element)
+    return symbol
+
+
+def build_sprite(icon_dir: Path = ICON_DIR) -> str:
+    sprite = ET.Element(f'{{{SVG_NS}}}svg')
+    for path in sorted(icon_dir.glob('*.svg')):
+        sprite.append(build_symbol(path))
+    return ET.tostring(sprite, encoding='unicode')
+
+
+@functools.cache
+def get_sprite() -> tuple:
+    """Return the sprite markup and a hash of it, used in its URL"""
+    sprite = build_sprite()
+    return sprite, hashlib.sha256(sprite.encode()).hexdigest()[:12]
+
+
+@functools.cache
+def get_symbol_markup(name: str) -> str:
+    """Inline markup of one icon, used when the sprite is turned off"""
+    symbol = build_symbol(ICON_DIR / f'{name}{ICON_SUFFIX}.svg')
+    symbol.tag = f'{{{SVG_NS}}}svg'
+    del symbol.attrib['id']
+    return ET.tostring(symbol, encoding='unicode')
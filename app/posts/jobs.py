@@ -0,0 +1,34 @@
+"""
+Deferred jobs of the posts app
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from core.jobs import job_handler
+from posts.models import ORPHAN_SWEEP_JOB, Tag
+
+
+@job_handler(ORPHAN_SWEEP_JOB)
+def sweep_orphaned_tags(job):
+    """Delete a batch of unused Tags, runs again right away while batches are full"""
+    batch_size = settings.ORPHAN_SWEEP_BATCH_SIZE
+    grace = timedelta(seconds=settings.ORPHAN_SWEEP_GRACE_SECONDS)
+    touched_before = timezone.now() - grace
+    with transaction.atomic():
+        # Locked rows make a concurrent attach of the same Tag wait for this
+        # transaction, so usage_count can't grow between the check and the delete
+        tag_ids = list(
+            Tag.objects.select_for_update(skip_locked=True).filter(
+                usage_count=0, touched_at__lt=touched_before,
+            ).order_by().values_list('id', flat=True)[:batch_size]
+        )
+        if tag_ids:
+            Tag.objects.filter(id__in=tag_ids).delete()
+
+    job.progress['deleted_tags'] = job.progress.get('deleted_tags', 0) + len(tag_ids)
+    if len(tag_ids) == batch_size:
+        return 0
+    return settings.ORPHAN_SWEEP_INTERVAL
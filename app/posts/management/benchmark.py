@@ -0,0 +1,21 @@
+"""
+Helpers of the benchmark commands, which measure on data they create and roll back
+"""
+from contextlib import contextmanager
+
+from django.db import transaction
+
+
+class RollbackBenchmark(Exception):
+    """Raised to roll back everything the benchmark created"""
+
+
+@contextmanager
+def rolled_back():
+    """Run the block in a transaction that is rolled back, errors still propagate"""
+    try:
+        with transaction.atomic():
+            yield
+            raise RollbackBenchmark
+    except RollbackBenchmark:
+        pass
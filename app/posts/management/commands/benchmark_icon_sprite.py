@@ -0,0 +1,67 @@
+"""
+Django command for measuring the post editor page with inline icons and the icon sprite
+"""
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.test import Client
+from django.test.utils import override_settings
+from django.urls import reverse
+from posts.management.benchmark import rolled_back
+from posts.models import Post, Tag, TagGroup
+
+
+class Command(BaseCommand):
+    help = ('Measure HTML size and render time of the post editor page for large '
+            'Posts, with every icon inline and with the icon sprite, nothing is '
+            'kept in the DB')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--tags',
+            type=int,
+            default=200,
+            help='Number of Tags of the opened Post and TagGroup',
+        )
+        parser.add_argument(
+            '--repeat',
+            type=int,
+            default=20,
+            help='Number of page loads per measurement',
+        )
+
+    def handle(self, *args, **options):
+        with rolled_back():
+            self.run_benchmark(options['tags'], options['repeat'])
+
+    def run_benchmark(self, tag_count, repeat):
+        user = get_user_model().objects.create_user(
+            email='benchmark-icon-sprite@example.com')
+        post = Post.objects.create(user=user, title='Benchmark')
+        tag_group = TagGroup.objects.create(user=user, name='Benchmark')
+        tags = Tag.objects.bulk_create(
+            Tag(name=f'benchmark_{i}') for i in range(tag_count))
+        post.update_tags([tag.id for tag in tags])
+        tag_group.update_tags([tag.id for tag in tags])
+
+        client = Client(HTTP_HOST='127.0.0.1')
+        client.force_login(user)
+        url = reverse('post_tg_editor', kwargs={'post_pk': post.pk,
+                                                'tg_pk': tag_group.pk})
+
+        # Every load renders the whole page, the fragment cache would hide the cost
+        for label, sprite in (('Inline icons', False), ('Icon sprite', True)):
+            with override_settings(ICON_SPRITE=sprite, FRAGMENT_CACHE_TIMEOUT=0):
+                client.get(url)  # Warm up template loading
+                elapsed = 0.0
+                for _ in range(repeat):
+                    started = time.perf_counter()
+                    response = client.get(url)
+                    elapsed += time.perf_counter() - started
+                    if response.status_code != 200:
+                        raise RuntimeError(f"{url} returned {response.status_code}")
+            self.stdout.write(f"{label}: {len(response.content) / 1024:.1f} KiB, "
+                              f"{elapsed / repeat * 1000:.2f} ms per page")
+
+        self.stdout.write(self.style.SUCCESS("Benchmark finished, changes rolled back"))
@@ -0,0 +1,84 @@
+"""
+Django command for measuring render time of the post editor page
+"""
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.test import Client
+from django.test.utils import override_settings
+from django.urls import reverse
+from posts.management.benchmark import rolled_back
+from posts.models import Post, Tag, TagGroup
+
+
+class Command(BaseCommand):
+    help = ('Measure the post editor page of a user with many Posts, with and '
+            'without cached template fragments, nothing is kept in the DB')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--posts',
+            type=int,
+            default=2000,
+            help='Number of Posts of the benchmark user',
+        )
+        parser.add_argument(
+            '--tags',
+            type=int,
+            default=30,
+            help='Number of Tags of the opened Post and TagGroup',
+        )
+        parser.add_argument(
+            '--repeat',
+            type=int,
+            default=20,
+            help='Number of page loads per measurement',
+        )
+
+    def handle(self, *args, **options):
+        with rolled_back():
+            self.run_benchmark(options['posts'], options['tags'], options['repeat'])
+
+    def run_benchmark(self, post_count, tag_count, repeat):
+        user = get_user_model().objects.create_user(
+            email='benchmark-post-editor@example.com')
+        posts = Post.objects.bulk_create(
+            Post(user=user, title=f'Benchmark {i}', description='Benchmark text')
+            for i in range(post_count))
+        tag_groups = TagGroup.objects.bulk_create(
+            TagGroup(user=user, name=f'Benchmark {i}') for i in range(post_count // 10))
+        tags = Tag.objects.bulk_create(
+            Tag(name=f'benchmark_{i}') for i in range(tag_count + repeat))
+        post, tag_group = posts[-1], tag_groups[-1]
+        post.update_tags([tag.id for tag in tags[:tag_count]])
+        tag_group.update_tags([tag.id for tag in tags[:tag_count]])
+
+        client = Client(HTTP_HOST='127.0.0.1')
+        client.force_login(user)
+        url = reverse('post_tg_editor', kwargs={'post_pk': post.pk,
+                                                'tg_pk': tag_group.pk})
+
+        def measure(before_each=None):
+            elapsed = 0.0
+            for i in range(repeat):
+                if before_each:
+                    before_each(i)
+                started = time.perf_counter()
+                response = client.get(url)
+                elapsed += time.perf_counter() - started
+                if response.status_code != 200:
+                    raise RuntimeError(f"{url} returned {response.status_code}")
+            return elapsed / repeat * 1000
+
+        with override_settings(FRAGMENT_CACHE_TIMEOUT=0):
+            self.stdout.write(f"Without fragment cache: {measure():.2f} ms per page")
+        client.get(url)  # Fill the fragment cache
+        self.stdout.write(f"Cached fragments: {measure():.2f} ms per page")
+
+        def attach_to_tag_group(i):
+            tag_group.update_tags(tag_group.ordered_tag_ids + [tags[tag_count + i].id])
+        after_change = measure(attach_to_tag_group)
+        self.stdout.write(f"After each TagGroup change: {after_change:.2f} ms per page")
+
+        self.stdout.write(self.style.SUCCESS("Benchmark finished, changes rolled back"))
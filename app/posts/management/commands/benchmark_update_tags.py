@@ -0,0 +1,73 @@
+"""
+Django command for comparing update_tags implementations
+"""
+import random
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connection
+from posts.management.benchmark import rolled_back
+from posts.models import Post, Tag
+
+IMPLEMENTATIONS = ('portable', 'postgresql')
+
+
+class Command(BaseCommand):
+    help = ('Measure update_tags of the portable and the PostgreSQL implementation '
+            'on Posts with different numbers of tags, nothing is kept in the DB')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--sizes',
+            type=int,
+            nargs='+',
+            default=[10, 100, 1000],
+            help='Numbers of tags in the benchmarked Posts',
+        )
+        parser.add_argument(
+            '--repeat',
+            type=int,
+            default=20,
+            help='Number of update_tags calls per size and implementation',
+        )
+
+    def handle(self, *args, **options):
+        with rolled_back():
+            self.run_benchmark(options['sizes'], options['repeat'])
+
+    def run_benchmark(self, sizes, repeat):
+        user = get_user_model().objects.create_user(
+            email='benchmark-update-tags@example.com')
+        tags = Tag.objects.bulk_create(
+            Tag(name=f'benchmark_{i}') for i in range(max(sizes) * 2))
+        tag_ids = [tag.id for tag in tags]
+        rng = random.Random(0)
+
+        for implementation in IMPLEMENTATIONS:
+            if implementation == 'postgresql' and connection.vendor != 'postgresql':
+                self.stdout.write(
+                    f"Skipping {implementation}, the database is {connection.vendor}")
+                continue
+            for size in sizes:
+                post = Post.objects.create(user=user, title=f'Benchmark {size}')
+                update_tags = getattr(post, f'update_tags_{implementation}')
+                update_tags(tag_ids[:size])
+                queries_before = len(connection.queries)
+
+                elapsed = 0.0
+                for _ in range(repeat):
+                    # Half of the tags are new every time, the rest are reordered
+                    order = rng.sample(tag_ids[:size * 2], size)
+                    started = time.perf_counter()
+                    update_tags(order)
+                    elapsed += time.perf_counter() - started
+
+                line = (f"{implementation:>10} {size:>6} tags: "
+                        f"{elapsed / repeat * 1000:.2f} ms per call")
+                if connection.queries_logged:
+                    queries = (len(connection.queries) - queries_before) / repeat
+                    line += f", {queries:.1f} queries per call"
+                self.stdout.write(line)
+
+        self.stdout.write(self.style.SUCCESS("Benchmark finished, changes rolled back"))
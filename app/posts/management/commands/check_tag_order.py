@@ -0,0 +1,96 @@
+"""
+Django command for verifying and repairing Tag orders stored on Posts and TagGroups
+"""
+from django.core.management.base import BaseCommand
+from posts.models import (Post, PostTag, TagGroup, TagGroupTag, build_plain_text,
+                          build_tags_text, pack_tag_ids)
+from posts.read_cache import bump_generation
+
+
+class Command(BaseCommand):
+    help = ('Compare packed_tag_ids of Posts and TagGroups, and tags_text and '
+            'plain_text of Posts, with the order of their PostTag and TagGroupTag '
+            'rows')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--repair',
+            action='store_true',
+            help='Overwrite wrong orders with the order of the through rows',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=500,
+            help='Number of items compared per query',
+        )
+
+    def handle(self, *args, **options):
+        total = 0
+        for item_model, through_model, item_field in (
+                (Post, PostTag, 'post_id'), (TagGroup, TagGroupTag, 'tag_group_id')):
+            wrong_items = self.find_wrong_items(
+                item_model, through_model, item_field, options['batch_size'])
+            total += len(wrong_items)
+            label = item_model._meta.verbose_name_plural
+
+            if options['verbosity'] >= 2 and wrong_items:
+                ids = ', '.join(str(item.pk) for item in wrong_items)
+                self.stdout.write(f"Wrong orders of {label}: {ids}")
+
+            if not options['repair']:
+                if wrong_items:
+                    self.stdout.write(f"Found {len(wrong_items)} {label} with wrong "
+                                      f"tag orders")
+                continue
+
+            item_model.objects.bulk_update(wrong_items, item_model.TAG_ORDER_FIELDS,
+                                           batch_size=options['batch_size'])
+            # Cached reads and fragments of the owners hold the wrong orders
+            for user_id in {item.user_id for item in wrong_items}:
+                bump_generation(user_id)
+            self.stdout.write(self.style.SUCCESS(
+                f"Repaired tag orders of {len(wrong_items)} {label}"))
+
+        if total == 0:
+            self.stdout.write("All tag orders are correct.")
+
+    @staticmethod
+    def find_wrong_items(item_model, through_model, item_field, batch_size):
+        """Return items whose TAG_ORDER_FIELDS differ, holding the correct values"""
+        wrong_items = []
+        has_text = item_model is Post
+        fields = ['pk', 'user', *item_model.TAG_ORDER_FIELDS]
+        if has_text:
+            fields.append('description')
+        items = item_model.objects.order_by('pk').only(*fields)
+        last_pk = 0
+        while True:
+            batch = list(items.filter(pk__gt=last_pk)[:batch_size])
+            if not batch:
+                break
+            last_pk = batch[-1].pk
+
+            orders = {item.pk: [] for item in batch}
+            rows = through_model.objects.filter(
+                **{f'{item_field}__in': orders}
+            ).order_by(item_field, 'position').values_list(
+                item_field, 'tag_id', 'tag__name')
+            for item_id, tag_id, tag_name in rows:
+                orders[item_id].append((tag_id, tag_name))
+
+            for item in batch:
+                correct = {'packed_tag_ids': pack_tag_ids(
+                    tag_id for tag_id, _ in orders[item.pk])}
+                if has_text:
+                    correct['tags_text'] = build_tags_text(
+                        tag_name for _, tag_name in orders[item.pk])
+                    correct['plain_text'] = build_plain_text(item.description,
+                                                             correct['tags_text'])
+                stored = {field: getattr(item, field) for field in correct}
+                stored['packed_tag_ids'] = bytes(stored['packed_tag_ids'])
+                if stored != correct:
+                    for field, value in correct.items():
+                        setattr(item, field, value)
+                    wrong_items.append(item)
+        return wrong_items
@@ -0,0 +1,49 @@
+"""
+Django command for verifying and repairing Tag usage counters
+"""
+from django.core.management.base import BaseCommand
+from django.db.models import Count, F, IntegerField, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+from posts.models import PostTag, Tag, TagGroupTag
+
+
+def count_usages(through_model):
+    """Subquery counting rows of the through model that use the outer Tag"""
+    usages = through_model.objects.filter(tag=OuterRef('pk')).order_by().values(
+        'tag').annotate(count=Count('id')).values('count')
+    return Coalesce(Subquery(usages, output_field=IntegerField()), Value(0))
+
+
+class Command(BaseCommand):
+    help = 'Compare Tag usage counters with actual Post and TagGroup usages'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--repair',
+            action='store_true',
+            help='Overwrite wrong counters with the actual number of usages',
+        )
+
+    def handle(self, *args, **options):
+        actual_count = count_usages(PostTag) + count_usages(TagGroupTag)
+        wrong_tags = Tag.objects.alias(actual=actual_count).exclude(
+            usage_count=F('actual'))
+        count = wrong_tags.count()
+
+        if count == 0:
+            self.stdout.write("All tag usage counters are correct.")
+            return
+
+        if options['verbosity'] >= 2:
+            tag_names = list(wrong_tags.values_list('name', flat=True))
+            self.stdout.write(f"Wrong counters: {', '.join(tag_names)}")
+
+        if not options['repair']:
+            self.stdout.write(f"Found {count} tags with wrong usage counters")
+            return
+
+        repaired = Tag.objects.filter(id__in=wrong_tags.values('id')).update(
+            usage_count=actual_count)
+        self.stdout.write(
+            self.style.SUCCESS(f"Repaired usage counters of {repaired} tags")
+        )
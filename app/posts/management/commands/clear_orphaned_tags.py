@@ -1,9 +1,20 @@
 """
 Django command for deleting orphaned Tags
 """
+import time
+from datetime import datetime, timedelta
+
 from django.core.management.base import BaseCommand
-from django.db.models import Count
-from posts.models import Tag
+from django.db import transaction
+from django.db.models import Exists, OuterRef
+from django.utils import timezone
+from core.models import Job
+from posts.models import PostTag, Tag, TagGroupTag
+
+# Job row keeping the high-water mark between runs, no runner handles this kind
+SWEEP_STATE_JOB = 'posts.clear_orphaned_tags'
+# Usages may change while a sweep runs, so the next one starts a bit earlier
+TOUCH_MARGIN = timedelta(minutes=5)
 
 
 class Command(BaseCommand):
@@ -15,35 +26,101 @@ class Command(BaseCommand):
             action='store_true',
             help='Show what would be deleted without actually deleting',
         )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=1000,
+            help='Number of tags deleted per transaction',
+        )
+        parser.add_argument(
+            '--max-seconds',
+            type=float,
+            default=None,
+            help='Stop after this many seconds, the next run continues from there',
+        )
+        parser.add_argument(
+            '--grace-seconds',
+            type=float,
+            default=0,
+            help='Keep tags whose usage changed more recently than this, '
+                 'e.g. ones a request is about to attach',
+        )
+        parser.add_argument(
+            '--full',
+            action='store_true',
+            help='Check all tags, not only the ones touched since the last run',
+        )
 
     def handle(self, *args, **options):
-        def get_orphaned_tags():
-            """Get all Tags that are not used anywhere"""
-            return Tag.objects.annotate(
-                pt_count=Count('posttag'),
-                tg_count=Count('tag_groups')
-            ).filter(
-                pt_count=0,
-                tg_count=0
-            )
+        deadline = None
+        if options['max_seconds'] is not None:
+            deadline = time.monotonic() + options['max_seconds']
 
-        orphaned_tags = get_orphaned_tags()
-        count = orphaned_tags.count()
+        state_job, _ = Job.objects.get_or_create(kind=SWEEP_STATE_JOB)
+        state = {} if options['full'] else dict(state_job.progress)
+        # An interrupted sweep is continued with its own start time and position
+        started_at = state.get('started_at') or timezone.now().isoformat()
+        last_id = state.get('last_id', 0)
 
-        if count == 0:
-            self.stdout.write("No orphaned tags found.")
-            return
+        grace = timedelta(seconds=options['grace_seconds'])
+        orphaned_tags = Tag.objects.filter(
+            ~Exists(PostTag.objects.filter(tag=OuterRef('pk'))),
+            ~Exists(TagGroupTag.objects.filter(tag=OuterRef('pk'))),
+            # Recently touched Tags may be about to be attached
+            touched_at__lt=datetime.fromisoformat(started_at) - grace,
+        ).order_by('id')
+        if state.get('since'):
+            orphaned_tags = orphaned_tags.filter(
+                touched_at__gte=datetime.fromisoformat(state['since']))
+
+        count = 0
+        finished = False
+        while not finished:
+            if deadline is not None and time.monotonic() > deadline:
+                break
+            deleted = 0
+            with transaction.atomic():
+                chunk = list(orphaned_tags.filter(id__gt=last_id).values_list(
+                    'id', 'name')[:options['chunk_size']])
+                if chunk and not options['dry_run']:
+                    # Tags used again since the select are kept by the re-check
+                    _, deleted_by_model = orphaned_tags.filter(
+                        id__in=[tag_id for tag_id, _ in chunk]).delete()
+                    deleted = deleted_by_model.get(Tag._meta.label, 0)
+            finished = len(chunk) < options['chunk_size']
+            if not chunk:
+                continue
 
-        if options['verbosity'] >= 2:
-            tag_names = list(orphaned_tags.values_list('name', flat=True))
-            self.stdout.write(f"Orphaned tags: {', '.join(tag_names)}")
+            last_id = chunk[-1][0]
+            count += len(chunk) if options['dry_run'] else deleted
+            if options['verbosity'] >= 2:
+                names = ', '.join(name for _, name in chunk)
+                self.stdout.write(f"Orphaned tags: {names}")
+            if not finished:
+                self.stdout.write(f"Checked tags up to id {last_id}, {count} orphaned")
 
-        if options['dry_run']:
+        if not options['dry_run']:
+            if finished:
+                # Tags kept for the grace period are checked again
+                since = datetime.fromisoformat(started_at) - grace - TOUCH_MARGIN
+                state_job.progress = {'since': since.isoformat()}
+            else:
+                state_job.progress = {**state, 'started_at': started_at,
+                                      'last_id': last_id}
+            state_job.save(update_fields=['progress'])
+
+        if not finished:
+            self.stdout.write(self.style.WARNING(
+                f"Stopped after {options['max_seconds']} seconds at tag id {last_id}, "
+                f"the next run continues from there"
+            ))
+
+        if count == 0:
+            self.stdout.write("No orphaned tags found.")
+        elif options['dry_run']:
             self.stdout.write(f"Would delete {count} orphaned tags (dry run)")
         else:
-            orphaned_tags.delete()
-            result = count - get_orphaned_tags().count()
             self.stdout.write(
                 self.style.SUCCESS(
-                    f"Successfully deleted {result} orphaned tags")
+                    f"Successfully deleted {count} orphaned tags")
             )
@@ -0,0 +1,196 @@
+"""
+Django command for comparing sync and async throughput of concurrent tag reorders
+"""
+import asyncio
+import json
+import time
+from wsgiref.util import setup_testing_defaults
+
+from django.contrib.auth import get_user_model
+from django.core.asgi import get_asgi_application
+from django.core.management.base import BaseCommand
+from django.core.wsgi import get_wsgi_application
+from django.db import connection
+from django.test import Client
+from django.urls import reverse
+from posts.models import Post, Tag
+
+
+class Command(BaseCommand):
+    help = ('Send reorder_tags requests to one process: one at a time through the '
+            'WSGI handler, like a sync worker, and concurrently through the ASGI '
+            'handler, like an async worker. Data is created for the run and '
+            'deleted afterwards, as requests commit their own transactions.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--requests',
+            type=int,
+            default=200,
+            help='Number of reorder requests per mode',
+        )
+        parser.add_argument(
+            '--concurrency',
+            type=int,
+            default=20,
+            help='Number of reorders in flight in the async mode, one Post each',
+        )
+        parser.add_argument(
+            '--tags',
+            type=int,
+            default=20,
+            help='Number of Tags of every Post',
+        )
+        parser.add_argument(
+            '--db-latency',
+            type=float,
+            default=0.0,
+            help='Milliseconds added to every query, e.g. to act like a remote DB',
+        )
+
+    def handle(self, *args, **options):
+        self.db_latency = options['db_latency'] / 1000
+        user = get_user_model().objects.create_user(
+            email='loadtest-reorder@example.com')
+        tags = Tag.objects.bulk_create(
+            Tag(name=f'loadtest_{i}') for i in range(options['tags']))
+        try:
+            self.tag_ids = [tag.id for tag in tags]
+            self.post_ids = []
+            for i in range(options['concurrency']):
+                post = Post.objects.create(user=user, title=f'Load test {i}')
+                post.update_tags(self.tag_ids)
+                self.post_ids.append(post.pk)
+
+            client = Client(HTTP_HOST='127.0.0.1')
+            client.force_login(user)
+            client.get(reverse('index'))  # Sets the csrf cookie
+            self.cookies = client.cookies
+            self.path = reverse('reorder_tags')
+
+            if self.db_latency:
+                connection_created_receivers = self.add_db_latency()
+            sync_rate = self.run_sync(options['requests'])
+            self.stdout.write(f"Sync (WSGI, one at a time): {sync_rate:.0f} reorders/s")
+            async_rate = asyncio.run(self.run_async(options['requests'],
+                                                    options['concurrency']))
+            self.stdout.write(f"Async (ASGI, {options['concurrency']} concurrent): "
+                              f"{async_rate:.0f} reorders/s")
+        finally:
+            if self.db_latency:
+                self.remove_db_latency(connection_created_receivers)
+            user.delete()
+            Tag.objects.filter(id__in=[tag.id for tag in tags]).delete()
+
+        self.stdout.write(self.style.SUCCESS("Load test finished"))
+
+    def add_db_latency(self):
+        """Delay queries of every connection, ASGI requests open their own ones"""
+        from django.db.backends.signals import connection_created
+
+        def delay(execute, sql, params, many, context):
+            time.sleep(self.db_latency)
+            return execute(sql, params, many, context)
+
+        def add_delay(sender, connection, **kwargs):
+            if delay not in connection.execute_wrappers:
+                connection.execute_wrappers.append(delay)
+
+        connection_created.connect(add_delay, weak=False)
+        connection.execute_wrappers.append(delay)
+        return add_delay, delay
+
+    def remove_db_latency(self, receivers):
+        from django.db.backends.signals import connection_created
+        add_delay, delay = receivers
+        connection_created.disconnect(add_delay)
+        if delay in connection.execute_wrappers:
+            connection.execute_wrappers.remove(delay)
+
+    def get_body(self, i) -> bytes:
+        """Reverse the order of a Post on every other request to it"""
+        tag_order = self.tag_ids[::-1] if (i // len(self.post_ids)) % 2 == 0 \
+            else self.tag_ids
+        return json.dumps({'item_type': 'post', 'item_id': self.post_ids[
+            i % len(self.post_ids)], 'tag_order': tag_order}).encode()
+
+    def get_headers(self) -> dict:
+        cookie = '; '.join(f'{name}={morsel.value}'
+                           for name, morsel in self.cookies.items())
+        return {'Cookie': cookie, 'X-CSRFToken': self.cookies['csrftoken'].value,
+                'Content-Type': 'application/json'}
+
+    def check_response(self, status: int, body: bytes):
+        if status != 200 or not json.loads(body).get('success'):
+            raise RuntimeError(f"{self.path} returned {status}: {body[:200]!r}")
+
+    def run_sync(self, request_count) -> float:
+        """Return reorders per second of sequential requests to the WSGI handler"""
+        handler = get_wsgi_application()
+        headers = self.get_headers()
+        started = time.perf_counter()
+        for i in range(request_count):
+            body = self.get_body(i)
+            environ = {
+                'REQUEST_METHOD': 'POST',
+                'PATH_INFO': self.path,
+                'CONTENT_TYPE': headers['Content-Type'],
+                'CONTENT_LENGTH': str(len(body)),
+                'HTTP_COOKIE': headers['Cookie'],
+                'HTTP_X_CSRFTOKEN': headers['X-CSRFToken'],
+            }
+            setup_testing_defaults(environ)
+            environ['wsgi.input'].write(body)
+            environ['wsgi.input'].seek(0)
+            statuses = []
+            response = handler(environ, lambda status, _: statuses.append(status))
+            content = b''.join(response)
+            response.close()
+            self.check_response(int(statuses[0].split()[0]), content)
+        return request_count / (time.perf_counter() - started)
+
+    async def run_async(self, request_count, concurrency) -> float:
+        """Return reorders per second of concurrent requests to the ASGI handler"""
+        handler = get_asgi_application()
+        headers = [(name.lower().encode(), value.encode())
+                   for name, value in self.get_headers().items()]
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def reorder(i):
+            async with semaphore:
+                await self.send_asgi_request(handler, headers, self.get_body(i))
+
+        started = time.perf_counter()
+        await asyncio.gather(*(reorder(i) for i in range(request_count)))
+        return request_count / (time.perf_counter() - started)
+
+    async def send_asgi_request(self, handler, headers, body):
+        scope = {
+            'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1',
+            'method': 'POST', 'scheme': 'http', 'path': self.path,
+            'query_string': b'', 'server': ('127.0.0.1', 80),
+            'client': ('127.0.0.1', 0),
+            'headers': headers + [(b'host', b'127.0.0.1'),
+                                  (b'content-length', str(len(body)).encode())],
+        }
+        finished = asyncio.Event()
+        messages = [{'type': 'http.request', 'body': body, 'more_body': False}]
+        response = {'status': None, 'body': b''}
+
+        async def receive():
+            if messages:
+                return messages.pop()
+            # The handler listens for a disconnect while the view runs
+            await finished.wait()
+            return {'type': 'http.disconnect'}
+
+        async def send(message):
+            if message['type'] == 'http.response.start':
+                response['status'] = message['status']
+            elif message['type'] == 'http.response.body':
+                response['body'] += message.get('body', b'')
+                if not message.get('more_body'):
+                    finished.set()
+
+        await handler(scope, receive, send)
+        self.check_response(response['status'], response['body'])
@@ -0,0 +1,52 @@
+"""
+Django command for spreading tag positions that ran out of gaps
+"""
+from django.core.management.base import BaseCommand
+from django.db.models import F, Window
+from django.db.models.functions import Lag
+from posts.models import POSITION_STEP, Post, PostTag, TagGroup, TagGroupTag
+
+
+class Command(BaseCommand):
+    help = ('Spread tag positions of Posts and TagGroups where gaps between '
+            'neighbouring tags became too small for further moves')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--min-gap',
+            type=int,
+            default=POSITION_STEP >> 8,
+            help='Rebalance items where any gap between positions is below this value',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Show how many items would be rebalanced without changing them',
+        )
+
+    def handle(self, *args, **options):
+        def get_crowded_item_ids(through_model, item_field):
+            """Get ids of items having two neighbouring positions closer than min gap"""
+            gaps = through_model.objects.annotate(
+                gap=F('position') - Window(
+                    Lag('position', default=0),
+                    partition_by=[F(item_field)],
+                    order_by=F('position').asc(),
+                )
+            ).filter(gap__lt=options['min_gap'])
+            return set(gaps.values_list(item_field, flat=True))
+
+        for item_model, through_model, item_field in (
+                (Post, PostTag, 'post_id'), (TagGroup, TagGroupTag, 'tag_group_id')):
+            item_ids = get_crowded_item_ids(through_model, item_field)
+            label = item_model._meta.verbose_name_plural
+
+            if options['dry_run']:
+                self.stdout.write(f"Would rebalance {len(item_ids)} {label} (dry run)")
+                continue
+
+            for item in item_model.objects.filter(id__in=item_ids).iterator():
+                item.rebalance_positions()
+            self.stdout.write(
+                self.style.SUCCESS(f"Rebalanced {len(item_ids)} {label}")
+            )
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-18 07:18
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0019_alter_post_description'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['user', '-updated_at', '-id'], name='post_user_recent_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='taggroup',
+            index=models.Index(fields=['user', '-updated_at', '-id'], name='taggroup_user_recent_idx'),
+        ),
+    ]
@@ -0,0 +1,61 @@
+# Generated by Django 5.2.18 on 2026-10-18 07:21
+
+from django.db import migrations, models
+
+# Value of posts.models.POSITION_STEP at the time of this migration
+POSITION_STEP = 1 << 16
+BATCH_SIZE = 1000
+
+
+def spread_positions(apps, step, first_position):
+    """Renumber positions per Post/TagGroup keeping the order of Tags"""
+    for model_name, item_field in (('PostTag', 'post_id'),
+                                   ('TagGroupTag', 'tag_group_id')):
+        through_model = apps.get_model('posts', model_name)
+        rows = through_model.objects.order_by(item_field, 'position', 'id').only(
+            'id', item_field, 'position')
+
+        to_update = []
+        current_item, index = None, 0
+        for rel in rows.iterator(chunk_size=BATCH_SIZE):
+            if getattr(rel, item_field) != current_item:
+                current_item, index = getattr(rel, item_field), 0
+            position = first_position + index * step
+            index += 1
+            if rel.position != position:
+                rel.position = position
+                to_update.append(rel)
+            if len(to_update) >= BATCH_SIZE:
+                through_model.objects.bulk_update(to_update, ['position'])
+                to_update = []
+        if to_update:
+            through_model.objects.bulk_update(to_update, ['position'])
+
+
+def spread_positions_by_step(apps, schema_editor):
+    spread_positions(apps, POSITION_STEP, POSITION_STEP)
+
+
+def pack_positions_densely(apps, schema_editor):
+    spread_positions(apps, 1, 0)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0020_post_taggroup_recent_indexes'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='posttag',
+            name='position',
+            field=models.PositiveBigIntegerField(),
+        ),
+        migrations.AlterField(
+            model_name='taggrouptag',
+            name='position',
+            field=models.PositiveBigIntegerField(),
+        ),
+        migrations.RunPython(spread_positions_by_step, pack_positions_densely),
+    ]
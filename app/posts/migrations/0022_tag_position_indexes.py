@@ -0,0 +1,21 @@
+# Generated by Django 5.2.18 on 2026-10-18 09:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0021_gap_based_tag_positions'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='posttag',
+            index=models.Index(fields=['post', 'position'], name='posttag_position_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='taggrouptag',
+            index=models.Index(fields=['tag_group', 'position'], name='taggrouptag_position_idx'),
+        ),
+    ]
@@ -0,0 +1,147 @@
+# Generated by Django 5.2.18 on 2026-10-18 09:40
+
+from django.db import migrations, models
+
+THROUGH_TABLES = ('posts_posttag', 'posts_taggrouptag')
+
+# Statement-level triggers update each Tag once per statement,
+# however many of its rows a bulk insert, delete or cascade touches
+POSTGRESQL_FUNCTIONS = """
+CREATE OR REPLACE FUNCTION posts_tag_usage_insert() RETURNS trigger AS $$
+BEGIN
+    UPDATE posts_tag SET usage_count = usage_count + delta.usages
+    FROM (SELECT tag_id, count(*) AS usages FROM new_rows GROUP BY tag_id) AS delta
+    WHERE posts_tag.id = delta.tag_id;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION posts_tag_usage_delete() RETURNS trigger AS $$
+BEGIN
+    UPDATE posts_tag SET usage_count = usage_count - delta.usages
+    FROM (SELECT tag_id, count(*) AS usages FROM old_rows GROUP BY tag_id) AS delta
+    WHERE posts_tag.id = delta.tag_id;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION posts_tag_usage_update() RETURNS trigger AS $$
+BEGIN
+    UPDATE posts_tag SET usage_count = usage_count + delta.usages
+    FROM (
+        SELECT tag_id, sum(usages) AS usages FROM (
+            SELECT tag_id, 1 AS usages FROM new_rows
+            UNION ALL
+            SELECT tag_id, -1 AS usages FROM old_rows
+        ) AS changes GROUP BY tag_id HAVING sum(usages) <> 0
+    ) AS delta
+    WHERE posts_tag.id = delta.tag_id;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+"""
+
+POSTGRESQL_TRIGGERS = """
+CREATE TRIGGER {table}_usage_insert AFTER INSERT ON {table}
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION posts_tag_usage_insert();
+CREATE TRIGGER {table}_usage_delete AFTER DELETE ON {table}
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION posts_tag_usage_delete();
+CREATE TRIGGER {table}_usage_update AFTER UPDATE ON {table}
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION posts_tag_usage_update();
+"""
+
+POSTGRESQL_DROP = """
+DROP TRIGGER IF EXISTS {table}_usage_insert ON {table};
+DROP TRIGGER IF EXISTS {table}_usage_delete ON {table};
+DROP TRIGGER IF EXISTS {table}_usage_update ON {table};
+"""
+
+POSTGRESQL_DROP_FUNCTIONS = """
+DROP FUNCTION IF EXISTS posts_tag_usage_insert();
+DROP FUNCTION IF EXISTS posts_tag_usage_delete();
+DROP FUNCTION IF EXISTS posts_tag_usage_update();
+"""
+
+# SQLite has no statement-level triggers, rows are counted one by one
+SQLITE_TRIGGERS = [
+    """
+    CREATE TRIGGER {table}_usage_insert AFTER INSERT ON {table} BEGIN
+        UPDATE posts_tag SET usage_count = usage_count + 1 WHERE id = NEW.tag_id;
+    END
+    """,
+    """
+    CREATE TRIGGER {table}_usage_delete AFTER DELETE ON {table} BEGIN
+        UPDATE posts_tag SET usage_count = usage_count - 1 WHERE id = OLD.tag_id;
+    END
+    """,
+    """
+    CREATE TRIGGER {table}_usage_update AFTER UPDATE OF tag_id ON {table}
+    WHEN OLD.tag_id <> NEW.tag_id BEGIN
+        UPDATE posts_tag SET usage_count = usage_count - 1 WHERE id = OLD.tag_id;
+        UPDATE posts_tag SET usage_count = usage_count + 1 WHERE id = NEW.tag_id;
+    END
+    """,
+]
+
+SQLITE_DROP = [
+    "DROP TRIGGER IF EXISTS {table}_usage_insert",
+    "DROP TRIGGER IF EXISTS {table}_usage_delete",
+    "DROP TRIGGER IF EXISTS {table}_usage_update",
+]
+
+COUNT_USAGES = """
+UPDATE posts_tag SET usage_count =
+    (SELECT count(*) FROM posts_posttag WHERE tag_id = posts_tag.id)
+    + (SELECT count(*) FROM posts_taggrouptag WHERE tag_id = posts_tag.id)
+"""
+
+
+def get_statements(vendor, postgresql_sql, sqlite_statements):
+    """Return SQL statements for every through table on the given DB vendor"""
+    if vendor == 'postgresql':
+        return [postgresql_sql.format(table=table) for table in THROUGH_TABLES]
+    if vendor == 'sqlite':
+        return [statement.format(table=table)
+                for table in THROUGH_TABLES for statement in sqlite_statements]
+    raise NotImplementedError(f"Tag usage triggers aren't available for {vendor}")
+
+
+def create_usage_triggers(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    statements = get_statements(vendor, POSTGRESQL_TRIGGERS, SQLITE_TRIGGERS)
+    if vendor == 'postgresql':
+        statements.insert(0, POSTGRESQL_FUNCTIONS)
+    for statement in statements + [COUNT_USAGES]:
+        schema_editor.execute(statement)
+
+
+def drop_usage_triggers(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    statements = get_statements(vendor, POSTGRESQL_DROP, SQLITE_DROP)
+    if vendor == 'postgresql':
+        statements.append(POSTGRESQL_DROP_FUNCTIONS)
+    for statement in statements:
+        schema_editor.execute(statement)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0022_tag_position_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='tag',
+            name='usage_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddIndex(
+            model_name='tag',
+            index=models.Index(condition=models.Q(('usage_count', 0)), fields=['usage_count'], name='tag_orphan_idx'),
+        ),
+        migrations.RunPython(create_usage_triggers, drop_usage_triggers),
+    ]
@@ -0,0 +1,134 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:25
+
+import django.utils.timezone
+from django.db import migrations, models
+
+THROUGH_TABLES = ('posts_posttag', 'posts_taggrouptag')
+
+# Same functions as in 0023, now also recording when a Tag's usages changed
+POSTGRESQL_FUNCTIONS = """
+CREATE OR REPLACE FUNCTION posts_tag_usage_insert() RETURNS trigger AS $$
+BEGIN
+    UPDATE posts_tag SET usage_count = usage_count + delta.usages, touched_at = now()
+    FROM (SELECT tag_id, count(*) AS usages FROM new_rows GROUP BY tag_id) AS delta
+    WHERE posts_tag.id = delta.tag_id;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION posts_tag_usage_delete() RETURNS trigger AS $$
+BEGIN
+    UPDATE posts_tag SET usage_count = usage_count - delta.usages, touched_at = now()
+    FROM (SELECT tag_id, count(*) AS usages FROM old_rows GROUP BY tag_id) AS delta
+    WHERE posts_tag.id = delta.tag_id;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION posts_tag_usage_update() RETURNS trigger AS $$
+BEGIN
+    UPDATE posts_tag SET usage_count = usage_count + delta.usages, touched_at = now()
+    FROM (
+        SELECT tag_id, sum(usages) AS usages FROM (
+            SELECT tag_id, 1 AS usages FROM new_rows
+            UNION ALL
+            SELECT tag_id, -1 AS usages FROM old_rows
+        ) AS changes GROUP BY tag_id HAVING sum(usages) <> 0
+    ) AS delta
+    WHERE posts_tag.id = delta.tag_id;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+"""
+
+# Functions of 0023, restored on reverse
+POSTGRESQL_PREVIOUS_FUNCTIONS = POSTGRESQL_FUNCTIONS.replace(', touched_at = now()', '')
+
+SQLITE_NOW = "strftime('%Y-%m-%d %H:%M:%f', 'now')"
+
+SQLITE_TRIGGERS = [
+    """
+    CREATE TRIGGER {table}_usage_insert AFTER INSERT ON {table} BEGIN
+        UPDATE posts_tag SET usage_count = usage_count + 1{touch}
+        WHERE id = NEW.tag_id;
+    END
+    """,
+    """
+    CREATE TRIGGER {table}_usage_delete AFTER DELETE ON {table} BEGIN
+        UPDATE posts_tag SET usage_count = usage_count - 1{touch}
+        WHERE id = OLD.tag_id;
+    END
+    """,
+    """
+    CREATE TRIGGER {table}_usage_update AFTER UPDATE OF tag_id ON {table}
+    WHEN OLD.tag_id <> NEW.tag_id BEGIN
+        UPDATE posts_tag SET usage_count = usage_count - 1{touch}
+        WHERE id = OLD.tag_id;
+        UPDATE posts_tag SET usage_count = usage_count + 1{touch}
+        WHERE id = NEW.tag_id;
+    END
+    """,
+]
+
+SQLITE_DROP = [
+    "DROP TRIGGER IF EXISTS {table}_usage_insert",
+    "DROP TRIGGER IF EXISTS {table}_usage_delete",
+    "DROP TRIGGER IF EXISTS {table}_usage_update",
+]
+
+
+def execute_sqlite_triggers(schema_editor, statements, touch_sql=''):
+    for table in THROUGH_TABLES:
+        for statement in statements:
+            schema_editor.execute(statement.format(table=table, touch=touch_sql))
+
+
+def check_vendor(schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor not in ('postgresql', 'sqlite'):
+        raise NotImplementedError(f"Tag usage triggers aren't available for {vendor}")
+    return vendor
+
+
+# SQLite rebuilds posts_tag to add a column, which fails while triggers
+# of other tables refer to it, so they are dropped around the change
+def drop_sqlite_triggers(apps, schema_editor):
+    if check_vendor(schema_editor) == 'sqlite':
+        execute_sqlite_triggers(schema_editor, SQLITE_DROP)
+
+
+def restore_sqlite_triggers(apps, schema_editor):
+    if check_vendor(schema_editor) == 'sqlite':
+        execute_sqlite_triggers(schema_editor, SQLITE_TRIGGERS)
+
+
+def add_touch_to_triggers(apps, schema_editor):
+    if check_vendor(schema_editor) == 'postgresql':
+        schema_editor.execute(POSTGRESQL_FUNCTIONS)
+    else:
+        execute_sqlite_triggers(schema_editor, SQLITE_TRIGGERS,
+                                f', touched_at = {SQLITE_NOW}')
+
+
+def remove_touch_from_triggers(apps, schema_editor):
+    if check_vendor(schema_editor) == 'postgresql':
+        schema_editor.execute(POSTGRESQL_PREVIOUS_FUNCTIONS)
+    else:
+        execute_sqlite_triggers(schema_editor, SQLITE_DROP)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0023_tag_usage_count'),
+    ]
+
+    operations = [
+        migrations.RunPython(drop_sqlite_triggers, restore_sqlite_triggers),
+        migrations.AddField(
+            model_name='tag',
+            name='touched_at',
+            field=models.DateTimeField(db_index=True, default=django.utils.timezone.now, editable=False),
+        ),
+        migrations.RunPython(add_touch_to_triggers, remove_touch_from_triggers),
+    ]
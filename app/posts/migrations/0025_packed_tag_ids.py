@@ -0,0 +1,49 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:50
+
+import struct
+
+from django.db import migrations, models
+
+PACKED_TAG_ID = struct.Struct('<q')
+BATCH_SIZE = 500
+
+
+def pack_tag_orders(apps, schema_editor):
+    """Copy the order of existing through rows into packed_tag_ids"""
+    for item_name, through_name, item_field in (
+            ('Post', 'PostTag', 'post_id'), ('TagGroup', 'TagGroupTag', 'tag_group_id')):
+        item_model = apps.get_model('posts', item_name)
+        through_model = apps.get_model('posts', through_name)
+        item_ids = list(item_model.objects.order_by('id').values_list('id', flat=True))
+        for start in range(0, len(item_ids), BATCH_SIZE):
+            packed = {item_id: b'' for item_id in item_ids[start:start + BATCH_SIZE]}
+            rows = through_model.objects.filter(**{f'{item_field}__in': packed}).order_by(
+                item_field, 'position').values_list(item_field, 'tag_id')
+            for item_id, tag_id in rows:
+                packed[item_id] += PACKED_TAG_ID.pack(tag_id)
+            item_model.objects.bulk_update(
+                [item_model(id=item_id, packed_tag_ids=data)
+                 for item_id, data in packed.items() if data],
+                ['packed_tag_ids'],
+            )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0024_tag_touched_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='packed_tag_ids',
+            field=models.BinaryField(default=b''),
+        ),
+        migrations.AddField(
+            model_name='taggroup',
+            name='packed_tag_ids',
+            field=models.BinaryField(default=b''),
+        ),
+        migrations.RunPython(pack_tag_orders, migrations.RunPython.noop),
+    ]
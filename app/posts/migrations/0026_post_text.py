@@ -0,0 +1,46 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:20
+
+from django.db import migrations, models
+
+PLAIN_TEXT_SEPARATOR = '\n\n'
+BATCH_SIZE = 500
+
+
+def render_post_texts(apps, schema_editor):
+    """Render hashtags and plain text of existing Posts"""
+    Post = apps.get_model('posts', 'Post')
+    PostTag = apps.get_model('posts', 'PostTag')
+    post_ids = list(Post.objects.order_by('id').values_list('id', flat=True))
+    for start in range(0, len(post_ids), BATCH_SIZE):
+        posts = list(Post.objects.filter(id__in=post_ids[start:start + BATCH_SIZE]))
+        names = {post.id: [] for post in posts}
+        rows = PostTag.objects.filter(post_id__in=names).order_by(
+            'post_id', 'position').values_list('post_id', 'tag__name')
+        for post_id, name in rows:
+            names[post_id].append(f'#{name}')
+        for post in posts:
+            post.tags_text = ' '.join(names[post.id])
+            post.plain_text = post.description + (
+                PLAIN_TEXT_SEPARATOR + post.tags_text if post.tags_text else '')
+        Post.objects.bulk_update(posts, ['tags_text', 'plain_text'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0025_packed_tag_ids'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='plain_text',
+            field=models.TextField(blank=True, default='', editable=False),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='tags_text',
+            field=models.TextField(blank=True, default='', editable=False),
+        ),
+        migrations.RunPython(render_post_texts, migrations.RunPython.noop),
+    ]
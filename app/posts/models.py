@@ -1,11 +1,19 @@
+import struct
+
 from django.db import models
+from django.conf import settings
 from django.contrib.auth import get_user_model
-from django.db import transaction
+from django.db import IntegrityError, connection, transaction
 from django.core.validators import RegexValidator, MaxLengthValidator
-from django.db.models import Count
-from django.db.models.signals import pre_delete
+from django.db.models import (Case, Exists, F, Func, IntegerField, Max, Min,
+                              OuterRef, Q, TextField, Value, When)
+from django.db.models.functions import Cast, Concat, Substr
+from django.db.models.signals import post_delete, post_save, pre_delete, m2m_changed
 from django.dispatch import receiver
+from django.utils import timezone
+from core.jobs import schedule_job
 from posts.fields import StrippedCharField
+from posts.read_cache import bump_generation
 
 
 User = get_user_model()
@@ -25,8 +33,71 @@ HASHTAG_REGEX = (
     r']+$'
 )
 TG_NAME_MAX_LENGTH = 64
+UNTITLED_TG_NAME = 'Untitled TagGroup {}'
+# Attempts to pick a free name when another request takes it first
+UNTITLED_TG_NAME_RETRIES = 5
+# Tag positions are spread with gaps, so a tag can be moved or inserted
+# between two others by writing only its own row
+POSITION_STEP = 1 << 16
 POST_TITLE_MAX_LENGTH = 100
+# Kind of the job deleting Tags that are not used anywhere, see posts.jobs
+ORPHAN_SWEEP_JOB = 'posts.sweep_orphaned_tags'
 POST_DESC_MAX_LENGTH = 5000
+# Format of one Tag id in TagOperationMixin.packed_tag_ids
+PACKED_TAG_ID = struct.Struct('<q')
+# Put between the description and the tags in Post.plain_text
+PLAIN_TEXT_SEPARATOR = '\n\n'
+
+# Statement behind TagOperationMixin.update_tags_postgresql. Positions are
+# planned in Python, so rows keeping theirs aren't written, like in update_tags.
+# Nothing is written when some of the ids don't exist, they are returned instead.
+UPDATE_TAGS_POSTGRESQL_SQL = """
+WITH planned AS (
+    SELECT tag_id, position, ord
+    FROM unnest(%(tag_ids)s::bigint[], %(positions)s::bigint[])
+        WITH ORDINALITY AS planned (tag_id, position, ord)
+), missing AS (
+    SELECT coalesce(array_agg(planned.tag_id ORDER BY planned.ord), '{{}}') AS tag_ids
+    FROM planned
+    WHERE NOT EXISTS (SELECT 1 FROM {tag_table} AS tag WHERE tag.id = planned.tag_id)
+), valid AS (
+    SELECT cardinality(tag_ids) = 0 AS ok FROM missing
+), deleted AS (
+    DELETE FROM {table}
+    WHERE {item_column} = %(item_id)s
+      AND tag_id NOT IN (SELECT tag_id FROM planned)
+      AND (SELECT ok FROM valid)
+    RETURNING tag_id
+), upserted AS (
+    INSERT INTO {table} AS target ({item_column}, tag_id, position)
+    SELECT %(item_id)s, tag_id, position FROM planned WHERE (SELECT ok FROM valid)
+    ON CONFLICT ({item_column}, tag_id) DO UPDATE SET position = EXCLUDED.position
+    WHERE target.position <> EXCLUDED.position
+    RETURNING tag_id
+), changes AS (
+    SELECT EXISTS (SELECT 1 FROM deleted) OR EXISTS (SELECT 1 FROM upserted) AS changed
+), tag_text AS (
+    SELECT coalesce(string_agg('#' || tag.name, ' ' ORDER BY planned.ord), '') AS joined
+    FROM planned JOIN {tag_table} AS tag ON tag.id = planned.tag_id
+), stored AS (
+    UPDATE {item_table}
+    SET packed_tag_ids = %(packed_tag_ids)s{text_assignments},
+        updated_at = CASE WHEN (SELECT changed FROM changes) THEN %(now)s
+                          ELSE updated_at END
+    WHERE id = %(item_id)s
+      AND (SELECT ok FROM valid)
+      AND ((SELECT changed FROM changes) OR packed_tag_ids <> %(packed_tag_ids)s)
+    RETURNING id
+)
+SELECT (SELECT tag_ids FROM missing), (SELECT changed FROM changes),
+       (SELECT joined FROM tag_text)
+"""
+
+# Post columns set by UPDATE_TAGS_POSTGRESQL_SQL, same texts as Post.set_tag_order
+POST_TEXT_ASSIGNMENTS_SQL = """,
+        tags_text = (SELECT joined FROM tag_text),
+        plain_text = description || CASE WHEN (SELECT joined FROM tag_text) = '' THEN ''
+            ELSE %(text_separator)s || (SELECT joined FROM tag_text) END"""
 
 hashtag_validator = RegexValidator(
     regex=HASHTAG_REGEX,
@@ -34,22 +105,236 @@ hashtag_validator = RegexValidator(
 )
 
 
+def split_tag_names(raw_input: str) -> list:
+    """Split comma, hashtag or space separated input into unique lowercase names"""
+    names = raw_input.replace(",", " ").replace("#", " ").lower().split()
+    # dict keeps the first occurrence of every name in input order
+    return list(dict.fromkeys(names))
+
+
+def intern_tags(tag_names: list) -> list:
+    """
+    Return ids of Tags with given names in input order, creating missing ones.
+    Names are matched case-insensitively, the same way Tag.save stores them.
+    Raises ValidationError for the first invalid name before touching the DB.
+    """
+    tag_names = list(dict.fromkeys(name.lower() for name in tag_names))
+    for name in tag_names:
+        Tag(name=name).full_clean(validate_unique=False, validate_constraints=False)
+
+    rows = Tag.objects.filter(name__in=tag_names).values_list('name', 'id',
+                                                              'usage_count')
+    name_to_id = {name: tag_id for name, tag_id, _ in rows}
+    unused_ids = [tag_id for _, tag_id, usage_count in rows if usage_count == 0]
+    if unused_ids:
+        # The orphan sweeper keeps recently touched Tags, so they live until
+        # the caller attaches them. A sweep running now may have deleted some.
+        touched = Tag.objects.filter(id__in=unused_ids).update(
+            touched_at=timezone.now())
+        if touched < len(unused_ids):
+            name_to_id = dict(
+                Tag.objects.filter(name__in=tag_names).values_list('name', 'id')
+            )
+    missing_names = [name for name in tag_names if name not in name_to_id]
+    if missing_names:
+        # Another request may create the same Tag concurrently,
+        # so conflicts on the unique name are skipped and re-read below
+        Tag.objects.bulk_create(
+            [Tag(name=name) for name in missing_names], ignore_conflicts=True
+        )
+        name_to_id.update(
+            Tag.objects.filter(name__in=missing_names).values_list('name', 'id')
+        )
+    return [name_to_id[name] for name in tag_names]
+
+
+def longest_increasing_run(positions: list) -> set:
+    """Return indexes of the longest strictly increasing subsequence of positions"""
+    tails = []  # tails[k] is the index ending the best subsequence of length k + 1
+    previous = [None] * len(positions)
+    for index, position in enumerate(positions):
+        low, high = 0, len(tails)
+        while low < high:
+            middle = (low + high) // 2
+            if positions[tails[middle]] < position:
+                low = middle + 1
+            else:
+                high = middle
+        previous[index] = tails[low - 1] if low else None
+        if low == len(tails):
+            tails.append(index)
+        else:
+            tails[low] = index
+
+    kept = set()
+    index = tails[-1] if tails else None
+    while index is not None:
+        kept.add(index)
+        index = previous[index]
+    return kept
+
+
+def plan_positions(ordered_tag_ids: list, current_positions: dict) -> dict:
+    """
+    Return {tag_id: position} for tags in the given order.
+    The largest group of tags that is already in order keeps its positions,
+    other tags get positions inside the gaps between them, so a single move or
+    an append writes only the affected rows. When a gap is too small,
+    all tags are spread again by POSITION_STEP.
+    """
+    kept_indexes = longest_increasing_run(
+        [current_positions[tag_id] for tag_id in ordered_tag_ids
+         if tag_id in current_positions]
+    )
+    anchors = []  # (index in ordered_tag_ids, position) of tags that keep positions
+    kept_index = 0
+    for index, tag_id in enumerate(ordered_tag_ids):
+        if tag_id in current_positions:
+            if kept_index in kept_indexes:
+                anchors.append((index, current_positions[tag_id]))
+            kept_index += 1
+
+    positions = {}
+    previous_index, low = -1, -1
+    for next_index, high in anchors + [(len(ordered_tag_ids), None)]:
+        run = ordered_tag_ids[previous_index + 1:next_index]
+        if high is None:
+            for shift, tag_id in enumerate(run, start=1):
+                positions[tag_id] = max(low, 0) + shift * POSITION_STEP
+        elif high - low > len(run):
+            for shift, tag_id in enumerate(run, start=1):
+                positions[tag_id] = low + (high - low) * shift // (len(run) + 1)
+        else:
+            return {tag_id: (index + 1) * POSITION_STEP
+                    for index, tag_id in enumerate(ordered_tag_ids)}
+        if high is not None:
+            positions[ordered_tag_ids[next_index]] = high
+        previous_index, low = next_index, high
+    return positions
+
+
+def pack_tag_ids(tag_ids) -> bytes:
+    """Pack ordered Tag ids into bytes stored in packed_tag_ids"""
+    return b''.join(PACKED_TAG_ID.pack(tag_id) for tag_id in tag_ids)
+
+
+def unpack_tag_ids(packed) -> list:
+    """Unpack Tag ids from packed_tag_ids, the DB may return a memoryview"""
+    return [tag_id for tag_id, in PACKED_TAG_ID.iter_unpack(bytes(packed))]
+
+
+def tags_in_order(tag_ids: list):
+    """QuerySet of Tags with the given ids in the order of the list"""
+    if not tag_ids:
+        return Tag.objects.none()
+    return Tag.objects.filter(id__in=tag_ids).order_by(Case(
+        *(When(id=tag_id, then=index) for index, tag_id in enumerate(tag_ids)),
+        output_field=IntegerField(),
+    ))
+
+
+def fetch_tags_in_order(tag_ids: list) -> list:
+    """
+    Tags with the given ids in the order of the list. Compiling the CASE of
+    tags_in_order takes longer than the query itself, so the rows are fetched
+    without it and put in order here.
+    """
+    if not tag_ids:
+        return []
+    tags_by_id = {tag.id: tag for tag in Tag.objects.filter(id__in=tag_ids).order_by()}
+    return [tags_by_id[tag_id] for tag_id in tag_ids if tag_id in tags_by_id]
+
+
+class ConcatBytes(Func):
+    """Concatenation of binary values with the || operator"""
+    template = '(%(expressions)s)'
+    arg_joiner = ' || '
+    output_field = models.BinaryField()
+
+    def as_sqlite(self, compiler, connection, **extra_context):
+        # SQLite returns text for ||, its bytes are kept by casting it back
+        return self.as_sql(compiler, connection,
+                           template='CAST(%(expressions)s AS BLOB)', **extra_context)
+
+
+def build_tags_text(tag_names) -> str:
+    """Hashtag line of a Post: "#tag1 #tag2" """
+    return ' '.join(f'#{name}' for name in tag_names)
+
+
+def build_plain_text(description: str, tags_text: str) -> str:
+    """Whole Post as plain text, like the copy button puts it together"""
+    return description + (PLAIN_TEXT_SEPARATOR + tags_text if tags_text else '')
+
+
+def plain_text_expression(description, tags_text):
+    """
+    build_plain_text for UPDATE statements, each argument is either a new value
+    or F() of the column, so a stale loaded value isn't written
+    """
+    if isinstance(tags_text, str):
+        suffix = Value(PLAIN_TEXT_SEPARATOR + tags_text if tags_text else '')
+    else:
+        suffix = Case(
+            When(tags_text='', then=Value('')),
+            default=Concat(Value(PLAIN_TEXT_SEPARATOR), tags_text,
+                           output_field=TextField()),
+            output_field=TextField(),
+        )
+    if isinstance(description, str):
+        description = Value(description)
+    return Concat(description, suffix, output_field=TextField())
+
+
 def generate_unique_tg_name(user):
-    counter = 1
-    base_name = 'Untitled TagGroup {}'
-    unique_name = base_name.format(counter)
-    while TagGroup.objects.filter(name=unique_name, user=user).exists():
-        counter += 1
-        unique_name = base_name.format(counter)
-    return unique_name
+    """
+    Return the first free "Untitled TagGroup N" name. The lowest taken N and
+    the lowest N after a taken one that is free are found in one query.
+    """
+    prefix = UNTITLED_TG_NAME.format('')
+
+    def number(name):
+        return Cast(Substr(name, len(prefix) + 1), IntegerField())
+
+    next_taken = TagGroup.objects.filter(user=user, name=Concat(
+        Value(prefix), Cast(number(OuterRef('name')) + 1, TextField())))
+    numbers = TagGroup.objects.filter(
+        # Longer numbers don't fit the cast, they can't take small ones anyway
+        user=user, name__regex='^' + UNTITLED_TG_NAME.format('[1-9][0-9]{0,8}') + '$',
+    ).aggregate(
+        lowest=Min(number('name')),
+        first_gap=Min(number('name') + 1, filter=~Exists(next_taken)),
+    )
+    if numbers['lowest'] != 1:
+        return UNTITLED_TG_NAME.format(1)
+    return UNTITLED_TG_NAME.format(numbers['first_gap'])
 
 
 class TagOperationMixin(models.Model):
     """Mixin that provides operations on tags for Post and TagGroup"""
 
+    # Ordered ids of the attached Tags, a copy of the through table order written
+    # together with it, so ordered_tags can skip the join (TAG_ORDER_SOURCE)
+    packed_tag_ids = models.BinaryField(default=b'', editable=False)
+
+    # Fields written by tag operations only, so saving a loaded item
+    # can't bring back the order it was loaded with
+    TAG_ORDER_FIELDS = ('packed_tag_ids',)
+
     class Meta:
         abstract = True
 
+    def save(self, *args, **kwargs):
+        if not self._state.adding and kwargs.get('update_fields') is None:
+            kwargs['update_fields'] = self.get_saved_field_names()
+        super().save(*args, **kwargs)
+        bump_generation(self.user_id)
+
+    def get_saved_field_names(self) -> list:
+        """Fields written by a save() without update_fields"""
+        return [field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in self.TAG_ORDER_FIELDS]
+
     def clear_tags(self):
         """Delete tags that are only used by this Post/TagGroup and nowhere else"""
         if isinstance(self, Post):
@@ -59,40 +344,147 @@ class TagOperationMixin(models.Model):
             # Get only the Tags from this specific TagGroup
             tags_in_instance = Tag.objects.filter(taggrouptag__tag_group=self)
 
-        # Only check these specific tags for orphan status
-        # It's a bit more efficient than filtering through all the Tags
-        tags_to_check = Tag.objects.filter(id__in=tags_in_instance)
+        # The single usage of these Tags is this Post/TagGroup
+        tags_in_instance.filter(usage_count=1).delete()
+        bump_generation(self.user_id)
 
-        tags_to_check.annotate(
-            pt_count=Count('posttag')
-        ).annotate(
-            tg_count=Count('taggrouptag')
-        ).filter(
-            pt_count=1 if isinstance(self, Post) else 0,
-            tg_count=0 if isinstance(self, Post) else 1
-        ).delete()
+    def delete(self, *args, **kwargs):
+        result = super().delete(*args, **kwargs)
+        bump_generation(self.user_id)
+        # Tags left unused are deleted later by the orphan sweeper,
+        # there are no delete signals so cascades can use fast deletes
+        schedule_job(ORPHAN_SWEEP_JOB)
+        return result
 
     @property
     def ordered_tags(self):
+        """Ordered Tags as a QuerySet, reads of the whole order use ordered_tag_list"""
+        if settings.TAG_ORDER_SOURCE == 'packed':
+            # Ids of since deleted Tags are skipped by the lookup
+            return tags_in_order(unpack_tag_ids(self.packed_tag_ids))
         if isinstance(self, Post):
             return Tag.objects.filter(posttag__post=self).order_by('posttag__position')
-        else:  # TagGroup
-            return Tag.objects.filter(taggrouptag__tag_group=self).order_by(
-                'taggrouptag__position')
+        # TagGroup
+        return Tag.objects.filter(
+            taggrouptag__tag_group=self).order_by('taggrouptag__position')
+
+    @property
+    def ordered_tag_list(self) -> list:
+        """Ordered Tags, loaded with one query and reused until they change"""
+        if '_ordered_tags' not in self.__dict__:
+            if settings.TAG_ORDER_SOURCE == 'packed':
+                tags = fetch_tags_in_order(unpack_tag_ids(self.packed_tag_ids))
+            else:
+                tags = list(self.ordered_tags)
+            self.__dict__['_ordered_tags'] = tags
+        return self.__dict__['_ordered_tags']
 
     @property
     def ordered_tag_ids(self):
-        if isinstance(self, Post):
-            return list(
-                PostTag.objects.filter(post=self).order_by('position').values_list(
-                    'tag_id', flat=True))
-        else:  # TagGroup
-            return list(TagGroupTag.objects.filter(tag_group=self).order_by(
-                'position').values_list('tag_id', flat=True))
+        return [tag.id for tag in self.ordered_tag_list]
+
+    def forget_ordered_tags(self):
+        """Drop the cached ordered Tags, so the next access reads them again"""
+        self.__dict__.pop('_ordered_tags', None)
+
+    def refresh_from_db(self, *args, **kwargs):
+        super().refresh_from_db(*args, **kwargs)
+        self.forget_ordered_tags()
+
+    def read_tag_order(self) -> list:
+        """Ordered Tag ids read from the through table"""
+        through_model, item_field = self.get_tag_through()
+        return list(through_model.objects.filter(**{item_field: self}).order_by(
+            'position').values_list('tag_id', flat=True))
+
+    def set_tag_order(self, tag_ids, names=None) -> dict:
+        """
+        Set TAG_ORDER_FIELDS for the ordered Tag ids, return values to write.
+        Names of the Tags by id are read unless given.
+        """
+        self.packed_tag_ids = pack_tag_ids(tag_ids)
+        return {'packed_tag_ids': self.packed_tag_ids}
+
+    def save_tag_order(self, tag_ids, touch=True, names=None, bump=True):
+        """
+        Write TAG_ORDER_FIELDS for the ordered Tag ids, and updated_at if touch.
+        Callers saving several items of a user may bump its generation once.
+        """
+        values = self.set_tag_order(tag_ids, names=names)
+        if touch:
+            self.updated_at = values['updated_at'] = timezone.now()
+        type(self).objects.filter(pk=self.pk).update(**values)
+        self.forget_ordered_tags()
+        if not bump:
+            return
+        if self.user_id is None:  # Only the pk is known when it's saved by a signal
+            self.user_id = type(self).objects.values_list('user_id', flat=True).get(
+                pk=self.pk)
+        bump_generation(self.user_id)
+
+    def store_tag_order(self):
+        """Copy the through table order into TAG_ORDER_FIELDS"""
+        self.save_tag_order(self.read_tag_order(), touch=False)
 
-    @transaction.atomic
     def update_tags(self, ordered_tag_ids: list):
         """Update tags with new order - works for both Post and TagGroup"""
+        if connection.vendor == 'postgresql':
+            self.update_tags_postgresql(ordered_tag_ids)
+        else:
+            self.update_tags_portable(ordered_tag_ids)
+
+    @transaction.atomic
+    def update_tags_postgresql(self, ordered_tag_ids: list):
+        """
+        update_tags with one read and one write: current positions are read and
+        locked, new ones are planned like in update_tags_portable, then the ids
+        and positions are sent as arrays that unnest ... WITH ORDINALITY turns
+        into rows, which are checked, deleted and upserted with updated_at
+        """
+        through_model, item_field = self.get_tag_through()
+        quote = connection.ops.quote_name
+        sql = UPDATE_TAGS_POSTGRESQL_SQL.format(
+            table=quote(through_model._meta.db_table),
+            item_column=quote(through_model._meta.get_field(item_field).column),
+            item_table=quote(self._meta.db_table),
+            tag_table=quote(Tag._meta.db_table),
+            text_assignments=POST_TEXT_ASSIGNMENTS_SQL if isinstance(self, Post) else '',
+        )
+        now = timezone.now()
+        tag_ids = list(dict.fromkeys(int(tag_id) for tag_id in ordered_tag_ids))
+        wanted = set(tag_ids)
+        current_positions = {
+            tag_id: position for tag_id, position in through_model.objects.filter(
+                **{item_field: self}).select_for_update().values_list(
+                'tag_id', 'position')
+            if tag_id in wanted
+        }
+        positions = plan_positions(tag_ids, current_positions)
+        packed_tag_ids = pack_tag_ids(tag_ids)
+        with connection.cursor() as cursor:
+            cursor.execute(sql, {
+                'tag_ids': tag_ids,
+                'positions': [positions[tag_id] for tag_id in tag_ids],
+                'item_id': self.pk,
+                'now': now,
+                'packed_tag_ids': packed_tag_ids,
+                'text_separator': PLAIN_TEXT_SEPARATOR,
+            })
+            missing_tag_ids, changed, tags_text = cursor.fetchone()
+
+        if missing_tag_ids:
+            raise ValueError(f"Tag IDs don't exist: {set(missing_tag_ids)}")
+        self.packed_tag_ids = packed_tag_ids
+        if isinstance(self, Post):
+            self.set_tags_text(tags_text)
+        if changed:
+            self.updated_at = now
+            self.forget_ordered_tags()
+            bump_generation(self.user_id)
+
+    @transaction.atomic
+    def update_tags_portable(self, ordered_tag_ids: list):
+        """update_tags for any database, with gaps planned in Python"""
         if isinstance(self, Post):
             through_model = PostTag
             filter_field = 'post'
@@ -100,9 +492,9 @@ class TagOperationMixin(models.Model):
             through_model = TagGroupTag
             filter_field = 'tag_group'
 
-        # Get current tag IDs
         current_relationships = through_model.objects.filter(**{filter_field: self})
-        current_tag_ids = set(current_relationships.values_list('tag_id', flat=True))
+        current_map = {rel.tag_id: rel for rel in current_relationships}
+        current_tag_ids = set(current_map)
 
         # Remove duplicates while preserving order
         seen = set()
@@ -127,14 +519,17 @@ class TagOperationMixin(models.Model):
         if to_detach:
             current_relationships.filter(tag_id__in=to_detach).delete()
 
-        # Update existing and create new relationships
-        current_map = {rel.tag_id: rel for rel in
-                       through_model.objects.filter(**{filter_field: self})}
+        # Update moved and create new relationships
+        positions = plan_positions(unique_ordered_tag_ids, {
+            tag_id: rel.position for tag_id, rel in current_map.items()
+            if tag_id not in to_detach
+        })
 
         to_update = []
         to_create = []
 
-        for pos, tag_id in enumerate(unique_ordered_tag_ids):
+        for tag_id in unique_ordered_tag_ids:
+            pos = positions[tag_id]
             if tag_id in current_map:
                 rel = current_map.get(tag_id)
                 if rel.position != pos:
@@ -150,7 +545,126 @@ class TagOperationMixin(models.Model):
             through_model.objects.bulk_create(to_create)
 
         if to_update or to_create or to_detach:
-            self.save()  # Update timestamp
+            self.save_tag_order(unique_ordered_tag_ids)
+        elif bytes(self.packed_tag_ids) != pack_tag_ids(unique_ordered_tag_ids):
+            self.save_tag_order(unique_ordered_tag_ids, touch=False)
+
+    @transaction.atomic
+    def move_tags(self, moves: list) -> dict:
+        """
+        Apply moves one after another and return {tag_id: position} of changed rows.
+        A move is {"tag_id": 1, "before_id": 2} to put a tag before another one
+        (a null before_id puts it last) or {"tag_id": 1, "index": 0}.
+        Only the moved rows are written unless a gap runs out.
+        """
+        if isinstance(self, Post):
+            relationships = PostTag.objects.filter(post=self)
+        else:  # TagGroup
+            relationships = TagGroupTag.objects.filter(tag_group=self)
+
+        # The stored order is locked and moved along with the rows, so the whole
+        # order and the Tag names aren't read again
+        stored = type(self).objects.select_for_update().only(
+            *(field for field in self.TAG_ORDER_FIELDS if field != 'plain_text')
+        ).get(pk=self.pk)
+        order = unpack_tag_ids(stored.packed_tag_ids)
+        names = stored.get_stored_tag_names(order)
+
+        changed = {}
+        for move in moves:
+            tag_id = int(move['tag_id'])
+            try:
+                rel = relationships.get(tag_id=tag_id)
+            except relationships.model.DoesNotExist:
+                raise ValueError(f"Tag ID isn't attached: {tag_id}")
+            if move.get('before_id') is not None and int(move['before_id']) == tag_id:
+                continue
+
+            others = relationships.exclude(tag_id=tag_id)
+            low, high = self._get_move_bounds(others, move)
+            if (low is None or low < rel.position) and (
+                    high is None or rel.position < high):
+                continue  # Already in place
+
+            low = -1 if low is None else low
+            if high is not None and high - low < 2:
+                # No free position left between the neighbours
+                self.rebalance_positions()
+                changed.update(relationships.values_list('tag_id', 'position'))
+                low, high = self._get_move_bounds(others, move)
+                low = -1 if low is None else low
+
+            position = max(low, 0) + POSITION_STEP if high is None else (low + high) // 2
+            relationships.filter(pk=rel.pk).update(position=position)
+            changed[tag_id] = position
+            if order is not None:
+                order = self._move_in_order(order, tag_id, move)
+
+        if changed and order is not None:
+            self.save_tag_order(order, names=names)
+        elif changed:  # The stored order didn't match the rows
+            self.save_tag_order(relationships.order_by(
+                'position').values_list('tag_id', flat=True))
+        return changed
+
+    @staticmethod
+    def _move_in_order(order: list, tag_id: int, move: dict):
+        """Return the order of Tag ids after the move, None if it lacks a Tag"""
+        before_id = move.get('before_id')
+        before_id = None if before_id is None else int(before_id)
+        if tag_id not in order or (before_id is not None and before_id not in order):
+            return None
+        order = [other_id for other_id in order if other_id != tag_id]
+        if 'index' in move:
+            order.insert(max(int(move['index']), 0), tag_id)
+        elif before_id is not None:
+            order.insert(order.index(before_id), tag_id)
+        else:
+            order.append(tag_id)
+        return order
+
+    def get_stored_tag_names(self, tag_ids: list):
+        """Names of the stored Tags by id, for writing the order without reading them"""
+        return None
+
+    @staticmethod
+    def _get_move_bounds(others, move):
+        """Return positions of the tags a moved tag should end up between"""
+        if 'index' in move:
+            index = max(int(move['index']), 0)
+            positions = others.order_by('position').values_list('position', flat=True)
+            if index == 0:
+                return None, positions.first()
+            neighbours = list(positions[index - 1:index + 1])
+            if neighbours:
+                return neighbours[0], neighbours[1] if len(neighbours) > 1 else None
+        elif move.get('before_id') is not None:
+            before_id = int(move['before_id'])
+            try:
+                high = others.get(tag_id=before_id).position
+            except others.model.DoesNotExist:
+                raise ValueError(f"Tag ID isn't attached: {before_id}")
+            low = others.filter(position__lt=high).aggregate(
+                low=Max('position'))['low']
+            return low, high
+        return others.aggregate(low=Max('position'))['low'], None
+
+    @transaction.atomic
+    def rebalance_positions(self):
+        """Spread tag positions by POSITION_STEP again, keeping their order"""
+        if isinstance(self, Post):
+            relationships = PostTag.objects.filter(post=self)
+        else:  # TagGroup
+            relationships = TagGroupTag.objects.filter(tag_group=self)
+
+        to_update = []
+        for index, rel in enumerate(relationships.order_by('position', 'id')):
+            pos = (index + 1) * POSITION_STEP
+            if rel.position != pos:
+                rel.position = pos
+                to_update.append(rel)
+        if to_update:
+            relationships.model.objects.bulk_update(to_update, ['position'])
 
     @transaction.atomic
     def copy_tags_from_other_instance(self, other_instance):
@@ -160,19 +674,100 @@ class TagOperationMixin(models.Model):
             raise TypeError("Both instances must inherit from TagOperationMixin")
         if self.user != other_instance.user:
             raise PermissionError("Cannot use another user's instance.")
-        self.update_tags(self.ordered_tag_ids + other_instance.ordered_tag_ids)
+        self.append_tags_from(other_instance)
+
+    def get_tag_through(self):
+        """Return the through model and its field pointing to this Post/TagGroup"""
+        if isinstance(self, Post):
+            return PostTag, 'post'
+        return TagGroupTag, 'tag_group'  # TagGroup
+
+    @transaction.atomic
+    def append_tags_from(self, other_instance) -> int:
+        """
+        Append Tags of another Post/TagGroup after own ones, keeping their order
+        and skipping already attached ones, with a single INSERT ... SELECT.
+        Returns the number of appended Tags.
+        """
+        quote = connection.ops.quote_name
+        through_model, item_field = self.get_tag_through()
+        source_model, source_field = other_instance.get_tag_through()
+        table = quote(through_model._meta.db_table)
+        item_column = quote(through_model._meta.get_field(item_field).column)
+        source_table = quote(source_model._meta.db_table)
+        source_column = quote(source_model._meta.get_field(source_field).column)
+
+        # Row numbers are computed after NOT EXISTS filtered attached Tags out,
+        # so appended Tags get consecutive steps after the current last position
+        sql = f"""
+            INSERT INTO {table} ({item_column}, tag_id, position)
+            SELECT %s, source.tag_id,
+                   base.last_position + %s * ROW_NUMBER() OVER (ORDER BY source.position)
+            FROM {source_table} AS source
+            CROSS JOIN (
+                SELECT COALESCE(MAX(position), 0) AS last_position
+                FROM {table} WHERE {item_column} = %s
+            ) AS base
+            WHERE source.{source_column} = %s
+              AND NOT EXISTS (
+                  SELECT 1 FROM {table} AS existing
+                  WHERE existing.{item_column} = %s AND existing.tag_id = source.tag_id
+              )
+            ON CONFLICT ({item_column}, tag_id) DO NOTHING
+            RETURNING tag_id, position
+        """
+        with connection.cursor() as cursor:
+            cursor.execute(sql, [self.pk, POSITION_STEP, self.pk, other_instance.pk,
+                                 self.pk])
+            appended = [tag_id for tag_id, _ in sorted(
+                cursor.fetchall(), key=lambda row: row[1])]
+
+        if appended and isinstance(self, Post):
+            # Hashtags are rendered from the whole order
+            self.save_tag_order(self.read_tag_order())
+        elif appended:
+            # Appended Tags come last, so their ids are added to the stored ones
+            # in the DB, which doesn't depend on the loaded packed_tag_ids
+            packed_appended = pack_tag_ids(appended)
+            self.updated_at = timezone.now()
+            type(self).objects.filter(pk=self.pk).update(
+                updated_at=self.updated_at,
+                packed_tag_ids=ConcatBytes(F('packed_tag_ids'), Value(packed_appended)),
+            )
+            self.packed_tag_ids = bytes(self.packed_tag_ids) + packed_appended
+            self.forget_ordered_tags()
+            bump_generation(self.user_id)
+        return len(appended)
 
 
 class Tag(models.Model):
     objects: models.Manager['Tag']
 
     name = models.CharField(max_length=64, unique=True, validators=[hashtag_validator])
+    # Number of PostTag and TagGroupTag rows using the Tag, kept up to date
+    # by DB triggers (see migration 0023), so it also follows bulk and cascade paths
+    usage_count = models.PositiveIntegerField(default=0, editable=False)
+    # Last change of usage_count, also set by the triggers (see migration 0024),
+    # so orphan checks can skip Tags that didn't change since the last run
+    touched_at = models.DateTimeField(default=timezone.now, editable=False,
+                                      db_index=True)
 
     class Meta:
         ordering = ['name']
+        indexes = [
+            models.Index(fields=['usage_count'], condition=Q(usage_count=0),
+                         name='tag_orphan_idx'),
+        ]
 
     def save(self, *args, **kwargs):
         self.name = self.name.lower()  # enforce lowercase storage
+        if not self._state.adding and kwargs.get('update_fields') is None:
+            # Loaded values may be stale, the triggers own these columns
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key
+                and field.name not in ('usage_count', 'touched_at')
+            ]
         super().save(*args, **kwargs)
 
     def __str__(self):
@@ -195,14 +790,30 @@ class TagGroup(TagOperationMixin):
 
     class Meta:
         unique_together = ('user', 'name')
+        indexes = [
+            # Sidebar lists are read newest first with (updated_at, id) cursors
+            models.Index(fields=['user', '-updated_at', '-id'],
+                         name='taggroup_user_recent_idx'),
+        ]
 
     def __str__(self):
         return self.name
 
     def save(self, *args, **kwargs):
-        if not self.name:
+        if self.name:
+            return super().save(*args, **kwargs)
+
+        # The name is not checked before saving: a concurrent request
+        # may take the same name, then the next free one is picked
+        for attempt in range(UNTITLED_TG_NAME_RETRIES):
             self.name = generate_unique_tg_name(self.user)
-        super().save(*args, **kwargs)
+            try:
+                with transaction.atomic():
+                    return super().save(*args, **kwargs)
+            except IntegrityError:
+                if attempt == UNTITLED_TG_NAME_RETRIES - 1:
+                    raise
+                self.name = ''
 
 
 class TagGroupTag(models.Model):
@@ -210,11 +821,16 @@ class TagGroupTag(models.Model):
 
     tag_group = models.ForeignKey(TagGroup, on_delete=models.CASCADE)
     tag = models.ForeignKey(Tag, on_delete=models.CASCADE)
-    position = models.PositiveIntegerField()
+    position = models.PositiveBigIntegerField()
 
     class Meta:
         unique_together = ('tag_group', 'tag')
         ordering = ['position']
+        indexes = [
+            # Moves look up neighbour positions inside one TagGroup
+            models.Index(fields=['tag_group', 'position'],
+                         name='taggrouptag_position_idx'),
+        ]
 
     def __str__(self):
         return f"{self.tag} in {self.tag_group} at {self.position}"
@@ -237,32 +853,164 @@ class Post(TagOperationMixin):
         related_name='posts'
     )
 
+    # "#tag1 #tag2" and description with it, rendered when tags or the
+    # description change, so previews don't read the tag tables
+    tags_text = models.TextField(blank=True, default='', editable=False)
+    plain_text = models.TextField(blank=True, default='', editable=False)
+
+    TAG_ORDER_FIELDS = ('packed_tag_ids', 'tags_text', 'plain_text')
+
+    class Meta:
+        indexes = [
+            # Sidebar lists are read newest first with (updated_at, id) cursors
+            models.Index(fields=['user', '-updated_at', '-id'],
+                         name='post_user_recent_idx'),
+        ]
+
     def __str__(self):
         return self.title
 
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get('update_fields')
+        if self._state.adding:
+            self.plain_text = build_plain_text(self.description, self.tags_text)
+        elif update_fields is None or 'description' in update_fields:
+            fields = (self.get_saved_field_names() if update_fields is None
+                      else list(update_fields))
+            # Tags may have changed since the Post was loaded, the stored ones are used
+            self.plain_text = plain_text_expression(self.description, F('tags_text'))
+            kwargs['update_fields'] = fields + ['plain_text']
+        super().save(*args, **kwargs)
+        self.plain_text = build_plain_text(self.description, self.tags_text)
+
+    def set_tags_text(self, tags_text: str):
+        """
+        Set tags_text and plain_text of the loaded description. Writes render
+        the stored plain_text from the description of the row, the loaded one
+        may be stale.
+        """
+        self.tags_text = tags_text
+        self.plain_text = build_plain_text(self.description, tags_text)
+
+    def get_stored_tag_names(self, tag_ids: list):
+        # Hashtags hold no spaces, so they pair up with the stored ids
+        hashtags = self.tags_text.split()
+        if len(hashtags) != len(tag_ids):
+            return None  # Left behind by a Tag deleted meanwhile
+        return {tag_id: hashtag[1:] for tag_id, hashtag in zip(tag_ids, hashtags)}
+
+    def set_tag_order(self, tag_ids, names=None) -> dict:
+        tag_ids = list(tag_ids)
+        values = super().set_tag_order(tag_ids)
+        if names is None:
+            names = dict(Tag.objects.filter(id__in=tag_ids).values_list('id', 'name'))
+        self.set_tags_text(build_tags_text(
+            names[tag_id] for tag_id in tag_ids if tag_id in names))
+        values.update(tags_text=self.tags_text,
+                      plain_text=plain_text_expression(F('description'), self.tags_text))
+        return values
+
 
 class PostTag(models.Model):
     objects: models.Manager['PostTag']
 
     post = models.ForeignKey(Post, on_delete=models.CASCADE)
     tag = models.ForeignKey(Tag, on_delete=models.CASCADE)
-    position = models.PositiveIntegerField()
+    position = models.PositiveBigIntegerField()
 
     class Meta:
         unique_together = ('post', 'tag')
         ordering = ['position']
+        indexes = [
+            # Moves look up neighbour positions inside one Post
+            models.Index(fields=['post', 'position'], name='posttag_position_idx'),
+        ]
 
     def __str__(self):
         return f"{self.tag} in {self.post} at {self.position}"
 
 
-@receiver(pre_delete, sender=Post)
-def post_pre_delete(sender, instance, **kwargs):
-    """Clean up orphaned tags before Post deletion"""
-    instance.clear_tags()
-
-
-@receiver(pre_delete, sender=TagGroup)
-def taggroup_pre_delete(sender, instance, **kwargs):
-    """Clean up orphaned tags before TagGroup deletion"""
-    instance.clear_tags()
+@receiver(post_save, sender=PostTag)
+@receiver(post_save, sender=TagGroupTag)
+def tag_relationship_post_save(sender, instance, **kwargs):
+    """Store the new order on the Post/TagGroup of a row saved on its own"""
+    item_field = sender._meta.get_field('post' if sender is PostTag else 'tag_group')
+    # Only an already loaded object can hold a cache, don't fetch a new one
+    if item_field.is_cached(instance):
+        item = item_field.get_cached_value(instance)
+    else:
+        item = item_field.related_model(pk=getattr(instance, item_field.attname))
+    item.store_tag_order()
+
+
+@receiver(post_save, sender=User)
+def user_post_save(sender, instance, created, **kwargs):
+    """Start cached reads of a new user from a new generation"""
+    if created:
+        # Ids of rolled back users may be given out again, e.g. on SQLite
+        bump_generation(instance.pk)
+
+
+@receiver(post_save, sender=Tag)
+def tag_post_save(sender, instance, created, raw, **kwargs):
+    """
+    Render the hashtags of Posts using a Tag again when it's renamed, and make
+    cached reads of the owners of Posts and TagGroups using it stale, once each
+    """
+    if created or raw:
+        return
+    user_ids = set(TagGroup.objects.filter(tags=instance).values_list(
+        'user_id', flat=True))
+    posts = Post.objects.filter(tags=instance).only('pk', 'user', 'description')
+    for post in posts.iterator():
+        post.save_tag_order(post.read_tag_order(), touch=False, bump=False)
+        user_ids.add(post.user_id)
+    for user_id in user_ids:
+        bump_generation(user_id)
+
+
+@receiver(pre_delete, sender=Tag)
+def tag_pre_delete(sender, instance, origin, **kwargs):
+    """Take the Posts/TagGroups using Tags about to be deleted, once per QuerySet"""
+    if isinstance(origin, models.QuerySet) and origin.model is Tag:
+        if '_tag_order_items' in origin.__dict__:
+            return  # Taken for all Tags of the QuerySet already
+        tags = origin
+    else:
+        tags = [instance]
+    items = origin.__dict__.setdefault('_tag_order_items', set())
+    items.update((Post, post_id) for post_id in PostTag.objects.filter(
+        tag__in=tags).values_list('post_id', flat=True).distinct())
+    items.update((TagGroup, tg_id) for tg_id in TagGroupTag.objects.filter(
+        tag__in=tags).values_list('tag_group_id', flat=True).distinct())
+
+
+@receiver(post_delete, sender=Tag)
+def tag_post_delete(sender, instance, origin, **kwargs):
+    """Store the new order on the Posts/TagGroups of deleted Tags, once per delete"""
+    for item_model, item_id in origin.__dict__.pop('_tag_order_items', ()):
+        item_model(pk=item_id).store_tag_order()
+
+
+@receiver(m2m_changed, sender=PostTag)
+@receiver(m2m_changed, sender=TagGroupTag)
+def tags_m2m_changed(sender, instance, action, reverse, model, pk_set, **kwargs):
+    """
+    Store the new order after tags.add/remove/clear on Post/TagGroup or Tag.
+    There are no delete signals on the through models, so cascades of
+    Post/TagGroup and user deletes can use fast deletes.
+    """
+    if not reverse:
+        if action in ('post_add', 'post_remove', 'post_clear'):
+            instance.store_tag_order()
+        return
+
+    # tag.posts.clear() doesn't pass the affected items, they're taken before
+    if action == 'pre_clear':
+        instance._cleared_item_ids = list(
+            model.objects.filter(tags=instance).values_list('pk', flat=True))
+    elif action == 'post_clear':
+        pk_set = instance.__dict__.pop('_cleared_item_ids', [])
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        for item_id in pk_set:
+            model(pk=item_id).store_tag_order()
@@ -0,0 +1,94 @@
+"""
+Per-user cache of what the post editor reads: sidebar pages, the opened
+Post/TagGroup and their ordered Tags.
+
+Every key contains a generation number of the user, which is bumped by any
+write to the user's Posts, TagGroups or their tags (see bump_generation calls
+in posts.models). Old entries are never read again and are left to the eviction
+of the cache backend, so nothing has to be deleted on writes.
+"""
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+
+from core import stats
+
+KEY_PREFIX = 'read_model'
+
+
+def get_cache():
+    return caches[settings.READ_CACHE_ALIAS]
+
+
+def get_generation_key(user_id) -> str:
+    return f'{KEY_PREFIX}:{user_id}:generation'
+
+
+def get_generation(user_id) -> int:
+    cache = get_cache()
+    key = get_generation_key(user_id)
+    generation = cache.get(key)
+    if generation is None:
+        # An evicted counter starts from the clock, so it can't return
+        # to a generation of still cached entries
+        cache.add(key, time.time_ns(), timeout=None)
+        generation = cache.get(key, 0)
+    return generation
+
+
+def _bump(user_id):
+    cache = get_cache()
+    try:
+        cache.incr(get_generation_key(user_id))
+    except ValueError:  # Evicted, any new value is a new generation
+        cache.add(get_generation_key(user_id), time.time_ns(), timeout=None)
+
+
+def bump_generation(user_id):
+    """
+    Make cached reads of the user stale. It's bumped again after the commit,
+    as other requests may cache the old rows until the transaction ends.
+    """
+    if user_id is None:
+        return
+    _bump(user_id)
+    transaction.on_commit(lambda: _bump(user_id))
+
+
+def get_or_compute(user_id, name: str, compute):
+    """
+    Return the cached value of name for the user's current generation,
+    compute and cache it on a miss. None results are not cached.
+    """
+    kind = name.split(':', 1)[0]
+    cache = get_cache()
+    key = f'{KEY_PREFIX}:{user_id}:{get_generation(user_id)}:{name}'
+    value = cache.get(key)
+    if value is not None:
+        stats.incr(f'read_cache.{kind}.hit')
+        return value
+
+    stats.incr(f'read_cache.{kind}.miss')
+    value = compute()
+    if value is not None:
+        cache.set(key, value, timeout=settings.READ_CACHE_TIMEOUT)
+    return value
+
+
+def get_user_item(user, item_model, item_id):
+    """Return the user's Post or TagGroup with the id, None if there is none"""
+    name = f'item:{item_model._meta.model_name}:{item_id}'
+    return get_or_compute(
+        user.pk, name,
+        lambda: item_model.objects.filter(user=user, pk=item_id).first()
+    )
+
+
+def get_ordered_tags(item) -> list:
+    """Return ordered Tags of a Post or TagGroup as a list, empty for None"""
+    if item is None:
+        return []
+    name = f'tags:{item._meta.model_name}:{item.pk}'
+    return get_or_compute(item.user_id, name, lambda: list(item.ordered_tag_list))
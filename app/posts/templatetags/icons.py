@@ -0,0 +1,30 @@
+import functools
+
+from django import template
+from django.conf import settings
+from django.urls import reverse
+from django.utils.html import format_html
+from django.utils.safestring import mark_safe
+
+from posts import icons
+
+register = template.Library()
+
+
+@register.simple_tag
+def icon(name: str):
+    """
+    Render an icon of the sprite, e.g. {% icon 'minus-circle' %}. The sprite
+    is served by the app, a <use href> can't refer to another origin.
+    """
+    if not settings.ICON_SPRITE:
+        return mark_safe(icons.get_symbol_markup(name))
+    return get_use_markup(name)
+
+
+@functools.cache
+def get_use_markup(name: str) -> str:
+    """Markup is the same for every use of an icon, tag rows repeat it a lot"""
+    _, version = icons.get_sprite()
+    url = reverse('icon_sprite', kwargs={'version': version})
+    return format_html('<svg><use href="{}#{}"></use></svg>', url, name)
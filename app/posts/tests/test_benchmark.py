@@ -0,0 +1,42 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase
+from posts.management.benchmark import rolled_back
+from posts.models import Post, Tag, TagGroup
+
+User = get_user_model()
+
+
+class BenchmarkCommandTestCase(TestCase):
+    """Base of the tests of benchmark commands"""
+
+    def call_benchmark(self, name, *args) -> str:
+        """Run the command and check that nothing it created is kept"""
+        out = StringIO()
+        call_command(name, *args, stdout=out)
+
+        output = out.getvalue()
+        self.assertIn('changes rolled back', output)
+        self.assertFalse(User.objects.filter(email__startswith='benchmark').exists())
+        self.assertFalse(Post.objects.exists())
+        self.assertFalse(TagGroup.objects.exists())
+        self.assertFalse(Tag.objects.exists())
+        return output
+
+
+class RolledBackTests(TestCase):
+    def test_changes_are_rolled_back(self):
+        with rolled_back():
+            Tag.objects.create(name='benchmark')
+            self.assertTrue(Tag.objects.exists())
+
+        self.assertFalse(Tag.objects.exists())
+
+    def test_errors_propagate(self):
+        with self.assertRaises(ValueError), rolled_back():
+            Tag.objects.create(name='benchmark')
+            raise ValueError
+
+        self.assertFalse(Tag.objects.exists())
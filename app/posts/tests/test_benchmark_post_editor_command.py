@@ -0,0 +1,11 @@
+from posts.tests.test_benchmark import BenchmarkCommandTestCase
+
+
+class BenchmarkPostEditorCommandTest(BenchmarkCommandTestCase):
+    def test_reports_timings_and_rolls_back(self):
+        output = self.call_benchmark('benchmark_post_editor', '--posts', '20',
+                                     '--tags', '3', '--repeat', '2')
+
+        self.assertIn('Without fragment cache:', output)
+        self.assertIn('Cached fragments:', output)
+        self.assertIn('After each TagGroup change:', output)
@@ -0,0 +1,15 @@
+from django.db import connection
+from posts.tests.test_benchmark import BenchmarkCommandTestCase
+
+
+class BenchmarkUpdateTagsCommandTest(BenchmarkCommandTestCase):
+    def test_reports_timings_and_rolls_back(self):
+        output = self.call_benchmark('benchmark_update_tags', '--sizes', '3', '5',
+                                     '--repeat', '2')
+
+        self.assertIn('portable      3 tags:', output)
+        self.assertIn('portable      5 tags:', output)
+        if connection.vendor == 'postgresql':
+            self.assertIn('postgresql      5 tags:', output)
+        else:
+            self.assertIn('Skipping postgresql', output)
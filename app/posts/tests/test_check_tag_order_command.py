@@ -0,0 +1,71 @@
+from django.test import TestCase
+from django.core.management import call_command
+from django.contrib.auth import get_user_model
+from io import StringIO
+from posts import read_cache
+from posts.models import Tag, Post, TagGroup, pack_tag_ids, unpack_tag_ids
+
+User = get_user_model()
+
+
+class CheckTagOrderCommandTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(email='testuser@example.com')
+        self.tags = [Tag.objects.create(name=f'tag{i}') for i in range(3)]
+        self.tag_ids = [tag.id for tag in self.tags]
+
+        self.post = Post.objects.create(user=self.user, title='Test Post')
+        self.post.update_tags(self.tag_ids)
+        self.tag_group = TagGroup.objects.create(user=self.user, name='Test Group')
+        self.tag_group.update_tags(self.tag_ids[:2])
+
+    def run_command(self, *args):
+        out = StringIO()
+        call_command('check_tag_order', *args, stdout=out)
+        return out.getvalue()
+
+    def test_correct_orders(self):
+        output = self.run_command()
+        self.assertIn('All tag orders are correct', output)
+
+    def test_reports_wrong_orders_without_changing_them(self):
+        Post.objects.filter(pk=self.post.pk).update(
+            packed_tag_ids=pack_tag_ids(reversed(self.tag_ids)))
+
+        output = self.run_command('--verbosity=2')
+
+        self.assertIn(f'Wrong orders of posts: {self.post.pk}', output)
+        self.assertIn('Found 1 posts with wrong tag orders', output)
+        self.post.refresh_from_db()
+        self.assertEqual(unpack_tag_ids(self.post.packed_tag_ids),
+                         list(reversed(self.tag_ids)))
+
+    def test_repair(self):
+        Post.objects.filter(pk=self.post.pk).update(packed_tag_ids=b'')
+        TagGroup.objects.filter(pk=self.tag_group.pk).update(
+            packed_tag_ids=pack_tag_ids(self.tag_ids))
+
+        generation = read_cache.get_generation(self.user.pk)
+
+        output = self.run_command('--repair', '--batch-size=1')
+
+        self.assertNotEqual(read_cache.get_generation(self.user.pk), generation)
+        self.assertIn('Repaired tag orders of 1 posts', output)
+        self.assertIn('Repaired tag orders of 1 tag groups', output)
+        self.post.refresh_from_db()
+        self.tag_group.refresh_from_db()
+        self.assertEqual(unpack_tag_ids(self.post.packed_tag_ids), self.tag_ids)
+        self.assertEqual(unpack_tag_ids(self.tag_group.packed_tag_ids),
+                         self.tag_ids[:2])
+        self.assertIn('All tag orders are correct', self.run_command())
+
+    def test_stale_post_texts(self):
+        Post.objects.filter(pk=self.post.pk).update(tags_text='#gone',
+                                                    plain_text='#gone')
+
+        output = self.run_command('--repair')
+
+        self.assertIn('Repaired tag orders of 1 posts', output)
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.tags_text, '#tag0 #tag1 #tag2')
+        self.assertEqual(self.post.plain_text, '\n\n#tag0 #tag1 #tag2')
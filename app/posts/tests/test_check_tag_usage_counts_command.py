@@ -0,0 +1,51 @@
+from django.test import TestCase
+from django.core.management import call_command
+from django.contrib.auth import get_user_model
+from io import StringIO
+from posts.models import Tag, Post, TagGroup
+
+User = get_user_model()
+
+
+class CheckTagUsageCountsCommandTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(email='testuser@example.com')
+
+        self.post_tag = Tag.objects.create(name='used_by_post')
+        self.shared_tag = Tag.objects.create(name='shared')
+        self.orphaned_tag = Tag.objects.create(name='orphaned')
+
+        self.post = Post.objects.create(user=self.user, title='Test Post')
+        self.post.update_tags([self.post_tag.id, self.shared_tag.id])
+        self.tag_group = TagGroup.objects.create(user=self.user, name='Test Group')
+        self.tag_group.update_tags([self.shared_tag.id])
+
+    def run_command(self, *args):
+        out = StringIO()
+        call_command('check_tag_usage_counts', *args, stdout=out)
+        return out.getvalue()
+
+    def test_correct_counters(self):
+        output = self.run_command()
+        self.assertIn('All tag usage counters are correct', output)
+
+    def test_reports_wrong_counters_without_changing_them(self):
+        Tag.objects.filter(name='orphaned').update(usage_count=3)
+
+        output = self.run_command('--verbosity=2')
+
+        self.assertIn('Found 1 tags with wrong usage counters', output)
+        self.assertIn('Wrong counters: orphaned', output)
+        self.assertEqual(Tag.objects.get(name='orphaned').usage_count, 3)
+
+    def test_repair(self):
+        Tag.objects.filter(name='shared').update(usage_count=0)
+        Tag.objects.filter(name='orphaned').update(usage_count=5)
+
+        output = self.run_command('--repair')
+
+        self.assertIn('Repaired usage counters of 2 tags', output)
+        self.assertEqual(
+            dict(Tag.objects.values_list('name', 'usage_count')),
+            {'used_by_post': 1, 'shared': 2, 'orphaned': 0}
+        )
@@ -1,4 +1,7 @@
+from datetime import timedelta
+
 from django.test import TestCase
+from django.utils import timezone
 from django.core.management import call_command
 from django.contrib.auth import get_user_model
 from io import StringIO
@@ -87,3 +90,60 @@ class ClearOrphanedTagsCommandTest(TestCase):
         # Should delete 3 orphaned tags total
         self.assertIn('Successfully deleted 3 orphaned tags', out.getvalue())
         self.assertEqual(Tag.objects.count(), 3)
+
+    def test_deletes_in_chunks(self):
+        """Test that chunks continue after each other and report progress"""
+        Tag.objects.bulk_create([Tag(name=f'chunked{i}') for i in range(4)])
+
+        out = StringIO()
+        call_command('clear_orphaned_tags', '--chunk-size=2', stdout=out)
+
+        self.assertIn('Checked tags up to id', out.getvalue())
+        self.assertIn('Successfully deleted 5 orphaned tags', out.getvalue())
+        self.assertEqual(Tag.objects.count(), 3)
+
+    def test_repeat_run_checks_only_touched_tags(self):
+        call_command('clear_orphaned_tags', stdout=StringIO())
+        # Orphaned long ago and not touched since the last run
+        stale_tag = Tag.objects.create(name='stale')
+        Tag.objects.filter(pk=stale_tag.pk).update(
+            touched_at=timezone.now() - timedelta(days=1))
+        self.post.update_tags([self.shared_tag.id])
+
+        out = StringIO()
+        call_command('clear_orphaned_tags', verbosity=2, stdout=out)
+
+        self.assertIn('Orphaned tags: used_by_post', out.getvalue())
+        self.assertTrue(Tag.objects.filter(name='stale').exists())
+
+        call_command('clear_orphaned_tags', '--full', stdout=StringIO())
+        self.assertFalse(Tag.objects.filter(name='stale').exists())
+
+    def test_grace_keeps_recently_touched_tags(self):
+        Tag.objects.filter(name='orphaned').update(
+            touched_at=timezone.now() - timedelta(minutes=10))
+        Tag.objects.create(name='just_interned')
+
+        call_command('clear_orphaned_tags', '--grace-seconds=300', stdout=StringIO())
+
+        self.assertFalse(Tag.objects.filter(name='orphaned').exists())
+        self.assertTrue(Tag.objects.filter(name='just_interned').exists())
+
+        # Kept Tags are checked by the next run once the grace is over
+        Tag.objects.filter(name='just_interned').update(
+            touched_at=timezone.now() - timedelta(minutes=6))
+        call_command('clear_orphaned_tags', '--grace-seconds=300', stdout=StringIO())
+        self.assertFalse(Tag.objects.filter(name='just_interned').exists())
+
+    def test_max_seconds_resumes_from_last_id(self):
+        Tag.objects.create(name='orphaned2')
+
+        out = StringIO()
+        call_command('clear_orphaned_tags', '--max-seconds=0', stdout=out)
+
+        self.assertIn('the next run continues from there', out.getvalue())
+        self.assertEqual(Tag.objects.count(), 5)
+
+        out = StringIO()
+        call_command('clear_orphaned_tags', '--chunk-size=1', stdout=out)
+        self.assertIn('Successfully deleted 2 orphaned tags', out.getvalue())
@@ -0,0 +1,72 @@
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.urls import reverse
+
+from posts.models import Post, Tag, TagGroup
+
+User = get_user_model()
+
+
+class ConditionalGetTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create(email='etag@example.com')
+        self.client.force_login(self.user)
+        self.post = Post.objects.create(user=self.user, title='ETag Post')
+        self.tg = TagGroup.objects.create(user=self.user, name='ETag TG')
+        self.url = reverse('post_tg_editor', args=[self.post.pk, self.tg.pk])
+        # Without a csrf cookie the page gets a new token and no ETag
+        response = self.client.get(self.url)
+        self.assertNotIn('ETag', response)
+
+    def get_etag(self, url=None, **params):
+        response = self.client.get(url or self.url, params)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['ETag'].startswith('W/"'))
+        return response['ETag']
+
+    def test_unchanged_editor_is_not_modified(self):
+        etag = self.get_etag()
+        response = self.client.get(self.url, headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+        self.assertEqual(response.content, b'')
+        self.assertIn('private', response['Cache-Control'])
+
+    def test_writes_change_the_etag(self):
+        etag = self.get_etag()
+        self.tg.update_tags([Tag.objects.create(name='etag_tag').id])
+        response = self.client.get(self.url, headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_other_opened_items_change_the_etag(self):
+        etag = self.get_etag()
+        other_post = Post.objects.create(user=self.user, title='Other Post')
+        url = reverse('post_tg_editor', args=[other_post.pk, self.tg.pk])
+        response = self.client.get(url, headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, 200)
+
+    def test_page_with_messages_is_rendered(self):
+        etag = self.get_etag()
+        self.client.post(self.url, {'action': 'update_tg', 'tg_name': 'Renamed'})
+        response = self.client.get(self.url, headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('ETag', response)
+        self.assertContains(response, 'TagGroup Renamed updated')
+
+    def test_post_ignores_if_none_match(self):
+        etag = self.get_etag()
+        response = self.client.post(self.url, {'action': 'close_current_tg'},
+                                    headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, 302)
+
+    def test_sidebar_items_are_not_modified(self):
+        url = reverse('sidebar_items')
+        etag = self.get_etag(url, item_type='post')
+        response = self.client.get(url, {'item_type': 'post'},
+                                   headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, 304)
+
+        response = self.client.get(url, {'item_type': 'tg'},
+                                   headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, 200)
@@ -1,7 +1,11 @@
-from django.test import TestCase
+import json
+
+from django.contrib.sessions.models import Session
+from django.test import TestCase, override_settings
 from django.urls import reverse
 from django.contrib.auth import get_user_model
 from django.urls import resolve
+from unittest.mock import patch
 
 from bs4 import BeautifulSoup
 
@@ -257,6 +261,41 @@ class TagFormsTests(TestCase):
             url, '!!invalidtag4!!', 'tg_attach_tags', TG_TAG_LIST_ID, TG_ADD_INPUT_ID
         )
 
+    def test_post_add_existing_tag_in_other_case(self):
+        """
+        Test adding tags that already exist, written in a different case.
+        Link: /post/<post_pk>
+        """
+        url = reverse('post_editor', args=[self.post.pk])
+        data = {
+            'tags_to_attach': '#Attached_To_TG, NEWTAG', 'action': 'post_attach_tags'
+        }
+        response = self.client.post(url, data, follow=True)
+        self.assertEqual(response.status_code, 200)
+
+        self.assertEqual(Tag.objects.filter(name='attached_to_tg').count(), 1)
+        self.assertEqual(
+            get_tag_list(response, POST_TAG_LIST_ID, 'tag'),
+            ['attached_to_post', 'attached_to_both', 'attached_to_tg', 'newtag']
+        )
+
+    def test_editor_reads_tags_once_per_item(self):
+        """
+        Test that the editor page reads ordered Tags once for Post and once for TG.
+        Link: /post/<post_pk>/tg/<tg_pk>
+        """
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+
+        url = reverse('post_tg_editor', args=[self.post.pk, self.tg.pk])
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+
+        tag_queries = [q for q in ctx.captured_queries
+                       if 'FROM "posts_tag"' in q['sql']]
+        self.assertEqual(len(tag_queries), 2)
+
     def test_post_detach_tag_on_post_page(self):
         """
         Test detaching a Tag attached to a Post on a page with only Post chosen.
@@ -419,6 +458,14 @@ class CreateObjectsTests(TestCase):
         url = reverse('index')
         self.assert_object_create(url, 'create_tg')
 
+    def test_tg_create_without_name(self):
+        """Test that a TagGroup created without a name gets the first free one"""
+        TagGroup.objects.create(user=self.user, name='Untitled TagGroup 1')
+        self.client.post(reverse('index'), {'action': 'create_tg', 'new_item_name': ''})
+        self.assertTrue(
+            TagGroup.objects.filter(user=self.user, name='Untitled TagGroup 2').exists()
+        )
+
     def test_tg_create_on_post_page(self):
         """
         Test creating a new TagGroup on a page with only Post chosen.
@@ -579,3 +626,216 @@ class DeleteObjectsTests(TestCase):
         """
         url = reverse('post_tg_editor', args=[self.post.pk, self.tg.pk])
         self.assert_object_delete(url, 'delete_tg')
+
+
+class SidebarListTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create(email='sidebar@example.com')
+        self.client.force_login(self.user)
+        self.other_user = User.objects.create(email='sidebar_other@example.com')
+
+        self.posts = [
+            Post.objects.create(user=self.user, title=f'Post {i}') for i in range(5)
+        ]
+        self.tgs = [
+            TagGroup.objects.create(user=self.user, name=f'TG {i}') for i in range(3)
+        ]
+        Post.objects.create(user=self.other_user, title='Foreign Post')
+        # Same updated_at for two Posts, so the id has to break the tie
+        Post.objects.filter(pk=self.posts[1].pk).update(
+            updated_at=self.posts[2].updated_at
+        )
+
+    def expected_titles(self):
+        posts = Post.objects.filter(user=self.user).order_by('-updated_at', '-id')
+        return [post.title for post in posts]
+
+    def load_more(self, item_type, cursor, paired_id=''):
+        response = self.client.get(reverse('sidebar_items'), {
+            'item_type': item_type, 'cursor': cursor, 'paired_id': paired_id
+        })
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_sidebar_is_sorted_by_recent_updates(self):
+        response = self.client.get(reverse('index'))
+        self.assertEqual(
+            get_tag_list(response, 'recent-posts', 'list-item-title'),
+            self.expected_titles()
+        )
+        self.assertEqual(
+            get_tag_list(response, 'recent-tgs', 'list-item-title'),
+            ['TG 2', 'TG 1', 'TG 0']
+        )
+        self.assertNotContains(response, 'load-more-btn')
+
+    @patch('posts.views.SIDEBAR_PAGE_SIZE', 2)
+    def test_load_more_pages_through_all_items(self):
+        """Test that pages from a cursor continue the first page without repeats"""
+        response = self.client.get(reverse('index'))
+        soup = BeautifulSoup(response.content, 'html.parser')
+        titles = get_tag_list(response, 'recent-posts', 'list-item-title')
+        self.assertEqual(len(titles), 2)
+
+        cursor = soup.find('button', {'data-item-type': 'post'})['data-next-cursor']
+        while cursor:
+            data = self.load_more('post', cursor)
+            self.assertTrue(data['success'])
+            titles += [item['title'] for item in data['items']]
+            cursor = data['next_cursor']
+
+        self.assertEqual(titles, self.expected_titles())
+
+    @patch('posts.views.SIDEBAR_PAGE_SIZE', 2)
+    def test_load_more_links_keep_paired_item(self):
+        response = self.client.get(reverse('tg_editor', args=[self.tgs[0].pk]))
+        soup = BeautifulSoup(response.content, 'html.parser')
+        button = soup.find('button', {'data-item-type': 'post'})
+        self.assertEqual(button['data-paired-id'], str(self.tgs[0].pk))
+
+        data = self.load_more('post', button['data-next-cursor'], self.tgs[0].pk)
+        first_item = data['items'][0]
+        self.assertEqual(
+            first_item['url'],
+            reverse('post_tg_editor', args=[first_item['id'], self.tgs[0].pk])
+        )
+
+    def test_load_more_invalid_cursor(self):
+        data = self.load_more('post', 'not-a-cursor')
+        self.assertFalse(data['success'])
+
+    def test_load_more_cursor_out_of_range(self):
+        for cursor in (f'{10 ** 30}_1', f'-{10 ** 18}_1'):
+            with self.subTest(cursor=cursor):
+                self.assertFalse(self.load_more('post', cursor)['success'])
+
+    def test_sidebar_list_query_count(self):
+        """Test that the sidebar doesn't run count queries on top of the pages"""
+        Post.objects.bulk_create(
+            [Post(user=self.user, title=f'Bulk {i}') for i in range(30)]
+        )
+        # Session, user, two sidebar pages
+        with self.assertNumQueries(4):
+            self.client.get(reverse('index'))
+
+
+class MoveTagsApiTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create(email='mover@example.com')
+        self.client.force_login(self.user)
+        self.post = Post.objects.create(user=self.user, title='Post')
+        self.tg = TagGroup.objects.create(user=self.user, name='TG')
+        self.tags = [Tag.objects.create(name=f'tag{i}') for i in range(3)]
+        self.tag_ids = [tag.id for tag in self.tags]
+        self.post.update_tags(self.tag_ids)
+        self.tg.update_tags(self.tag_ids)
+
+    def move(self, item_type, item_id, moves):
+        response = self.client.post(
+            reverse('move_tags'),
+            data=json.dumps({'item_type': item_type, 'item_id': item_id,
+                             'moves': moves}),
+            content_type='application/json',
+        )
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_move_returns_changed_positions_and_preview(self):
+        data = self.move('post', self.post.id,
+                         [{'tag_id': self.tag_ids[2], 'before_id': self.tag_ids[0]}])
+
+        self.assertTrue(data['success'])
+        self.assertEqual(list(data['positions']), [str(self.tag_ids[2])])
+        self.assertEqual(data['tag_text'], '#tag2 #tag0 #tag1')
+        self.assertEqual(data['plain_text'], '\n\n#tag2 #tag0 #tag1')
+
+    def test_copy_button_has_plain_text(self):
+        self.post.description = 'Hello'
+        self.post.save()
+
+        response = self.client.get(reverse('post_editor', args=[self.post.pk]))
+
+        self.assertContains(response,
+                            'data-plain-text="Hello\n\n#tag0 #tag1 #tag2"')
+
+    def test_move_in_tag_group_has_no_preview(self):
+        data = self.move('tg', self.tg.id, [{'tag_id': self.tag_ids[0], 'index': 2}])
+
+        self.assertTrue(data['success'])
+        self.assertNotIn('tag_text', data)
+        self.tg.refresh_from_db()
+        self.assertEqual(self.tg.ordered_tag_ids, self.tag_ids[1:] + self.tag_ids[:1])
+
+    def test_move_detached_tag_fails(self):
+        other_tag = Tag.objects.create(name='other')
+        data = self.move('post', self.post.id, [{'tag_id': other_tag.id, 'index': 0}])
+        self.assertFalse(data['success'])
+
+    def test_move_in_foreign_item_fails(self):
+        other_user = User.objects.create(email='not_mover@example.com')
+        foreign_post = Post.objects.create(user=other_user, title='Foreign')
+        data = self.move('post', foreign_post.id, [])
+        self.assertEqual(data, {'success': False, 'error': 'Item not found'})
+
+
+class EditorFragmentCacheTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create(email='fragments@example.com')
+        self.client.force_login(self.user)
+        self.post = Post.objects.create(
+            user=self.user, title='Cached', description='Old')
+        self.tg = TagGroup.objects.create(user=self.user, name='Cached TG')
+        self.url = reverse('post_tg_editor', args=[self.post.pk, self.tg.pk])
+
+    def test_tag_group_change_rerenders_only_its_fragments(self):
+        self.client.get(self.url)
+        # Not a change of updated_at, so the cached Post fragments are still used
+        Post.objects.filter(pk=self.post.pk).update(description='New')
+        self.tg.update_tags([Tag.objects.create(name='fresh').id])
+
+        response = self.client.get(self.url)
+        self.assertContains(response, '>Old<')
+        self.assertNotContains(response, '>New<')
+        assert_tag_in_list(response, 'fresh', TG_TAG_LIST_ID, 'tag')
+
+    def test_post_save_rerenders_its_fragments(self):
+        self.client.get(self.url)
+        self.post.description = 'New'
+        self.post.save()
+
+        response = self.client.get(self.url)
+        self.assertContains(response, '>New<')
+
+
+class EditorSessionTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create(email='session@example.com')
+        self.client.force_login(self.user)
+        self.post = Post.objects.create(user=self.user, title='Session Post')
+        self.tg = TagGroup.objects.create(user=self.user, name='Session TG')
+        self.url = reverse('post_tg_editor', args=[self.post.pk, self.tg.pk])
+
+    def test_repeated_get_does_not_save_session(self):
+        self.client.get(self.url)
+        session_class = type(self.client.session)
+        with patch.object(session_class, 'save') as save:
+            self.client.get(self.url)
+            self.client.get(reverse('index'))
+        save.assert_not_called()
+
+    def test_opening_other_post_saves_session(self):
+        self.client.get(self.url)
+        other_post = Post.objects.create(user=self.user, title='Other Post')
+        self.client.get(reverse('post_editor', args=[other_post.pk]))
+        self.assertEqual(self.client.session['opened_post_id'], other_post.pk)
+
+    @override_settings(SESSION_ENGINE='django.contrib.sessions.backends.signed_cookies')
+    def test_signed_cookie_sessions_keep_opened_items(self):
+        Session.objects.all().delete()
+        self.client.force_login(self.user)
+        self.client.get(self.url)
+
+        response = self.client.get(reverse('index'))
+        self.assertEqual(response.context['current_post'], self.post)
+        self.assertEqual(response.context['current_tg'], self.tg)
+        self.assertFalse(Session.objects.exists())
@@ -0,0 +1,66 @@
+from django.contrib.auth import get_user_model
+from django.template import Context, Template
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from posts import icons
+from posts.models import Post, Tag
+from posts.tests.test_benchmark import BenchmarkCommandTestCase
+
+ICON_NAMES = ['add-circle', 'minus-circle', 'round-double-alt-arrow-down',
+              'round-double-alt-arrow-up', 'trash-bin-trash', 'x-circle']
+
+
+class IconSpriteTests(TestCase):
+    def test_sprite_has_a_symbol_per_icon(self):
+        sprite, version = icons.get_sprite()
+        for name in ICON_NAMES:
+            self.assertIn(f'<symbol id="{name}" viewBox="0 0 24 24"', sprite)
+        self.assertEqual(len(version), 12)
+
+    def test_css_paints_become_custom_properties(self):
+        sprite, _ = icons.get_sprite()
+        self.assertIn('stroke: var(--icon-inner, #1C274C)', sprite)
+        self.assertIn('fill: var(--icon-bg, #595959)', sprite)
+        self.assertNotIn('stroke="#1C274C"', sprite)
+
+    def test_sprite_view(self):
+        sprite, version = icons.get_sprite()
+        response = self.client.get(reverse('icon_sprite', args=[version]))
+        self.assertEqual(response['Content-Type'], 'image/svg+xml')
+        self.assertIn('immutable', response['Cache-Control'])
+        self.assertEqual(response.content.decode(), sprite)
+
+        response = self.client.get(reverse('icon_sprite', args=['0' * 12]))
+        self.assertEqual(response.status_code, 404)
+
+    def test_icon_tag(self):
+        template = Template("{% load icons %}{% icon 'x-circle' %}")
+        _, version = icons.get_sprite()
+        self.assertEqual(template.render(Context()),
+                         f'<svg><use href="/icons/{version}.svg#x-circle"></use></svg>')
+
+        with override_settings(ICON_SPRITE=False):
+            html = template.render(Context())
+        self.assertTrue(html.startswith('<svg xmlns="http://www.w3.org/2000/svg" '
+                                        'viewBox="0 0 24 24"'))
+        self.assertIn('var(--icon-stroke, #323232)', html)
+
+    def test_editor_uses_sprite_for_tag_rows(self):
+        user = get_user_model().objects.create(email='icons@example.com')
+        self.client.force_login(user)
+        post = Post.objects.create(user=user, title='Icons')
+        post.update_tags([Tag.objects.create(name=f'icon_{i}').id for i in range(5)])
+
+        response = self.client.get(reverse('post_editor', args=[post.pk]))
+        self.assertContains(response, '#minus-circle"></use>', count=5)
+        self.assertNotContains(response, 'M9 12H15')
+
+
+class BenchmarkIconSpriteCommandTest(BenchmarkCommandTestCase):
+    def test_reports_both_modes_and_rolls_back(self):
+        output = self.call_benchmark('benchmark_icon_sprite', '--tags', '3',
+                                     '--repeat', '1')
+
+        self.assertIn('Inline icons:', output)
+        self.assertIn('Icon sprite:', output)
@@ -0,0 +1,21 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TransactionTestCase
+from posts.models import Post, Tag
+
+
+class LoadtestReorderTagsCommandTest(TransactionTestCase):
+    # Requests commit their own transactions, ASGI ones in other threads
+    def test_reports_both_modes_and_cleans_up(self):
+        out = StringIO()
+        call_command('loadtest_reorder_tags', '--requests', '4', '--concurrency', '1',
+                     '--tags', '3', stdout=out)
+
+        output = out.getvalue()
+        self.assertIn('Sync (WSGI, one at a time):', output)
+        self.assertIn('Async (ASGI, 1 concurrent):', output)
+        self.assertFalse(Post.objects.exists())
+        self.assertFalse(Tag.objects.exists())
+        self.assertFalse(get_user_model().objects.exists())
@@ -1,9 +1,26 @@
 import time
+from datetime import timedelta
 
-from django.test import TestCase
+from unittest import skipUnless
+from unittest.mock import patch
+
+from django.contrib import admin
+from django.db import connection
+from django.test import RequestFactory, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.db.utils import IntegrityError
 from django.contrib.auth import get_user_model
-from posts.models import Post, Tag, PostTag, TagGroup, TagGroupTag
+from django.db.models import QuerySet
+from django.db.models.deletion import Collector
+from django.db.models.signals import pre_delete
+from django.utils import timezone
+from core.jobs import run_due_jobs, schedule_job
+from core.models import Job
+from posts import read_cache
+from posts.models import (Post, Tag, PostTag, TagGroup, TagGroupTag,
+                          POSITION_STEP, intern_tags, split_tag_names,
+                          plan_positions, generate_unique_tg_name,
+                          ORPHAN_SWEEP_JOB, unpack_tag_ids)
 
 User = get_user_model()
 
@@ -105,6 +122,36 @@ class PostTagModelTests(TestCase):
             ids_by_ordered_tags
         )
 
+    def test_ordered_tags_are_loaded_once(self):
+        """Test that repeated access to ordered tags reuses one query"""
+        self.post.update_tags([self.tag2.id, self.tag1.id])
+        with self.assertNumQueries(1):
+            self.assertEqual(len(self.post.ordered_tag_list), 2)
+            self.assertEqual([tag.name for tag in self.post.ordered_tag_list],
+                             ['tag2', 'tag1'])
+            self.assertEqual(self.post.ordered_tag_ids, [self.tag2.id, self.tag1.id])
+
+    def test_ordered_tags_cache_invalidated_by_changes(self):
+        """Test that update_tags and copying tags refresh the cached order"""
+        self.post.update_tags([self.tag1.id])
+        self.assertEqual(self.post.ordered_tag_ids, [self.tag1.id])
+
+        self.post.update_tags([self.tag2.id, self.tag1.id])
+        self.assertEqual(self.post.ordered_tag_ids, [self.tag2.id, self.tag1.id])
+
+        other_post = Post.objects.create(user=self.user, title='Other')
+        other_post.update_tags([self.tag3.id])
+        self.post.copy_tags_from_other_instance(other_post)
+        self.assertEqual(
+            self.post.ordered_tag_ids, [self.tag2.id, self.tag1.id, self.tag3.id]
+        )
+
+    def test_ordered_tag_ids_returns_new_list(self):
+        """Test that changing a returned list doesn't change the cached order"""
+        self.post.update_tags([self.tag1.id, self.tag2.id])
+        self.post.ordered_tag_ids.remove(self.tag1.id)
+        self.assertEqual(self.post.ordered_tag_ids, [self.tag1.id, self.tag2.id])
+
     # Tests for method update_tags
     def test_update_tags_adds_tags_and_orders_them(self):
         """Test that update_tags correctly adds and orders tags."""
@@ -114,10 +161,13 @@ class PostTagModelTests(TestCase):
         self.assertEqual(
             [tag.tag_id for tag in post_tags], [self.tag3.id, self.tag1.id]
         )
-        self.assertEqual([tag.position for tag in post_tags], [0, 1])
+        self.assertEqual(
+            [tag.position for tag in post_tags],
+            [POSITION_STEP, 2 * POSITION_STEP]
+        )
 
-    def test_update_tags_corrects_position_gap(self):
-        """Test that update_tags corrects position gaps."""
+    def test_update_tags_respreads_positions_without_gap(self):
+        """Test that positions are spread again when a move has no gap to use"""
         PostTag.objects.create(post=self.post, tag=self.tag1, position=0)
         PostTag.objects.create(post=self.post, tag=self.tag2, position=2)
         positions_before = list(
@@ -129,7 +179,7 @@ class PostTagModelTests(TestCase):
         positions_after = list(
             PostTag.objects.filter(post=self.post).values_list('position', flat=True)
         )
-        self.assertEqual(positions_after, [0, 1])
+        self.assertEqual(positions_after, [POSITION_STEP, 2 * POSITION_STEP])
 
     def test_update_tags_removes_unlisted_tags(self):
         """Test that update_tags removes tags not in the given list."""
@@ -155,7 +205,10 @@ class PostTagModelTests(TestCase):
         self.assertEqual(
             [tag.tag_id for tag in post_tags], [self.tag2.id, self.tag1.id]
         )
-        self.assertEqual([tag.position for tag in post_tags], [0, 1])
+        self.assertEqual(
+            [tag.position for tag in post_tags],
+            [POSITION_STEP, 2 * POSITION_STEP]
+        )
 
     def test_update_tags_idempotent_when_order_and_tags_unchanged(self):
         """Calling update_tags with the current order does not change anything."""
@@ -184,7 +237,10 @@ class PostTagModelTests(TestCase):
         self.assertEqual(
             [tag.tag_id for tag in post_tags], tag_ids_input
         )
-        self.assertEqual([tag.position for tag in post_tags], [0, 1, 2])
+        self.assertEqual(
+            [tag.position for tag in post_tags],
+            [POSITION_STEP, 2 * POSITION_STEP, 3 * POSITION_STEP]
+        )
 
     def test_update_tags_empty_list_clears_tags_from_post(self):
         """Test that an empty list removes tags from a post"""
@@ -219,7 +275,10 @@ class PostTagModelTests(TestCase):
         self.assertNotEqual(
             [tag.tag_id for tag in post_tags], tag_ids_input
         )
-        self.assertEqual([tag.position for tag in post_tags], [0, 1, 2])
+        self.assertEqual(
+            [tag.position for tag in post_tags],
+            [0, POSITION_STEP, 2 * POSITION_STEP]
+        )
 
     def test_update_tags_invalid_tag_id(self):
         """Test invalid tag raises an error"""
@@ -236,9 +295,8 @@ class PostTagModelTests(TestCase):
         self.post.update_tags([self.tag1.id])
         original_tag_ids = self.post.ordered_tag_ids
 
-        # Patch bulk_create to raise error on second call
-        with patch('posts.models.PostTag.objects.bulk_create',
-                   side_effect=Exception('DB error')):
+        # Fail after the rows are written, on both the PostgreSQL and the portable path
+        with patch('posts.models.bump_generation', side_effect=Exception('DB error')):
             with self.assertRaises(Exception):
                 self.post.update_tags([self.tag1.id, self.tag2.id])
 
@@ -354,10 +412,13 @@ class TagGroupTagModelTests(TestCase):
         self.assertEqual(
             [tag.tag_id for tag in tg_tags], [self.tag3.id, self.tag1.id]
         )
-        self.assertEqual([tag.position for tag in tg_tags], [0, 1])
+        self.assertEqual(
+            [tag.position for tag in tg_tags],
+            [POSITION_STEP, 2 * POSITION_STEP]
+        )
 
-    def test_update_tags_corrects_position_gap(self):
-        """Test that update_tags corrects position gaps."""
+    def test_update_tags_respreads_positions_without_gap(self):
+        """Test that positions are spread again when a move has no gap to use"""
         TagGroupTag.objects.create(tag_group=self.tg, tag=self.tag1, position=0)
         TagGroupTag.objects.create(tag_group=self.tg, tag=self.tag2, position=2)
         positions_before = list(
@@ -373,7 +434,7 @@ class TagGroupTagModelTests(TestCase):
                 'position', flat=True
             )
         )
-        self.assertEqual(positions_after, [0, 1])
+        self.assertEqual(positions_after, [POSITION_STEP, 2 * POSITION_STEP])
 
     def test_update_tags_removes_unlisted_tags(self):
         """Test that update_tags removes Tags not in the given list."""
@@ -399,7 +460,10 @@ class TagGroupTagModelTests(TestCase):
         self.assertEqual(
             [tag.tag_id for tag in tg_tags], [self.tag2.id, self.tag1.id]
         )
-        self.assertEqual([tag.position for tag in tg_tags], [0, 1])
+        self.assertEqual(
+            [tag.position for tag in tg_tags],
+            [POSITION_STEP, 2 * POSITION_STEP]
+        )
 
     def test_update_tags_idempotent_when_order_and_tags_unchanged(self):
         """Calling update_tags with the current order does not change anything."""
@@ -428,7 +492,10 @@ class TagGroupTagModelTests(TestCase):
         self.assertEqual(
             [tag.tag_id for tag in tg_tags], tag_ids_input
         )
-        self.assertEqual([tag.position for tag in tg_tags], [0, 1, 2])
+        self.assertEqual(
+            [tag.position for tag in tg_tags],
+            [POSITION_STEP, 2 * POSITION_STEP, 3 * POSITION_STEP]
+        )
 
     def test_update_tags_empty_list_clears_tags_from_post(self):
         """Test that an empty list removes tags from a TagGroup"""
@@ -463,7 +530,10 @@ class TagGroupTagModelTests(TestCase):
         self.assertNotEqual(
             [tag.tag_id for tag in tg_tags], tag_ids_input
         )
-        self.assertEqual([tag.position for tag in tg_tags], [0, 1, 2])
+        self.assertEqual(
+            [tag.position for tag in tg_tags],
+            [0, POSITION_STEP, 2 * POSITION_STEP]
+        )
 
     def test_update_tags_invalid_tag_id(self):
         """Test invalid Tag raises an error"""
@@ -480,9 +550,8 @@ class TagGroupTagModelTests(TestCase):
         self.tg.update_tags([self.tag1.id])
         original_tag_ids = self.tg.ordered_tag_ids
 
-        # Patch bulk_create to raise error on second call
-        with patch('posts.models.TagGroupTag.objects.bulk_create',
-                   side_effect=Exception('DB error')):
+        # Fail after the rows are written, on both the PostgreSQL and the portable path
+        with patch('posts.models.bump_generation', side_effect=Exception('DB error')):
             with self.assertRaises(Exception):
                 self.tg.update_tags([self.tag1.id, self.tag2.id])
 
@@ -490,6 +559,478 @@ class TagGroupTagModelTests(TestCase):
         self.assertEqual(self.tg.ordered_tag_ids, original_tag_ids)
 
 
+class TagPositionTests(TestCase):
+    """Test cases for gap-based tag positions"""
+    def setUp(self):
+        self.user = User.objects.create_user(email='u@example.com', password='pw')
+        self.post = Post.objects.create(user=self.user, title='Test')
+        self.tags = [Tag.objects.create(name=f'tag{i}') for i in range(5)]
+        self.tag_ids = [tag.id for tag in self.tags]
+        self.post.update_tags(self.tag_ids)
+
+    def get_positions(self):
+        return dict(
+            PostTag.objects.filter(post=self.post).values_list('tag_id', 'position')
+        )
+
+    def test_move_writes_only_moved_tag(self):
+        """Test that moving one tag keeps positions of all other tags"""
+        positions_before = self.get_positions()
+        new_order = [self.tag_ids[3]] + self.tag_ids[:3] + self.tag_ids[4:]
+
+        self.post.update_tags(new_order)
+
+        positions_after = self.get_positions()
+        changed = {tag_id for tag_id in positions_after
+                   if positions_after[tag_id] != positions_before[tag_id]}
+        self.assertEqual(changed, {self.tag_ids[3]})
+        self.assertEqual(self.post.ordered_tag_ids, new_order)
+
+    def test_append_does_not_touch_existing_tags(self):
+        positions_before = self.get_positions()
+        new_tag = Tag.objects.create(name='appended')
+
+        self.post.update_tags(self.tag_ids + [new_tag.id])
+
+        positions_after = self.get_positions()
+        self.assertEqual(positions_after.pop(new_tag.id),
+                         positions_before[self.tag_ids[-1]] + POSITION_STEP)
+        self.assertEqual(positions_after, positions_before)
+
+    def test_repeated_moves_keep_order(self):
+        """Test that moves into the same gap keep working after it runs out"""
+        order = list(self.tag_ids)
+        for _ in range(40):
+            order = [order[-1]] + order[:-1]
+            self.post.update_tags(order)
+            self.assertEqual(self.post.ordered_tag_ids, order)
+
+    def test_plan_positions_uses_gaps(self):
+        positions = plan_positions([3, 1, 4, 2], {1: 10, 2: 20, 3: 30})
+        self.assertEqual(positions[1], 10)
+        self.assertEqual(positions[2], 20)
+        self.assertLess(positions[3], positions[1])
+        self.assertTrue(positions[1] < positions[4] < positions[2])
+
+    def test_plan_positions_respreads_full_gap(self):
+        positions = plan_positions([1, 3, 2], {1: 10, 2: 11})
+        self.assertEqual(
+            positions, {1: POSITION_STEP, 3: 2 * POSITION_STEP, 2: 3 * POSITION_STEP}
+        )
+
+    def test_rebalance_positions_keeps_order(self):
+        order = [self.tag_ids[4]] + self.tag_ids[:4]
+        self.post.update_tags(order)
+
+        self.post.rebalance_positions()
+
+        self.assertEqual(
+            sorted(self.get_positions().values()),
+            [POSITION_STEP * i for i in range(1, 6)]
+        )
+        self.assertEqual(self.post.ordered_tag_ids, order)
+
+    def test_move_tags_before_other_tag(self):
+        """Test that a move writes only the moved row and reports it"""
+        positions_before = self.get_positions()
+
+        changed = self.post.move_tags(
+            [{'tag_id': self.tag_ids[4], 'before_id': self.tag_ids[1]}]
+        )
+
+        positions_after = self.get_positions()
+        self.assertEqual(changed, {self.tag_ids[4]: positions_after[self.tag_ids[4]]})
+        positions_after.pop(self.tag_ids[4])
+        positions_before.pop(self.tag_ids[4])
+        self.assertEqual(positions_after, positions_before)
+        self.assertEqual(
+            self.post.ordered_tag_ids,
+            [self.tag_ids[0], self.tag_ids[4]] + self.tag_ids[1:4]
+        )
+
+    def test_move_tags_to_index_and_end(self):
+        self.post.move_tags([
+            {'tag_id': self.tag_ids[0], 'before_id': None},
+            {'tag_id': self.tag_ids[3], 'index': 0},
+            {'tag_id': self.tag_ids[2], 'index': 2},
+        ])
+        ids = self.tag_ids
+        self.assertEqual(
+            self.post.ordered_tag_ids, [ids[3], ids[1], ids[2], ids[4], ids[0]]
+        )
+
+    def test_move_tags_in_place_changes_nothing(self):
+        changed = self.post.move_tags([
+            {'tag_id': self.tag_ids[1], 'before_id': self.tag_ids[2]},
+            {'tag_id': self.tag_ids[0], 'index': 0},
+        ])
+        self.assertEqual(changed, {})
+
+    def test_move_tags_rebalances_full_gap(self):
+        """Test that repeated moves into one gap respread positions once it's full"""
+        order = list(self.tag_ids)
+        for _ in range(40):
+            self.post.move_tags([{'tag_id': order[-1], 'before_id': order[1]}])
+            order = [order[0], order[-1]] + order[1:-1]
+            self.assertEqual(self.post.ordered_tag_ids, order)
+
+    def test_move_tags_queries_dont_depend_on_tag_count(self):
+        def count_move_queries(post, tag_ids):
+            with CaptureQueriesContext(connection) as queries:
+                post.move_tags([{'tag_id': tag_ids[-1], 'before_id': tag_ids[1]},
+                                {'tag_id': tag_ids[0], 'index': 3}])
+            # Hashtags are moved along, names of all Tags aren't read
+            tag_table = connection.ops.quote_name(Tag._meta.db_table)
+            self.assertFalse([query for query in queries.captured_queries
+                              if tag_table in query['sql']])
+            return len(queries.captured_queries)
+
+        many_tags = [Tag.objects.create(name=f'many{i}') for i in range(50)]
+        many_tag_ids = [tag.id for tag in many_tags]
+        other_post = Post.objects.create(user=self.user, title='Many tags')
+        other_post.update_tags(many_tag_ids)
+
+        self.assertEqual(count_move_queries(self.post, self.tag_ids),
+                         count_move_queries(other_post, many_tag_ids))
+        for post in (self.post, other_post):
+            post.refresh_from_db()
+            order = post.read_tag_order()
+            self.assertEqual(unpack_tag_ids(post.packed_tag_ids), order)
+            names = dict(Tag.objects.values_list('id', 'name'))
+            self.assertEqual(post.tags_text, ' '.join(f'#{names[tag_id]}'
+                                                      for tag_id in order))
+
+    def test_move_tags_repairs_stale_stored_order(self):
+        Post.objects.filter(pk=self.post.pk).update(packed_tag_ids=b'', tags_text='')
+
+        self.post.move_tags([{'tag_id': self.tag_ids[4], 'index': 0}])
+
+        self.post.refresh_from_db()
+        order = [self.tag_ids[4]] + self.tag_ids[:4]
+        self.assertEqual(unpack_tag_ids(self.post.packed_tag_ids), order)
+        self.assertEqual(self.post.tags_text.split()[0], f'#{self.tags[4].name}')
+
+    def test_move_tags_rejects_detached_tag(self):
+        other_tag = Tag.objects.create(name='detached')
+        with self.assertRaises(ValueError):
+            self.post.move_tags([{'tag_id': other_tag.id, 'index': 0}])
+        with self.assertRaises(ValueError):
+            self.post.move_tags([{'tag_id': self.tag_ids[0], 'before_id': other_tag.id}])
+
+
+@skipUnless(connection.vendor == 'postgresql', 'Single statement path of PostgreSQL')
+class UpdateTagsPostgresqlTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(email='pg@example.com', password='pw')
+        self.post = Post.objects.create(user=self.user, title='Test')
+        self.tags = [Tag.objects.create(name=f'pgtag{i}') for i in range(5)]
+        self.tag_ids = [tag.id for tag in self.tags]
+        self.post.update_tags_postgresql(self.tag_ids)
+
+    def get_positions(self):
+        return dict(
+            PostTag.objects.filter(post=self.post).values_list('tag_id', 'position')
+        )
+
+    def test_reorder_writes_only_moved_tags(self):
+        positions_before = self.get_positions()
+        new_order = [self.tag_ids[3]] + self.tag_ids[:3] + self.tag_ids[4:]
+
+        self.post.update_tags_postgresql(new_order)
+
+        positions_after = self.get_positions()
+        changed = {tag_id for tag_id in positions_after
+                   if positions_after[tag_id] != positions_before[tag_id]}
+        self.assertEqual(changed, {self.tag_ids[3]})
+        self.assertEqual(self.post.ordered_tag_ids, new_order)
+        self.assertEqual(self.post.read_tag_order(), new_order)
+
+    def test_insert_between_keeps_other_positions(self):
+        positions_before = self.get_positions()
+        new_tag = Tag.objects.create(name='inserted')
+        new_order = self.tag_ids[:2] + [new_tag.id] + self.tag_ids[2:]
+
+        self.post.update_tags_postgresql(new_order)
+
+        positions_after = self.get_positions()
+        new_position = positions_after.pop(new_tag.id)
+        self.assertEqual(positions_after, positions_before)
+        self.assertLess(positions_before[self.tag_ids[1]], new_position)
+        self.assertLess(new_position, positions_before[self.tag_ids[2]])
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.tags_text.split()[2], '#inserted')
+
+    def test_reorder_reads_and_writes_once(self):
+        new_order = self.tag_ids[::-1]
+        # Savepoint, locking read, the statement and the savepoint release
+        with self.assertNumQueries(4):
+            self.post.update_tags_postgresql(new_order)
+        self.assertEqual(self.post.read_tag_order(), new_order)
+
+    def test_missing_tag_writes_nothing(self):
+        positions_before = self.get_positions()
+
+        with self.assertRaises(ValueError):
+            self.post.update_tags_postgresql(self.tag_ids[:2] + [999999])
+
+        self.assertEqual(self.get_positions(), positions_before)
+
+
+class TagUsageCountTests(TestCase):
+    """Test cases for the usage counter that DB triggers keep on Tag"""
+    def setUp(self):
+        self.user = User.objects.create_user(email='usage@example.com')
+        self.post = Post.objects.create(user=self.user, title='Post')
+        self.tg = TagGroup.objects.create(user=self.user, name='TG')
+        self.tag1 = Tag.objects.create(name='usage1')
+        self.tag2 = Tag.objects.create(name='usage2')
+
+    def get_counts(self):
+        return dict(Tag.objects.values_list('name', 'usage_count'))
+
+    def test_update_tags_counts_usages(self):
+        self.post.update_tags([self.tag1.id, self.tag2.id])
+        self.tg.update_tags([self.tag1.id])
+        self.assertEqual(self.get_counts(), {'usage1': 2, 'usage2': 1})
+
+        self.post.update_tags([self.tag2.id, self.tag1.id])  # Reorder only
+        self.assertEqual(self.get_counts(), {'usage1': 2, 'usage2': 1})
+
+        self.post.update_tags([self.tag1.id])
+        self.assertEqual(self.get_counts(), {'usage1': 2, 'usage2': 0})
+
+    def test_bulk_and_m2m_paths_count_usages(self):
+        PostTag.objects.bulk_create([
+            PostTag(post=self.post, tag=self.tag1, position=1),
+            PostTag(post=self.post, tag=self.tag2, position=2),
+        ])
+        self.tg.tags.add(self.tag1, through_defaults={'position': 1})
+        self.assertEqual(self.get_counts(), {'usage1': 2, 'usage2': 1})
+
+        self.post.tags.remove(self.tag1)
+        self.tg.tags.clear()
+        self.assertEqual(self.get_counts(), {'usage1': 0, 'usage2': 1})
+
+    def test_cascade_delete_counts_usages(self):
+        self.post.update_tags([self.tag1.id, self.tag2.id])
+        self.tg.update_tags([self.tag1.id])
+
+        TagGroup.objects.filter(pk=self.tg.pk).delete()
+        self.assertEqual(self.get_counts(), {'usage1': 1, 'usage2': 1})
+
+    def test_saving_loaded_tag_keeps_counter(self):
+        """Test that a stale usage_count of a loaded Tag doesn't overwrite the counter"""
+        tag = Tag.objects.get(pk=self.tag1.pk)
+        self.post.update_tags([self.tag1.id])
+
+        tag.name = 'renamed'
+        tag.save()
+
+        self.assertEqual(self.get_counts(), {'renamed': 1, 'usage2': 0})
+
+
+class PackedTagOrderTests(TestCase):
+    """Test cases for the Tag order stored on Posts and TagGroups"""
+    def setUp(self):
+        self.user = User.objects.create_user(email='packed@example.com')
+        self.post = Post.objects.create(user=self.user, title='Post')
+        self.tg = TagGroup.objects.create(user=self.user, name='TG')
+        self.tags = [Tag.objects.create(name=f'packed{i}') for i in range(4)]
+        self.tag_ids = [tag.id for tag in self.tags]
+
+    def get_stored_order(self, item):
+        return unpack_tag_ids(type(item).objects.get(pk=item.pk).packed_tag_ids)
+
+    def test_write_paths_store_order(self):
+        self.post.update_tags([self.tag_ids[2], self.tag_ids[0], self.tag_ids[2]])
+        self.assertEqual(self.get_stored_order(self.post),
+                         [self.tag_ids[2], self.tag_ids[0]])
+
+        self.post.move_tags([{'tag_id': self.tag_ids[0], 'index': 0}])
+        self.assertEqual(self.get_stored_order(self.post),
+                         [self.tag_ids[0], self.tag_ids[2]])
+
+        self.tg.update_tags([self.tag_ids[3], self.tag_ids[0]])
+        self.post.append_tags_from(self.tg)
+        self.assertEqual(self.get_stored_order(self.post),
+                         [self.tag_ids[0], self.tag_ids[2], self.tag_ids[3]])
+
+    def test_m2m_and_row_saves_store_order(self):
+        self.tg.tags.add(self.tags[1], through_defaults={'position': 2})
+        TagGroupTag.objects.create(tag_group=self.tg, tag=self.tags[0], position=1)
+        self.assertEqual(self.get_stored_order(self.tg), self.tag_ids[:2])
+
+        self.tg.tags.remove(self.tags[0])
+        self.assertEqual(self.get_stored_order(self.tg), [self.tag_ids[1]])
+
+        self.tags[1].tag_groups.clear()
+        self.assertEqual(self.get_stored_order(self.tg), [])
+
+    def test_row_and_tag_deletes_store_order(self):
+        self.post.update_tags(self.tag_ids)
+        generation = read_cache.get_generation(self.user.pk)
+
+        request = RequestFactory().post('/')
+        admin.site._registry[PostTag].delete_model(
+            request, PostTag.objects.get(post=self.post, tag=self.tags[0]))
+        self.assertEqual(self.get_stored_order(self.post), self.tag_ids[1:])
+        self.assertNotEqual(read_cache.get_generation(self.user.pk), generation)
+
+        self.tg.update_tags(self.tag_ids)
+        admin.site._registry[TagGroupTag].delete_queryset(
+            request, TagGroupTag.objects.filter(tag_id__in=self.tag_ids[:2]))
+        self.assertEqual(self.get_stored_order(self.tg), self.tag_ids[2:])
+
+        Tag.objects.filter(pk__in=self.tag_ids[1:3]).delete()
+        self.assertEqual(self.get_stored_order(self.post), self.tag_ids[3:])
+        self.assertEqual(self.get_stored_order(self.tg), self.tag_ids[3:])
+
+    def test_deletes_store_each_order_once(self):
+        self.post.update_tags(self.tag_ids)
+        self.tg.update_tags(self.tag_ids)
+
+        with patch.object(Post, 'store_tag_order') as post_store, \
+                patch.object(TagGroup, 'store_tag_order') as tg_store:
+            Tag.objects.filter(pk__in=self.tag_ids[:2]).delete()
+            post_store.assert_called_once()
+            tg_store.assert_called_once()
+
+            # Rows deleted with their items leave nothing to store
+            self.post.delete()
+            self.user.delete()
+            post_store.assert_called_once()
+            tg_store.assert_called_once()
+
+    def test_item_deletes_dont_load_through_rows(self):
+        other_post = Post.objects.create(user=self.user, title='Other')
+        other_post.update_tags(self.tag_ids[:1])
+        self.post.update_tags(self.tag_ids)
+        schedule_job(ORPHAN_SWEEP_JOB)  # Both deletes find the sweep scheduled
+
+        with CaptureQueriesContext(connection) as few_tags:
+            other_post.delete()
+        with CaptureQueriesContext(connection) as many_tags:
+            self.post.delete()
+
+        self.assertEqual(len(many_tags), len(few_tags))
+        table = PostTag._meta.db_table
+        self.assertFalse([query['sql'] for query in many_tags.captured_queries
+                          if query['sql'].startswith('SELECT')
+                          and table in query['sql']])
+        self.assertFalse(PostTag.objects.exists())
+
+    @override_settings(TAG_ORDER_SOURCE='packed')
+    def test_ordered_tags_reads_stored_order(self):
+        order = [self.tag_ids[3], self.tag_ids[1], self.tag_ids[2]]
+        self.post.update_tags(order)
+        post = Post.objects.get(pk=self.post.pk)
+
+        with self.assertNumQueries(1):  # Only the Tag lookup, no join
+            self.assertEqual(post.ordered_tag_ids, order)
+        with override_settings(TAG_ORDER_SOURCE='through'):
+            self.assertEqual(Post.objects.get(pk=self.post.pk).ordered_tag_ids, order)
+
+    @override_settings(TAG_ORDER_SOURCE='packed')
+    def test_ordered_tags_skips_deleted_tags(self):
+        self.post.update_tags(self.tag_ids)
+        Tag.objects.filter(pk=self.tag_ids[1]).delete()
+
+        post = Post.objects.get(pk=self.post.pk)
+        self.assertEqual(post.ordered_tag_ids,
+                         [self.tag_ids[0]] + self.tag_ids[2:])
+        self.assertEqual(post.ordered_tags.count(), 3)
+
+
+class PostTextTests(TestCase):
+    """Test cases for hashtags and plain text rendered on Post"""
+    def setUp(self):
+        self.user = User.objects.create_user(email='text@example.com')
+        self.post = Post.objects.create(user=self.user, title='Post',
+                                        description='Hello')
+        self.tg = TagGroup.objects.create(user=self.user, name='TG')
+        self.tags = [Tag.objects.create(name=f'text{i}') for i in range(3)]
+        self.tag_ids = [tag.id for tag in self.tags]
+
+    def get_texts(self):
+        return Post.objects.values_list('tags_text', 'plain_text').get(pk=self.post.pk)
+
+    def test_new_post_plain_text_is_description(self):
+        self.assertEqual(self.get_texts(), ('', 'Hello'))
+
+    def test_tag_changes_render_texts(self):
+        self.post.update_tags([self.tag_ids[1], self.tag_ids[0]])
+        self.assertEqual(self.post.tags_text, '#text1 #text0')
+        self.assertEqual(self.get_texts(),
+                         ('#text1 #text0', 'Hello\n\n#text1 #text0'))
+
+        self.post.move_tags([{'tag_id': self.tag_ids[0], 'index': 0}])
+        self.assertEqual(self.get_texts()[0], '#text0 #text1')
+
+        self.tg.update_tags([self.tag_ids[2]])
+        self.post.append_tags_from(self.tg)
+        self.assertEqual(self.get_texts()[0], '#text0 #text1 #text2')
+
+        self.post.tags.clear()
+        self.assertEqual(self.get_texts(), ('', 'Hello'))
+
+    def test_description_change_renders_plain_text(self):
+        self.post.update_tags([self.tag_ids[0]])
+        # A Post loaded before the tags changed keeps the new tags
+        stale_post = Post.objects.get(pk=self.post.pk)
+        self.post.update_tags([self.tag_ids[0], self.tag_ids[2]])
+
+        stale_post.description = 'Bye'
+        stale_post.save()
+
+        self.assertEqual(self.get_texts(), ('#text0 #text2', 'Bye\n\n#text0 #text2'))
+        # The instance isn't read again, it keeps the tags it was loaded with
+        self.assertEqual(stale_post.plain_text, 'Bye\n\n#text0')
+
+    def test_writes_set_texts_without_reading_them(self):
+        self.post.update_tags(self.tag_ids[:2])
+        self.post.description = 'Bye'
+        self.post.save()
+
+        with self.assertNumQueries(0):
+            self.assertEqual(self.post.plain_text, 'Bye\n\n#text0 #text1')
+
+        self.post.move_tags([{'tag_id': self.tag_ids[1], 'index': 0}])
+        with self.assertNumQueries(0):
+            self.assertEqual(self.post.plain_text, 'Bye\n\n#text1 #text0')
+        self.assertEqual(self.get_texts()[1], 'Bye\n\n#text1 #text0')
+
+    def test_tag_delete_renders_texts(self):
+        self.post.update_tags(self.tag_ids[:2])
+
+        self.tags[0].delete()
+
+        self.assertEqual(self.get_texts(), ('#text1', 'Hello\n\n#text1'))
+
+    def test_tag_rename_renders_texts(self):
+        self.post.update_tags(self.tag_ids[:2])
+
+        self.tags[0].name = 'renamed'
+        self.tags[0].save()
+
+        self.assertEqual(self.get_texts(),
+                         ('#renamed #text1', 'Hello\n\n#renamed #text1'))
+
+    def test_tag_rename_makes_reads_of_owners_stale_once(self):
+        other_user = User.objects.create_user(email='other-text@example.com')
+        TagGroup.objects.create(user=other_user, name='TG').update_tags(
+            self.tag_ids[:1])
+        self.post.update_tags(self.tag_ids[:2])
+        Post.objects.create(user=self.user, title='Second').update_tags(
+            self.tag_ids[:1])
+
+        with patch('posts.models.bump_generation') as bump_generation:
+            self.tags[0].name = 'renamed'
+            self.tags[0].save()
+
+        self.assertCountEqual([call.args[0] for call in bump_generation.call_args_list],
+                              [self.user.pk, other_user.pk])
+
+
 class TagModelTests(TestCase):
     """Test cases for a Tag model"""
     def test_str_representation(self):
@@ -543,6 +1084,98 @@ class TagModelTests(TestCase):
             tag.full_clean()
 
 
+class InternTagsTests(TestCase):
+    """Test cases for resolving tag names into Tag ids"""
+    def setUp(self):
+        self.existing = Tag.objects.create(name='existing')
+
+    def test_split_tag_names(self):
+        """Test that input is split by commas, hashes and spaces"""
+        self.assertEqual(
+            split_tag_names('#One, two  #three,,one Two'),
+            ['one', 'two', 'three']
+        )
+        self.assertEqual(split_tag_names(' , # '), [])
+
+    def test_returns_ids_in_input_order(self):
+        tag_ids = intern_tags(['new_b', 'existing', 'new_a'])
+        names = [Tag.objects.get(id=tag_id).name for tag_id in tag_ids]
+        self.assertEqual(names, ['new_b', 'existing', 'new_a'])
+
+    def test_reuses_existing_tags_case_insensitive(self):
+        tag_ids = intern_tags(['EXISTING', 'Existing'])
+        self.assertEqual(tag_ids, [self.existing.id])
+        self.assertEqual(Tag.objects.count(), 1)
+
+    def test_creates_missing_tags_lowercase(self):
+        intern_tags(['NewTag'])
+        self.assertTrue(Tag.objects.filter(name='newtag').exists())
+        self.assertFalse(Tag.objects.filter(name='NewTag').exists())
+
+    def test_invalid_name_creates_nothing(self):
+        from django.core.exceptions import ValidationError
+
+        with self.assertRaises(ValidationError):
+            intern_tags(['valid_one', 'in.valid'])
+        self.assertFalse(Tag.objects.filter(name='valid_one').exists())
+
+    def test_query_count_does_not_depend_on_input_size(self):
+        names = [f'bulk_tag_{i}' for i in range(30)] + ['existing']
+        # One lookup, a touch of the unused existing Tag, one bulk insert
+        # and one re-read of inserted names
+        with self.assertNumQueries(4):
+            tag_ids = intern_tags(names)
+        self.assertEqual(len(tag_ids), 31)
+
+        with self.assertNumQueries(2):
+            self.assertEqual(intern_tags(names), tag_ids)
+
+        # Used Tags aren't touched
+        post = Post.objects.create(user=User.objects.create_user(email='n@example.com'),
+                                   title='Post')
+        post.update_tags(tag_ids)
+        with self.assertNumQueries(1):
+            self.assertEqual(intern_tags(names), tag_ids)
+
+    def test_touches_reused_unused_tags(self):
+        old_time = timezone.now() - timedelta(days=1)
+        Tag.objects.filter(pk=self.existing.pk).update(touched_at=old_time)
+
+        intern_tags(['existing'])
+
+        self.existing.refresh_from_db()
+        self.assertGreater(self.existing.touched_at, old_time)
+
+    def test_reads_again_tags_deleted_by_a_sweep(self):
+        original_update = QuerySet.update
+
+        def delete_before_touch(queryset, **kwargs):
+            Tag.objects.filter(pk=self.existing.pk).delete()
+            return original_update(queryset, **kwargs)
+
+        with patch.object(QuerySet, 'update', delete_before_touch):
+            tag_ids = intern_tags(['existing'])
+
+        self.assertEqual(Tag.objects.get(pk=tag_ids[0]).name, 'existing')
+        self.assertNotEqual(tag_ids, [self.existing.pk])
+
+    def test_tolerates_tag_created_concurrently(self):
+        """A Tag inserted by another request after the lookup is reused"""
+        from unittest.mock import patch
+
+        original_bulk_create = Tag.objects.bulk_create
+
+        def create_race_winner_first(objs, **kwargs):
+            Tag.objects.create(name='racing')
+            return original_bulk_create(objs, **kwargs)
+
+        with patch('posts.models.Tag.objects.bulk_create',
+                   side_effect=create_race_winner_first):
+            tag_ids = intern_tags(['racing'])
+
+        self.assertEqual(tag_ids, [Tag.objects.get(name='racing').id])
+
+
 class TagGroupModelTests(TestCase):
     def setUp(self):
         self.user = User.objects.create_user(email='user@example.com', password='pw')
@@ -702,6 +1335,34 @@ class MixinTests(TestCase):
             self.tg.updated_at, old_updated_at
         )
 
+    def test_copy_tags_runs_single_insert(self):
+        """Test that a copy appends after the last position in one statement"""
+        self.post.update_tags([self.post_tag1.id, self.tg_tag2.id])
+        last_position = TagGroupTag.objects.filter(tag_group=self.tg).order_by(
+            'position').last().position
+
+        with self.assertNumQueries(4):  # savepoint, insert, update, release
+            appended = self.tg.append_tags_from(self.post)
+
+        self.assertEqual(appended, 1)
+        self.assertEqual(
+            TagGroupTag.objects.get(tag_group=self.tg, tag=self.post_tag1).position,
+            last_position + POSITION_STEP
+        )
+        self.assertEqual(self.tg.ordered_tag_ids,
+                         [self.tg_tag1.id, self.tg_tag2.id, self.post_tag1.id])
+
+    def test_copy_many_tags_keeps_order(self):
+        tags = Tag.objects.bulk_create([Tag(name=f'many{i}') for i in range(300)])
+        tag_ids = [tag.id for tag in reversed(tags)]
+        self.post.update_tags(tag_ids)
+
+        self.tg.append_tags_from(self.post)
+
+        self.assertEqual(
+            self.tg.ordered_tag_ids, [self.tg_tag1.id, self.tg_tag2.id] + tag_ids
+        )
+
     def test_copy_tags_between_two_posts(self):
         """Test that tags are copied between two posts"""
         new_post = Post.objects.create(
@@ -723,6 +1384,7 @@ class MixinTests(TestCase):
             self.post.copy_tags_from_other_instance(self.other_post)
 
 
+@override_settings(ORPHAN_SWEEP_GRACE_SECONDS=0)
 class SignalTests(TestCase):
     def setUp(self):
         self.user = User.objects.create_user(email='u@example.com', password='pw')
@@ -751,6 +1413,9 @@ class SignalTests(TestCase):
         self.assertTrue(Tag.objects.filter(name='tg_tag2').exists())
 
         self.tg.delete()
+        # Tags stay until the deferred sweeper runs
+        self.assertEqual(Tag.objects.filter(id__in=tag_ids).count(), 2)
+        run_due_jobs()
 
         self.assertFalse(TagGroup.objects.filter(name='Test TagGroup').exists())
         self.assertEqual(Tag.objects.filter(id__in=tag_ids).count(), 0)
@@ -768,6 +1433,9 @@ class SignalTests(TestCase):
         self.assertTrue(Tag.objects.filter(name='post_tag2').exists())
 
         self.post.delete()
+        # Tags stay until the deferred sweeper runs
+        self.assertEqual(Tag.objects.filter(id__in=tag_ids).count(), 2)
+        run_due_jobs()
 
         self.assertFalse(Post.objects.filter(title='Test Post').exists())
         self.assertEqual(Tag.objects.filter(id__in=tag_ids).count(), 0)
@@ -775,6 +1443,70 @@ class SignalTests(TestCase):
         self.assertFalse(Tag.objects.filter(name='post_tag2').exists())
 
 
+@override_settings(ORPHAN_SWEEP_GRACE_SECONDS=0)
+class OrphanSweepTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(email='sweep@example.com')
+        self.post = Post.objects.create(user=self.user, title='Post')
+        self.used_tag = Tag.objects.create(name='used')
+        self.post.update_tags([self.used_tag.id])
+
+    def test_deletes_have_no_signals(self):
+        """Test that nothing prevents fast deletes of Posts and TagGroups"""
+        for model in (Post, TagGroup, PostTag, TagGroupTag):
+            self.assertFalse(pre_delete.has_listeners(model))
+
+    def test_cascades_fast_delete_through_rows(self):
+        """Test that through rows of deleted items are deleted without loading them"""
+        tg = TagGroup.objects.create(user=self.user, name='TG')
+        tg.update_tags([self.used_tag.id])
+        collector = Collector(using='default')
+
+        self.assertTrue(collector.can_fast_delete(
+            PostTag.objects.filter(post=self.post)))
+        self.assertTrue(collector.can_fast_delete(
+            TagGroupTag.objects.filter(tag_group=tg)))
+
+    def test_delete_schedules_single_sweep(self):
+        Post.objects.create(user=self.user, title='Other').delete()
+        self.post.delete()
+        self.assertEqual(Job.objects.filter(kind=ORPHAN_SWEEP_JOB).count(), 1)
+
+    @override_settings(ORPHAN_SWEEP_BATCH_SIZE=4, ORPHAN_SWEEP_INTERVAL=600)
+    def test_sweep_deletes_unused_tags_in_batches(self):
+        Tag.objects.bulk_create([Tag(name=f'orphan{i}') for i in range(5)])
+        self.post.delete()
+
+        self.assertEqual(run_due_jobs(), 2)
+
+        self.assertEqual(Tag.objects.count(), 0)
+        job = Job.objects.get(kind=ORPHAN_SWEEP_JOB)
+        self.assertEqual(job.progress['deleted_tags'], 6)
+        # Once the tags run out, the sweep is repeated after the interval
+        self.assertGreater((job.run_after - job.created_at).total_seconds(), 500)
+
+    def test_sweep_keeps_used_tags(self):
+        Tag.objects.create(name='orphan')
+        Post.objects.create(user=self.user, title='Other').delete()
+
+        run_due_jobs()
+
+        self.assertEqual(list(Tag.objects.values_list('name', flat=True)), ['used'])
+
+    @override_settings(ORPHAN_SWEEP_GRACE_SECONDS=300)
+    def test_sweep_keeps_recently_touched_tags(self):
+        Tag.objects.bulk_create([Tag(name='recent'), Tag(name='old')])
+        Tag.objects.filter(name='old').update(
+            touched_at=timezone.now() - timedelta(seconds=301))
+        self.post.delete()
+
+        run_due_jobs()
+
+        # The Tag of the Post was touched by its detach
+        self.assertEqual(list(Tag.objects.values_list('name', flat=True)),
+                         ['recent', 'used'])
+
+
 class PostModelTests(TestCase):
     """Tests for a Post model"""
     def setUp(self):
@@ -1013,6 +1745,35 @@ class UniqueConstraintOnCreationTests(TestCase):
         self.assertTrue(TagGroup.objects.filter(name='Untitled TagGroup 1').exists())
         self.assertTrue(TagGroup.objects.filter(name='Untitled TagGroup 3').exists())
 
+    def test_automatic_name_is_read_with_one_query(self):
+        TagGroup.objects.bulk_create([
+            TagGroup(user=self.user, name=f'Untitled TagGroup {i}') for i in range(1, 30)
+        ])
+        TagGroup.objects.create(user=self.user, name='Untitled TagGroup 31x')
+        other_user = User.objects.create_user(email='other_unique@example.com')
+        TagGroup.objects.create(user=other_user, name='Untitled TagGroup 30')
+
+        with self.assertNumQueries(1):
+            name = generate_unique_tg_name(self.user)
+        self.assertEqual(name, 'Untitled TagGroup 30')
+
+    def test_automatic_name_takes_first_gap(self):
+        for number in (1, 2, 4, 10 ** 20):
+            TagGroup.objects.create(user=self.user, name=f'Untitled TagGroup {number}')
+
+        self.assertEqual(generate_unique_tg_name(self.user), 'Untitled TagGroup 3')
+
+    def test_automatic_naming_retries_on_conflict(self):
+        """Test that a name taken by a concurrent request is replaced by a free one"""
+        TagGroup.objects.create(user=self.user, name='Untitled TagGroup 1')
+        # The first pick misses the existing group, as if it was created meanwhile
+        with patch('posts.models.generate_unique_tg_name',
+                   side_effect=['Untitled TagGroup 1', 'Untitled TagGroup 2']):
+            tg = TagGroup.objects.create(user=self.user)
+
+        self.assertEqual(tg.name, 'Untitled TagGroup 2')
+        self.assertEqual(TagGroup.objects.filter(user=self.user).count(), 2)
+
 
 class StrippedCharFieldTests(TestCase):
     def setUp(self):
@@ -0,0 +1,86 @@
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.contrib.auth import get_user_model
+from django.urls import reverse
+from core import stats
+from posts import read_cache
+from posts.models import Post, PostTag, Tag, TagGroup
+
+User = get_user_model()
+
+
+class ReadCacheTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create(email='cached@example.com')
+        self.client.force_login(self.user)
+        self.post = Post.objects.create(user=self.user, title='Cached Post')
+        self.tg = TagGroup.objects.create(user=self.user, name='Cached TG')
+        self.tags = [Tag.objects.create(name=f'cached{i}') for i in range(3)]
+        self.post.update_tags([tag.id for tag in self.tags[:2]])
+        self.editor_url = reverse('post_tg_editor', kwargs={
+            'post_pk': self.post.pk, 'tg_pk': self.tg.pk})
+        stats.reset()
+
+    def test_repeated_editor_get_reads_cache(self):
+        self.client.get(self.editor_url)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.editor_url)
+
+        # The Post, TagGroup, tags and sidebar are cached
+        self.assertFalse([query for query in queries.captured_queries
+                          if 'posts_' in query['sql']])
+
+        self.assertContains(response, '#cached0 #cached1')
+        counters = stats.snapshot()
+        self.assertEqual(counters['read_cache.sidebar.hit'], 2)
+        self.assertEqual(counters['read_cache.sidebar.miss'], 2)
+        self.assertEqual(counters['read_cache.tags.hit'], 2)
+
+    def test_writes_make_cache_stale(self):
+        self.client.get(self.editor_url)
+
+        self.post.update_tags([self.tags[2].id])
+        response = self.client.get(self.editor_url)
+        self.assertContains(response, '#cached2')
+        self.assertNotContains(response, '#cached0')
+
+        # Rows saved on their own reach the cache through signals
+        PostTag.objects.create(post=self.post, tag=self.tags[0], position=1)
+        self.assertEqual([tag.name for tag in read_cache.get_ordered_tags(self.post)],
+                         ['cached0', 'cached2'])
+
+        TagGroup.objects.create(user=self.user, name='Brand new TG')
+        self.assertContains(self.client.get(self.editor_url), 'Brand new TG')
+
+    def test_writes_start_from_fresh_rows(self):
+        self.client.get(self.editor_url)
+        # Written by another worker, whose generation bump this cache missed
+        Post.objects.filter(pk=self.post.pk).update(title='Renamed elsewhere')
+
+        self.client.post(self.editor_url, {'action': 'update_post_desc',
+                                           'post_desc': 'New description'})
+
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.title, 'Renamed elsewhere')
+        self.assertEqual(self.post.description, 'New description')
+
+    def test_other_users_items_are_not_served(self):
+        other_user = User.objects.create(email='other_cached@example.com')
+        self.assertIsNone(read_cache.get_user_item(other_user, Post, self.post.pk))
+        self.assertEqual(read_cache.get_user_item(self.user, Post, self.post.pk),
+                         self.post)
+
+    def test_evicted_generation_starts_new_one(self):
+        generation = read_cache.get_generation(self.user.pk)
+        read_cache.get_cache().delete(read_cache.get_generation_key(self.user.pk))
+        self.assertNotEqual(read_cache.get_generation(self.user.pk), generation)
+
+    def test_stats_view_is_for_staff(self):
+        self.client.get(self.editor_url)
+        self.assertEqual(self.client.get(reverse('stats')).status_code, 404)
+
+        self.user.is_staff = True
+        self.user.save()
+        counters = self.client.get(reverse('stats')).json()['counters']
+        self.assertEqual(counters['read_cache.sidebar.miss'], 2)
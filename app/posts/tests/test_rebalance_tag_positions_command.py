@@ -0,0 +1,62 @@
+from django.test import TestCase
+from django.core.management import call_command
+from django.contrib.auth import get_user_model
+from io import StringIO
+from posts.models import Tag, Post, PostTag, TagGroup, TagGroupTag, POSITION_STEP
+
+User = get_user_model()
+
+
+class RebalanceTagPositionsCommandTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(email='testuser@example.com')
+        self.tags = [Tag.objects.create(name=f'tag{i}') for i in range(3)]
+
+        self.crowded_post = Post.objects.create(user=self.user, title='Crowded')
+        for position, tag in enumerate(self.tags, start=1):
+            PostTag.objects.create(post=self.crowded_post, tag=tag, position=position)
+
+        self.spread_post = Post.objects.create(user=self.user, title='Spread')
+        self.spread_post.update_tags([tag.id for tag in self.tags])
+
+        self.crowded_tg = TagGroup.objects.create(user=self.user, name='Crowded')
+        TagGroupTag.objects.create(tag_group=self.crowded_tg, tag=self.tags[0],
+                                   position=POSITION_STEP)
+        TagGroupTag.objects.create(tag_group=self.crowded_tg, tag=self.tags[1],
+                                   position=POSITION_STEP + 1)
+
+    def test_rebalances_crowded_items_only(self):
+        spread_positions = list(PostTag.objects.filter(
+            post=self.spread_post).values_list('position', flat=True))
+
+        out = StringIO()
+        call_command('rebalance_tag_positions', stdout=out)
+
+        self.assertEqual(
+            list(PostTag.objects.filter(
+                post=self.crowded_post).values_list('tag_id', 'position')),
+            [(tag.id, (i + 1) * POSITION_STEP) for i, tag in enumerate(self.tags)]
+        )
+        self.assertEqual(
+            list(TagGroupTag.objects.filter(
+                tag_group=self.crowded_tg).values_list('position', flat=True)),
+            [POSITION_STEP, 2 * POSITION_STEP]
+        )
+        self.assertEqual(
+            list(PostTag.objects.filter(
+                post=self.spread_post).values_list('position', flat=True)),
+            spread_positions
+        )
+        self.assertIn('Rebalanced 1 posts', out.getvalue())
+        self.assertIn('Rebalanced 1 tag groups', out.getvalue())
+
+    def test_dry_run_doesnt_change_positions(self):
+        out = StringIO()
+        call_command('rebalance_tag_positions', '--dry-run', stdout=out)
+
+        self.assertEqual(
+            list(PostTag.objects.filter(
+                post=self.crowded_post).values_list('position', flat=True)),
+            [1, 2, 3]
+        )
+        self.assertIn('Would rebalance 1 posts', out.getvalue())
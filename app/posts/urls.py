@@ -7,5 +7,8 @@ urlpatterns = [
     path('tg/<int:tg_pk>', posts_views.post_editor, name='tg_editor'),
     path('post/<int:post_pk>/tg/<int:tg_pk>', posts_views.post_editor,
          name='post_tg_editor'),
-    path('posts/api/reorder_tags', posts_views.reorder_tags, name='reorder_tags')
+    path('posts/api/reorder_tags', posts_views.reorder_tags, name='reorder_tags'),
+    path('posts/api/move_tags', posts_views.move_tags, name='move_tags'),
+    path('posts/api/sidebar_items', posts_views.sidebar_items, name='sidebar_items'),
+    path('icons/<str:version>.svg', posts_views.icon_sprite, name='icon_sprite'),
 ]
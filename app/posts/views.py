@@ -1,17 +1,31 @@
+import hashlib
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+
 from django.core.exceptions import ValidationError
 from django.db import transaction
-from django.shortcuts import render, get_object_or_404, redirect
+from django.db.models import Q
+from django.shortcuts import get_object_or_404, render, redirect
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
-from django.views.decorators.http import require_POST
-from django.http import JsonResponse
+from django.middleware.csrf import get_token
+from django.template.defaultfilters import date as date_filter
+from django.urls import reverse
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.views.decorators.http import require_POST, require_GET
+from django.http import Http404, HttpResponse, JsonResponse
 import json
 
-from posts.models import (Post, Tag, TagGroup,
+from core import metrics
+from posts import icons, read_cache
+from posts.models import (Post, TagGroup,
                           POST_TITLE_MAX_LENGTH,
                           POST_DESC_MAX_LENGTH,
                           TG_NAME_MAX_LENGTH,
-                          generate_unique_tg_name as gen_tg_name)
+                          intern_tags,
+                          split_tag_names)
 
 
 def field_validation_sender(request, val_error: ValidationError):
@@ -21,6 +35,137 @@ def field_validation_sender(request, val_error: ValidationError):
             messages.error(request, f"{field.capitalize()}: {msg}")
 
 
+SIDEBAR_PAGE_SIZE = 50
+SIDEBAR_DATE_FORMAT = "d M'y"
+EPOCH = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+
+
+def encode_sidebar_cursor(item: dict) -> str:
+    """Encode (updated_at, id) of the last shown item as a URL-safe cursor"""
+    micros = (item['updated_at'] - EPOCH) // timedelta(microseconds=1)
+    return f"{micros}_{item['id']}"
+
+
+def decode_sidebar_cursor(cursor: str):
+    """Return (updated_at, id) from a cursor, raises ValueError if it's malformed"""
+    micros, item_id = cursor.split('_')
+    try:
+        return EPOCH + timedelta(microseconds=int(micros)), int(item_id)
+    except OverflowError as e:  # A time out of the range of datetime
+        raise ValueError(f"Invalid cursor: {cursor}") from e
+
+
+def get_sidebar_page(user, item_type, cursor=None, page_size=None):
+    """
+    Return a page of the user's Posts or TagGroups, most recently updated first,
+    and a cursor for the next page (None on the last page).
+    Sorting and paging are done by the DB using the (user, updated_at, id) index,
+    pages are cached until the user changes something.
+    """
+    page_size = page_size or SIDEBAR_PAGE_SIZE
+    return read_cache.get_or_compute(
+        user.pk, f'sidebar:{item_type}:{cursor or ""}:{page_size}',
+        lambda: read_sidebar_page(user, item_type, cursor, page_size)
+    )
+
+
+def read_sidebar_page(user, item_type, cursor, page_size):
+    if item_type == 'post':
+        items = user.posts.values('id', 'title', 'created_at', 'updated_at')
+    else:
+        items = user.tag_groups.values('id', 'name', 'updated_at')
+
+    if cursor:
+        updated_at, item_id = decode_sidebar_cursor(cursor)
+        items = items.filter(
+            Q(updated_at__lt=updated_at) | Q(updated_at=updated_at, id__lt=item_id)
+        )
+
+    # One extra row tells if there is a next page without running count()
+    items = list(items.order_by('-updated_at', '-id')[:page_size + 1])
+    next_cursor = None
+    if len(items) > page_size:
+        items = items[:page_size]
+        next_cursor = encode_sidebar_cursor(items[-1])
+    return items, next_cursor
+
+
+def get_version(*parts) -> str:
+    """Short digest of the parts, used in cache keys of template fragments"""
+    digest = hashlib.sha256()
+    for part in parts:
+        digest.update(part if isinstance(part, bytes) else str(part).encode())
+        digest.update(b'|')
+    return digest.hexdigest()[:24]
+
+
+def get_sidebar_version(items, next_cursor) -> str:
+    """Version of a sidebar page, any changed item changes its updated_at"""
+    return get_version(next_cursor, *(f"{item['id']}:{item['updated_at'].isoformat()}"
+                                      for item in items))
+
+
+def get_editor_version(item) -> str:
+    """
+    Version of a Post/TagGroup editor. Tag writes touch updated_at, except rows
+    saved on their own, which are caught by the stored order, and Tag renames,
+    which are caught by the hashtags of Posts.
+    """
+    if item is None:
+        return ''
+    return get_version(item.pk, item.updated_at.isoformat(), bytes(item.packed_tag_ids),
+                       getattr(item, 'tags_text', ''))
+
+
+# Session values shown once by the editor page, a page with them isn't cached
+EDITOR_FLASH_KEYS = ('post_tags_to_attach', 'tg_tags_to_attach', 'submitted_input_id')
+# Form actions of the editor, metrics label any other value as 'other'
+EDITOR_ACTIONS = frozenset({
+    'create_post', 'create_tg', 'post_attach_tags', 'tg_attach_tags',
+    'post_detach_tag', 'tg_detach_tag', 'copy_tags_to_tg', 'copy_tags_to_post',
+    'update_post_title', 'update_post_desc', 'delete_post', 'close_current_post',
+    'update_tg', 'delete_tg', 'close_current_tg',
+})
+
+
+def get_etag(*parts) -> str:
+    """Weak ETag, the same content may come compressed or not"""
+    return f'W/"{get_version(*parts)}"'
+
+
+def get_editor_etag(request, current_post, current_tg):
+    """
+    ETag of the editor page, any write of the user bumps the generation. Pages
+    showing messages or one-off session values, and requests without a csrf
+    cookie, which get a new token, have None.
+    """
+    if (request.method != 'GET' or 'CSRF_COOKIE' not in request.META
+            or len(messages.get_messages(request))
+            or any(key in request.session for key in EDITOR_FLASH_KEYS)):
+        return None
+    return get_etag(read_cache.get_generation(request.user.id),
+                    request.META['CSRF_COOKIE'], request.path, icons.get_sprite()[1],
+                    get_editor_version(current_post), get_editor_version(current_tg))
+
+
+def set_etag(response, etag):
+    """Set the ETag, browsers revalidate these private pages on every load"""
+    if etag is not None:
+        response['ETag'] = etag
+        patch_cache_control(response, private=True, no_cache=True)
+    return response
+
+
+def not_modified_response(request, etag):
+    """Return a 304 response if the client has the etag, otherwise None"""
+    if etag is None:
+        return None
+    response = get_conditional_response(request, etag=etag)
+    if response is not None:
+        set_etag(response, etag)
+    return response
+
+
 def redirect_post_editor(request, post_pk=None, tg_pk=None):
     if tg_pk is not None and post_pk is not None:
         return redirect('post_tg_editor', post_pk=post_pk, tg_pk=tg_pk)
@@ -31,44 +176,60 @@ def redirect_post_editor(request, post_pk=None, tg_pk=None):
     return redirect('index')
 
 
+def set_session_value(request, key, value):
+    """Assign only a changed value, an unmodified session isn't saved at all"""
+    if request.session.get(key) != value:
+        request.session[key] = value
+
+
 @login_required(login_url='profile')
 def post_editor(request, post_pk=None, tg_pk=None):
-    messages.info(request, '')
     context = dict()
     current_post, current_tg = None, None
 
     if post_pk is not None:
-        current_post = get_object_or_404(Post, pk=post_pk, user=request.user)
-        request.session['opened_post_id'] = current_post.id
+        current_post = read_cache.get_user_item(request.user, Post, post_pk)
+        if current_post is None:
+            raise Http404("No Post matches the given query.")
+        set_session_value(request, 'opened_post_id', current_post.id)
     else:
         opened_post_id = request.session.get('opened_post_id')
         if opened_post_id and str(opened_post_id).isdigit():
-            opened_post = Post.objects.filter(
-                user=request.user,
-                pk=int(opened_post_id)
-            ).first()
-            if opened_post:
-                current_post = opened_post
+            current_post = read_cache.get_user_item(
+                request.user, Post, int(opened_post_id))
 
     context['current_post'] = current_post
 
     if tg_pk is not None:
-        current_tg = get_object_or_404(TagGroup, pk=tg_pk, user=request.user)
-        request.session['opened_tg_id'] = current_tg.id
+        current_tg = read_cache.get_user_item(request.user, TagGroup, tg_pk)
+        if current_tg is None:
+            raise Http404("No TagGroup matches the given query.")
+        set_session_value(request, 'opened_tg_id', current_tg.id)
     else:
         opened_tg_id = request.session.get('opened_tg_id')
         if opened_tg_id and str(opened_tg_id).isdigit():
-            opened_tg = TagGroup.objects.filter(
-                user=request.user,
-                pk=int(opened_tg_id)
-            ).first()
-            if opened_tg:
-                current_tg = opened_tg
+            current_tg = read_cache.get_user_item(
+                request.user, TagGroup, int(opened_tg_id))
 
     context['current_tg'] = current_tg
 
+    etag = get_editor_etag(request, current_post, current_tg)
+    not_modified = not_modified_response(request, etag)
+    if not_modified is not None:
+        return not_modified
+
     if request.method == 'POST':
         action = request.POST.get('action')
+        metrics.set_action(request, action if action in EDITOR_ACTIONS else 'other')
+
+        # Cached items may be older than the rows, e.g. written by another
+        # worker, so writes start from fresh ones
+        if current_post is not None:
+            current_post = get_object_or_404(Post, user=request.user,
+                                             pk=current_post.pk)
+        if current_tg is not None:
+            current_tg = get_object_or_404(TagGroup, user=request.user,
+                                           pk=current_tg.pk)
 
         if action == 'create_post':
             new_post_title = request.POST.get('new_item_name') or 'Untitled Post'
@@ -83,10 +244,11 @@ def post_editor(request, post_pk=None, tg_pk=None):
             return redirect_post_editor(request, new_post.id, tg_pk)
 
         if action == 'create_tg':
-            new_tg_name = request.POST.get('new_item_name') or gen_tg_name(request.user)
-            new_tg = TagGroup(user=request.user, name=new_tg_name)
+            new_tg = TagGroup(user=request.user,
+                              name=request.POST.get('new_item_name', ''))
             try:
-                new_tg.full_clean()
+                # A blank name is generated on save
+                new_tg.full_clean(exclude=None if new_tg.name else ['name'])
             except ValidationError as e:
                 field_validation_sender(request, e)
                 return redirect(request.path)
@@ -100,29 +262,19 @@ def post_editor(request, post_pk=None, tg_pk=None):
                 request.session['submitted_input_id'] = 'post-tags-to-attach'
             elif action == 'tg_attach_tags':
                 request.session['submitted_input_id'] = 'tg-tags-to-attach'
-            tag_ids = []
-            tag_names_lst = tags_to_attach.replace(",", " ").replace("#", " ").split()
             with transaction.atomic():
-                for tag_name in tag_names_lst:
-                    tag = Tag.objects.filter(name=tag_name).first()
-                    if tag is None:
-                        tag = Tag(name=tag_name)
-                        try:
-                            tag.full_clean()
-                            tag.save()
-                        except ValidationError as e:
-                            error_msg = e.message_dict.get('name', ['Invalid tag'])[0]
-                            messages.error(request, error_msg)
-                            # Save the value so the GET page can prefill it
-                            if action == 'post_attach_tags':
-                                request.session['post_tags_to_attach'] = tags_to_attach
-                            elif action == 'tg_attach_tags':
-                                request.session['tg_tags_to_attach'] = tags_to_attach
-                            # Mark for rollback
-                            transaction.set_rollback(True)
-                            # Redirect prevents re-POST on reload
-                            return redirect(request.path)
-                    tag_ids.append(tag.id)
+                try:
+                    tag_ids = intern_tags(split_tag_names(tags_to_attach))
+                except ValidationError as e:
+                    error_msg = e.message_dict.get('name', ['Invalid tag'])[0]
+                    messages.error(request, error_msg)
+                    # Save the value so the GET page can prefill it
+                    if action == 'post_attach_tags':
+                        request.session['post_tags_to_attach'] = tags_to_attach
+                    elif action == 'tg_attach_tags':
+                        request.session['tg_tags_to_attach'] = tags_to_attach
+                    # Redirect prevents re-POST on reload
+                    return redirect(request.path)
 
                 if tag_ids:
                     if action == 'post_attach_tags' and current_post is not None:
@@ -146,14 +298,10 @@ def post_editor(request, post_pk=None, tg_pk=None):
                 return redirect(request.path)
 
         if action == 'copy_tags_to_tg' and current_post and current_tg:
-            current_tg.update_tags(
-                current_tg.ordered_tag_ids + current_post.ordered_tag_ids
-            )
+            current_tg.append_tags_from(current_post)
 
         if action == 'copy_tags_to_post' and current_tg and current_post:
-            current_post.update_tags(
-                current_post.ordered_tag_ids + current_tg.ordered_tag_ids
-            )
+            current_post.append_tags_from(current_tg)
 
         if current_post:
             if action == 'update_post_title':
@@ -217,7 +365,25 @@ def post_editor(request, post_pk=None, tg_pk=None):
                 return redirect_post_editor(request, post_pk, None)
 
     # GET (or after redirect)
+    sidebar_posts, posts_next_cursor = get_sidebar_page(request.user, 'post')
+    sidebar_tgs, tgs_next_cursor = get_sidebar_page(request.user, 'tg')
+    # Cached fragments keep rendered csrf tokens, they stay valid while the secret
+    # is the same, so the fragments are bound to it. get_token() sets the secret.
+    get_token(request)
     context.update({
+            'fragment_cache_timeout': settings.FRAGMENT_CACHE_TIMEOUT,
+            'icons_version': icons.get_sprite()[1] if settings.ICON_SPRITE else '',
+            'csrf_version': get_version(request.META.get('CSRF_COOKIE', '')),
+            'posts_version': get_sidebar_version(sidebar_posts, posts_next_cursor),
+            'tgs_version': get_sidebar_version(sidebar_tgs, tgs_next_cursor),
+            'post_version': get_editor_version(current_post),
+            'tg_version': get_editor_version(current_tg),
+            'sidebar_posts': sidebar_posts,
+            'posts_next_cursor': posts_next_cursor,
+            'sidebar_tgs': sidebar_tgs,
+            'tgs_next_cursor': tgs_next_cursor,
+            'post_tags': read_cache.get_ordered_tags(current_post),
+            'tg_tags': read_cache.get_ordered_tags(current_tg),
             'post_tags_to_attach': request.session.pop('post_tags_to_attach', ''),
             'tg_tags_to_attach': request.session.pop('tg_tags_to_attach', ''),
             'submitted_input_id': request.session.pop('submitted_input_id', ''),
@@ -226,40 +392,138 @@ def post_editor(request, post_pk=None, tg_pk=None):
             'post_desc_max_length': POST_DESC_MAX_LENGTH,
     })
 
-    return render(
+    response = render(
         request,
         template_name='posts/post_editor.html',
         context=context
     )
+    return set_etag(response, etag)
+
+
+async def get_api_item(request, data):
+    """Return the Post or TagGroup of the user named in the request data or None"""
+    item_model = Post if data.get("item_type") == "post" else TagGroup
+    user = await request.auser()
+    try:
+        return await item_model.objects.aget(id=data.get("item_id"), user=user)
+    except item_model.DoesNotExist:
+        return None
 
 
+# JSON endpoints are async, so under ASGI a worker keeps serving other requests
+# while these wait for the DB. Tag updates run in transactions, which the async
+# ORM doesn't support, so they cross into sync code with sync_to_async.
 @require_POST
-def reorder_tags(request):
-    if not request.user.is_authenticated:
+async def reorder_tags(request):
+    if not (await request.auser()).is_authenticated:
         return JsonResponse({"success": False, "error": "Not authenticated"})
 
     data = json.loads(request.body)
-    item_type = data.get("item_type")
-    if item_type == "post":
-        item_model = Post
-    else:
-        item_model = TagGroup
-    try:
-        item = item_model.objects.get(id=data.get("item_id"), user=request.user)
-    except item_model.DoesNotExist:
+    item = await get_api_item(request, data)
+    if item is None:
         return JsonResponse({"success": False, "error": "Item not found"})
 
     tag_order = [int(tid) for tid in data.get("tag_order", [])]
 
     try:
-        item.update_tags(tag_order)
+        await sync_to_async(item.update_tags)(tag_order)
     except Exception as e:
         return JsonResponse({"success": False, "error": str(e)})
 
     response_data = {"success": True}
-    # Get the current list of tag names as a single string (e.g., "#tag1 #tag2 ...")
-    if item_type == "post":
-        tag_text = " ".join(f"#{tag.name}" for tag in item.ordered_tags)
-        response_data["tag_text"] = tag_text
+    # Hashtags rendered by update_tags (e.g., "#tag1 #tag2 ..."), and the whole
+    # Post for the copy button
+    if isinstance(item, Post):
+        response_data["tag_text"] = item.tags_text
+        response_data["plain_text"] = item.plain_text
 
     return JsonResponse(response_data)
+
+
+@require_POST
+async def move_tags(request):
+    """Apply a batch of tag moves and return only the changed positions"""
+    if not (await request.auser()).is_authenticated:
+        return JsonResponse({"success": False, "error": "Not authenticated"})
+
+    data = json.loads(request.body)
+    item = await get_api_item(request, data)
+    if item is None:
+        return JsonResponse({"success": False, "error": "Item not found"})
+
+    try:
+        positions = await sync_to_async(item.move_tags)(data.get("moves", []))
+    except (ValueError, TypeError, KeyError) as e:
+        return JsonResponse({"success": False, "error": str(e)})
+
+    response_data = {
+        "success": True,
+        "positions": {str(tag_id): pos for tag_id, pos in positions.items()},
+    }
+    if isinstance(item, Post) and positions:
+        response_data["tag_text"] = item.tags_text
+        response_data["plain_text"] = item.plain_text
+
+    return JsonResponse(response_data)
+
+
+@require_GET
+async def sidebar_items(request):
+    """Return the next page of the sidebar list for the "Load more" button"""
+    user = await request.auser()
+    if not user.is_authenticated:
+        return JsonResponse({"success": False, "error": "Not authenticated"})
+
+    # The query string holds everything the page depends on besides the generation
+    etag = get_etag(read_cache.get_generation(user.id), request.get_full_path())
+    not_modified = not_modified_response(request, etag)
+    if not_modified is not None:
+        return not_modified
+
+    item_type = request.GET.get("item_type")
+    # Id of the opened item from the other list, links keep it opened
+    paired_id = request.GET.get("paired_id", "")
+    paired_id = int(paired_id) if paired_id.isdigit() else None
+    try:
+        items, next_cursor = await sync_to_async(get_sidebar_page)(
+            user, item_type, request.GET.get("cursor")
+        )
+    except ValueError:
+        return JsonResponse({"success": False, "error": "Invalid cursor"})
+
+    response_items = []
+    for item in items:
+        if item_type == 'post':
+            title, date = item['title'], item['created_at']
+            if paired_id is not None:
+                url = reverse('post_tg_editor', args=[item['id'], paired_id])
+            else:
+                url = reverse('post_editor', args=[item['id']])
+        else:
+            title, date = item['name'], item['updated_at']
+            if paired_id is not None:
+                url = reverse('post_tg_editor', args=[paired_id, item['id']])
+            else:
+                url = reverse('tg_editor', args=[item['id']])
+        response_items.append({
+            "id": item['id'],
+            "title": title,
+            "date": date_filter(date, SIDEBAR_DATE_FORMAT),
+            "url": url,
+        })
+
+    response = JsonResponse(
+        {"success": True, "items": response_items, "next_cursor": next_cursor}
+    )
+    return set_etag(response, etag)
+
+
+@require_GET
+def icon_sprite(request, version):
+    """The icon sprite, its URL changes with the content, so it's cached forever"""
+    sprite, current_version = icons.get_sprite()
+    if version != current_version:
+        raise Http404("No such icon sprite.")
+    response = HttpResponse(sprite, content_type='image/svg+xml')
+    response['Cache-Control'] = 'public, max-age=31536000, immutable'
+    return response
@@ -1,14 +1,15 @@
 function copyPreviewText() {
-    // Get the textarea value
-    const descEl = document.getElementById('post-desc');
-    const descText = descEl ? descEl.value : '';
-
-    // Get the tags text (strip HTML, use innerText for plain text, trim just in case)
-    const tagsEl = document.getElementById('post-preview-tags');
-    const tagsText = tagsEl ? tagsEl.innerText.trim() : '';
+    // The whole post as plain text, rendered by the server when it's saved
+    const copyBtn = document.getElementById('copy-preview-btn');
+    let combinedText = copyBtn ? copyBtn.dataset.plainText : '';
 
-    // Combine them and paste line breaks
-    const combinedText = descText + (tagsText ? '\n\n' + tagsText : '');
+    // A description edited but not saved yet is taken from the textarea
+    const descEl = document.getElementById('post-desc');
+    if (descEl && descEl.value !== descEl.defaultValue) {
+        const tagsEl = document.getElementById('post-preview-tags');
+        const tagsText = tagsEl ? tagsEl.innerText.trim() : '';
+        combinedText = descEl.value + (tagsText ? '\n\n' + tagsText : '');
+    }
 
     // Copy the combined text to clipboard
     navigator.clipboard.writeText(combinedText)
@@ -18,4 +19,4 @@ function copyPreviewText() {
         .catch(err => {
             showMessage('Error copying text: ' + err, 'error');
         });
-}
\ No newline at end of file
+}
@@ -23,7 +23,7 @@ function setupDndSortable(config) {
     const tagSelector = ".tag";
     const inputSelector = 'input[name="tag_to_detach"]';
     const dataIdKey = 'itemId' // will correspond to data-item-id
-    const ajaxUrl = "/posts/api/reorder_tags";
+    const ajaxUrl = "/posts/api/move_tags";
 
     Sortable.create(list, {
         animation: 150,
@@ -33,12 +33,18 @@ function setupDndSortable(config) {
         onUnchoose: () => list.classList.remove('dragging'),
         onEnd: function (evt) {
             list.classList.remove('dragging');
-            const tagDivs = list.querySelectorAll(tagSelector);
-            const tagOrder = [];
-            tagDivs.forEach(div => {
-                const input = div.querySelector(inputSelector);
-                if (input) tagOrder.push(input.value);
-            });
+            if (evt.oldIndex === evt.newIndex) return;
+
+            // Send only the moved tag and the tag it was dropped before
+            const movedInput = evt.item.querySelector(inputSelector);
+            if (!movedInput) return;
+            let next = evt.item.nextElementSibling;
+            while (next && !next.matches(tagSelector)) next = next.nextElementSibling;
+            const nextInput = next ? next.querySelector(inputSelector) : null;
+            const moves = [{
+                tag_id: movedInput.value,
+                before_id: nextInput ? nextInput.value : null,
+            }];
 
             // Prepare data for AJAX POST
             const csrftoken = getCookie('csrftoken');
@@ -50,7 +56,7 @@ function setupDndSortable(config) {
                     "Content-Type": "application/json",
                     "X-CSRFToken": csrftoken,
                 },
-                body: JSON.stringify({ tag_order: tagOrder, item_type: config.objectType, item_id: objectId }),
+                body: JSON.stringify({ moves: moves, item_type: config.objectType, item_id: objectId }),
             })
             .then(response => response.json())
             .then(data => {
@@ -61,6 +67,10 @@ function setupDndSortable(config) {
                         const preview = document.getElementById(config.previewId);
                         if (preview) preview.textContent = data.tag_text;
                     }
+                    if (config.copyButtonId && data.plain_text !== undefined) {
+                        const copyButton = document.getElementById(config.copyButtonId);
+                        if (copyButton) copyButton.dataset.plainText = data.plain_text;
+                    }
                 }
             })
             .catch(error => {
@@ -78,7 +88,8 @@ document.addEventListener("DOMContentLoaded", function() {
     setupDndSortable({
         listId: "dnd-list-post",
         objectType: "post",
-        previewId: "post-preview-tags"
+        previewId: "post-preview-tags",
+        copyButtonId: "copy-preview-btn"
     });
 
     // For TagGroups
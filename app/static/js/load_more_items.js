@@ -0,0 +1,56 @@
+// Appends the next page of Posts or TagGroups to the sidebar list
+document.addEventListener("DOMContentLoaded", function() {
+    const ajaxUrl = "/posts/api/sidebar_items";
+
+    function createListItem(item, activeId) {
+        const link = document.createElement('a');
+        link.className = 'list-item';
+        if (String(item.id) === activeId) link.classList.add('active');
+        link.href = item.url;
+
+        const title = document.createElement('div');
+        title.className = 'list-item-title';
+        title.textContent = item.title;
+
+        const date = document.createElement('div');
+        date.className = 'list-item-date';
+        date.textContent = item.date;
+
+        link.append(title, date);
+        return link;
+    }
+
+    document.querySelectorAll('.load-more-btn').forEach(function(btn) {
+        btn.addEventListener('click', function() {
+            const params = new URLSearchParams({
+                item_type: btn.dataset.itemType,
+                cursor: btn.dataset.nextCursor,
+                paired_id: btn.dataset.pairedId,
+            });
+            btn.disabled = true;
+
+            fetch(`${ajaxUrl}?${params}`)
+            .then(response => response.json())
+            .then(data => {
+                if (!data.success) {
+                    showMessage("Failed to load items: " + (data.error || ""));
+                    return;
+                }
+                data.items.forEach(item => {
+                    btn.before(createListItem(item, btn.dataset.activeId));
+                });
+                if (data.next_cursor) {
+                    btn.dataset.nextCursor = data.next_cursor;
+                } else {
+                    btn.remove();
+                }
+            })
+            .catch(error => {
+                showMessage("AJAX error: " + error, "error");
+            })
+            .finally(() => {
+                btn.disabled = false;
+            });
+        });
+    });
+});